@@ -16,11 +16,13 @@ import globaleaks.mocks.twisted_mocks # pylint: disable=W0611
 
 from globaleaks.db import create_db, init_db, update_db, \
     sync_refresh_memory_variables, sync_clean_untracked_files
+from globaleaks.handlers.l10n import L10NBase
+from globaleaks.handlers.staticfile import StaticFileCache
 from globaleaks.rest.api import APIResourceWrapper
 from globaleaks.settings import Settings
 from globaleaks.state import State
 from globaleaks.utils.process import disable_swap
-from globaleaks.utils.sock import listen_tcp_on_sock, reserve_port_for_ip
+from globaleaks.utils.sock import listen_tcp_on_sock, listen_unix_on_path, reserve_port_for_ip
 from globaleaks.utils.utility import fix_file_permissions, drop_privileges, log, timedLogFormatter, GLLogObserver
 from globaleaks.workers.supervisor import ProcessSupervisor
 
@@ -86,6 +88,7 @@ class Service(service.Service):
             if not self._shutdown:
                 self._shutdown = True
                 self.state.orm_tp.stop()
+                self.state.orm_ro_tp.stop()
                 d.callback(None)
 
         reactor.callLater(30, _shutdown, None)
@@ -136,16 +139,31 @@ class Service(service.Service):
         sync_clean_untracked_files()
         sync_refresh_memory_variables()
 
+        L10NBase.load(set(lang for tenant_cache in self.state.tenant_cache.values()
+                                for lang in tenant_cache.get('languages_enabled', [])))
+
+        StaticFileCache.preload(Settings.client_path)
+
         self.state.orm_tp.start()
+        self.state.orm_ro_tp.start()
 
         reactor.addSystemEventTrigger('before', 'shutdown', self.shutdown)
 
         for sock in self.state.http_socks:
             listen_tcp_on_sock(reactor, sock.fileno(), self.api_factory)
 
+        unix_socket_path = None
+        if Settings.bind_unix_socket:
+            try:
+                listen_unix_on_path(reactor, Settings.unix_socket_path, self.api_factory)
+                unix_socket_path = Settings.unix_socket_path
+            except Exception as excep:
+                log.err("Could not listen on %s (error: %s)", Settings.unix_socket_path, excep)
+
         self.state.process_supervisor = ProcessSupervisor(self.state.https_socks,
                                                           '127.0.0.1',
-                                                          8082)
+                                                          8082,
+                                                          unix_socket_path)
 
         self.state.process_supervisor.maybe_launch_https_workers()
 
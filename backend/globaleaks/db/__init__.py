@@ -36,7 +36,7 @@ def create_db():
     engine = get_engine()
     engine.execute('PRAGMA foreign_keys = ON')
     engine.execute('PRAGMA secure_delete = ON')
-    engine.execute('PRAGMA auto_vacuum = FULL')
+    engine.execute('PRAGMA auto_vacuum = INCREMENTAL')
 
     Base.metadata.create_all(engine)
 
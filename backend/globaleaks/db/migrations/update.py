@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+import time
+
 from globaleaks import DATABASE_VERSION, FIRST_DATABASE_VERSION_SUPPORTED
 from globaleaks.db.appdata import load_appdata
 from globaleaks.settings import Settings
@@ -9,6 +11,13 @@ class MigrationBase(object):
     """
     This is the base class used by every Updater
     """
+    # Number of rows copied and committed at once by the generic migration
+    chunk_size = 10000
+
+    # Migrations only adding tables, columns or indexes may be declared as
+    # additive in order to be applied in place without copying the data
+    additive = False
+
     def __init__(self, migration_mapping, start_version, session_old, session_new):
         self.appdata = load_appdata()
 
@@ -78,15 +87,47 @@ class MigrationBase(object):
         return False
 
     def generic_migration_function(self, model_name):
-        old_objects = self.session_old.query(self.model_from[model_name])
+        """
+        Copy the rows of a table whose columns did not change meaning.
+
+        The rows are streamed from the old database and written with bulk
+        inserts committed every chunk_size rows, without instantiating any
+        mapped object. The columns missing in the old table are initialized
+        with their default value as it would happen creating new objects.
+        """
+        model_from = self.model_from[model_name]
+        model_to = self.model_to[model_name]
 
-        for old_obj in old_objects:
-            new_obj = self.model_to[model_name](migrate=True)
+        old_keys = [c.key for c in model_from.__table__.columns]
+        keys = [c.key for c in model_to.__table__.columns if c.key in old_keys]
 
-            for k in [c.key for c in new_obj.__table__.columns]:
-                self.migrate_model_key(old_obj, new_obj, k)
+        old_rows = self.session_old.query(*[getattr(model_from, k) for k in keys]).yield_per(self.chunk_size)
+
+        start_time = time.time()
+        count = 0
+        chunk = []
+
+        for old_row in old_rows:
+            chunk.append(dict(zip(keys, old_row)))
+
+            if len(chunk) == self.chunk_size:
+                count += self.bulk_insert(model_to, chunk)
+                chunk = []
+                self.print_progress(count, start_time)
+
+        if chunk:
+            count += self.bulk_insert(model_to, chunk)
+            self.print_progress(count, start_time)
+
+    def bulk_insert(self, model, rows):
+        self.session_new.execute(model.__table__.insert(), rows)
+        self.session_new.commit()
+        return len(rows)
 
-            self.session_new.add(new_obj)
+    def print_progress(self, count, start_time):
+        elapsed = time.time() - start_time
+        rate = count / elapsed if elapsed > 0 else count
+        Settings.print_msg('   %d rows migrated (%d rows/s)' % (count, rate))
 
     def migrate_model(self, model_name):
         objs_count = self.session_old.query(self.model_from[model_name]).count()
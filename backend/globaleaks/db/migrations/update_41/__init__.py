@@ -0,0 +1,139 @@
+# -*- coding: UTF-8
+from globaleaks.db.migrations.update import MigrationBase
+from globaleaks.models import Model
+from globaleaks.models.properties import *
+from globaleaks.utils.utility import datetime_now, datetime_null
+
+
+class Comment_v_40(Model):
+    __tablename__ = 'comment'
+    id = Column(Unicode(36), primary_key=True, default=uuid4, nullable=False)
+    creation_date = Column(DateTime, default=datetime_now, nullable=False)
+    internaltip_id = Column(Unicode(36), nullable=False)
+    author_id = Column(Unicode(36))
+    content = Column(UnicodeText, nullable=False)
+    type = Column(UnicodeText, nullable=False)
+    new = Column(Integer, default=True, nullable=False)
+
+    @declared_attr
+    def __table_args__(cls): # pylint: disable=no-self-argument
+        return (ForeignKeyConstraint(['internaltip_id'], ['internaltip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                ForeignKeyConstraint(['author_id'], ['user.id'], ondelete='SET NULL', deferrable=True, initially='DEFERRED'),)
+
+
+class FieldAnswer_v_40(Model):
+    __tablename__ = 'fieldanswer'
+    id = Column(Unicode(36), primary_key=True, default=uuid4, nullable=False)
+    internaltip_id = Column(Unicode(36), nullable=True)
+    fieldanswergroup_id = Column(Unicode(36), nullable=True)
+    key = Column(UnicodeText, default=u'', nullable=False)
+    is_leaf = Column(Boolean, default=True, nullable=False)
+    value = Column(UnicodeText, default=u'', nullable=False)
+
+    @declared_attr
+    def __table_args__(cls): # pylint: disable=no-self-argument
+        return (ForeignKeyConstraint(['internaltip_id'], ['internaltip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                ForeignKeyConstraint(['fieldanswergroup_id'], ['fieldanswergroup.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'))
+
+
+class InternalFile_v_40(Model):
+    __tablename__ = 'internalfile'
+    id = Column(Unicode(36), primary_key=True, default=uuid4, nullable=False)
+    creation_date = Column(DateTime, default=datetime_now, nullable=False)
+    internaltip_id = Column(Unicode(36), nullable=False)
+    name = Column(UnicodeText, nullable=False)
+    file_path = Column(UnicodeText, nullable=False)
+    content_type = Column(UnicodeText, nullable=False)
+    size = Column(Integer, nullable=False)
+    new = Column(Integer, default=True, nullable=False)
+    submission = Column(Integer, default = False, nullable=False)
+    processing_attempts = Column(Integer, default=0, nullable=False)
+
+    @declared_attr
+    def __table_args__(cls): # pylint: disable=no-self-argument
+        return (ForeignKeyConstraint(['internaltip_id'], ['internaltip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),)
+
+
+class InternalTip_v_40(Model):
+    __tablename__ = 'internaltip'
+    id = Column(Unicode(36), primary_key=True, default=uuid4, nullable=False)
+    tid = Column(Integer, default=1, nullable=False)
+    creation_date = Column(DateTime, default=datetime_now, nullable=False)
+    update_date = Column(DateTime, default=datetime_now, nullable=False)
+    context_id = Column(Unicode(36), nullable=False)
+    questionnaire_hash = Column(Unicode(64), nullable=False)
+    preview = Column(JSON, nullable=False)
+    progressive = Column(Integer, default=0, nullable=False)
+    https = Column(Boolean, default=False, nullable=False)
+    total_score = Column(Integer, default=0, nullable=False)
+    expiration_date = Column(DateTime, nullable=False)
+    identity_provided = Column(Boolean, default=False, nullable=False)
+    identity_provided_date = Column(DateTime, default=datetime_null, nullable=False)
+    enable_two_way_comments = Column(Boolean, default=True, nullable=False)
+    enable_two_way_messages = Column(Boolean, default=True, nullable=False)
+    enable_attachments = Column(Boolean, default=True, nullable=False)
+    enable_whistleblower_identity = Column(Boolean, default=False, nullable=False)
+    receipt_hash = Column(Unicode(128), nullable=False)
+    wb_last_access = Column(DateTime, default=datetime_now, nullable=False)
+    wb_access_counter = Column(Integer, default=0, nullable=False)
+
+    @declared_attr
+    def __table_args__(cls): # pylint: disable=no-self-argument
+        return (ForeignKeyConstraint(['tid'], ['tenant.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                ForeignKeyConstraint(['context_id'], ['context.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                ForeignKeyConstraint(['questionnaire_hash'], ['archivedschema.hash'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'))
+
+
+class Mail_v_40(Model):
+    __tablename__ = 'mail'
+    id = Column(Unicode(36), primary_key=True, default=uuid4, nullable=False)
+    tid = Column(Integer, default=1, nullable=False)
+    creation_date = Column(DateTime, default=datetime_now, nullable=False)
+    address = Column(UnicodeText, nullable=False)
+    subject = Column(UnicodeText, nullable=False)
+    body = Column(UnicodeText, nullable=False)
+    processing_attempts = Column(Integer, default=0, nullable=False)
+
+    @declared_attr
+    def __table_args__(cls): # pylint: disable=no-self-argument
+        return (ForeignKeyConstraint(['tid'], ['tenant.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),)
+
+
+class Message_v_40(Model):
+    __tablename__ = 'message'
+    id = Column(Unicode(36), primary_key=True, default=uuid4, nullable=False)
+    creation_date = Column(DateTime, default=datetime_now, nullable=False)
+    receivertip_id = Column(Unicode(36), nullable=False)
+    content = Column(UnicodeText, nullable=False)
+    type = Column(UnicodeText, nullable=False)
+    new = Column(Integer, default=True, nullable=False)
+
+    @declared_attr
+    def __table_args__(cls): # pylint: disable=no-self-argument
+        return (ForeignKeyConstraint(['receivertip_id'], ['receivertip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                CheckConstraint(cls.type.in_(['receiver', 'whistleblower'])))
+
+
+class ReceiverTip_v_40(Model):
+    __tablename__ = 'receivertip'
+    id = Column(Unicode(36), primary_key=True, default=uuid4, nullable=False)
+    internaltip_id = Column(Unicode(36), nullable=False)
+    receiver_id = Column(Unicode(36), nullable=False)
+    last_access = Column(DateTime, default=datetime_null, nullable=False)
+    access_counter = Column(Integer, default=0, nullable=False)
+    label = Column(UnicodeText, default=u'', nullable=False)
+    can_access_whistleblower_identity = Column(Boolean, default=False, nullable=False)
+    new = Column(Integer, default=True, nullable=False)
+    enable_notifications = Column(Boolean, default=True, nullable=False)
+
+    @declared_attr
+    def __table_args__(cls): # pylint: disable=no-self-argument
+        return (ForeignKeyConstraint(['receiver_id'], ['receiver.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                ForeignKeyConstraint(['internaltip_id'], ['internaltip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'))
+
+
+class MigrationScript(MigrationBase):
+    """
+    The schema version 41 only adds secondary indexes
+    """
+    additive = True
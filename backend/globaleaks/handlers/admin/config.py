@@ -53,6 +53,7 @@ class AdminConfigHandler(OperationHandler):
     """
     check_roles = 'admin'
     invalidate_cache = True
+    invalidate_cache_tags = ['node']
 
     @inlineCallbacks
     def set_hostname(self, req_args, *args, **kwargs):
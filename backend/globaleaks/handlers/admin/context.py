@@ -197,7 +197,9 @@ def order_elements(session, handler, req_args, *args, **kwargs):
 class ContextsCollection(OperationHandler):
     check_roles = 'admin'
     cache_resource = True
+    cache_tags = ['contexts', 'users']
     invalidate_cache = True
+    invalidate_cache_tags = ['contexts']
 
     def get(self):
         """
@@ -223,6 +225,7 @@ class ContextsCollection(OperationHandler):
 class ContextInstance(BaseHandler):
     check_roles = 'admin'
     invalidate_cache = True
+    invalidate_cache_tags = ['contexts', 'users']
 
     def put(self, context_id):
         """
@@ -294,7 +294,9 @@ def get_fieldtemplate_list(session, tid, language):
 class FieldTemplatesCollection(BaseHandler):
     check_roles = 'admin'
     cache_resource = True
+    cache_tags = ['questionnaires']
     invalidate_cache = True
+    invalidate_cache_tags = ['questionnaires']
 
     def get(self):
         """
@@ -319,6 +321,7 @@ class FieldTemplatesCollection(BaseHandler):
 class FieldTemplateInstance(BaseHandler):
     check_roles = 'admin'
     invalidate_cache = True
+    invalidate_cache_tags = ['questionnaires']
 
     def put(self, field_id):
         """
@@ -353,7 +356,9 @@ class FieldsCollection(BaseHandler):
     """
     check_roles = 'admin'
     cache_resource = True
+    cache_tags = ['questionnaires']
     invalidate_cache = True
+    invalidate_cache_tags = ['questionnaires']
 
     def post(self):
         """
@@ -379,6 +384,7 @@ class FieldInstance(BaseHandler):
     """
     check_roles = 'admin'
     invalidate_cache = True
+    invalidate_cache_tags = ['questionnaires']
 
     def put(self, field_id):
         """
@@ -377,9 +377,8 @@ class ConfigHandler(BaseHandler):
 
     @inlineCallbacks
     def post(self):
-        yield State.process_supervisor.shutdown()
         yield try_to_enable_https(self.request.tid)
-        yield State.process_supervisor.maybe_launch_https_workers()
+        yield State.process_supervisor.reload_https_workers()
 
     @inlineCallbacks
     def put(self):
@@ -387,14 +386,12 @@ class ConfigHandler(BaseHandler):
         Disables HTTPS config and shutdown subprocesses.
         """
         yield disable_https(self.request.tid)
-        yield State.process_supervisor.shutdown()
-        yield State.process_supervisor.maybe_launch_https_workers()
+        yield State.process_supervisor.reload_https_workers()
 
     @inlineCallbacks
     def delete(self):
         yield reset_https_config(self.request.tid)
-        yield State.process_supervisor.shutdown()
-        yield State.process_supervisor.maybe_launch_https_workers()
+        yield State.process_supervisor.reload_https_workers()
 
 
 class CSRFileHandler(FileHandler):
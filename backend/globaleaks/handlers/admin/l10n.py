@@ -36,6 +36,7 @@ def update(session, tid, lang, request):
 class AdminL10NHandler(BaseHandler):
     check_roles = 'admin'
     invalidate_cache = True
+    invalidate_cache_tags = ['l10n:{lang}']
 
     def get(self, lang):
         return get(self.request.tid, lang)
@@ -113,7 +113,9 @@ def update_node(*args):
 class NodeInstance(BaseHandler):
     check_roles = 'admin'
     cache_resource = True
+    cache_tags = ['node', 'files']
     invalidate_cache = True
+    invalidate_cache_tags = ['node']
 
     def get(self):
         """
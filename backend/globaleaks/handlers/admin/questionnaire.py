@@ -112,7 +112,9 @@ def update_questionnaire(session, tid, questionnaire_id, request, language):
 class QuestionnairesCollection(BaseHandler):
     check_roles = 'admin'
     cache_resource = True
+    cache_tags = ['questionnaires']
     invalidate_cache = True
+    invalidate_cache_tags = ['questionnaires']
 
     def get(self):
         """
@@ -136,6 +138,7 @@ class QuestionnairesCollection(BaseHandler):
 class QuestionnaireInstance(BaseHandler):
     check_roles = 'admin'
     invalidate_cache = True
+    invalidate_cache_tags = ['questionnaires', 'contexts']
 
     def put(self, questionnaire_id):
         """
@@ -52,6 +52,7 @@ def update_receiver(session, tid, receiver_id, request, language):
 class ReceiversCollection(BaseHandler):
     check_roles = 'admin'
     cache_resource = True
+    cache_tags = ['users', 'contexts']
 
     def get(self):
         """
@@ -63,6 +64,7 @@ class ReceiversCollection(BaseHandler):
 class ReceiverInstance(BaseHandler):
     check_roles = 'admin'
     invalidate_cache = True
+    invalidate_cache_tags = ['users']
 
     def put(self, receiver_id):
         """
@@ -34,7 +34,9 @@ def create_shorturl(session, tid, request):
 class ShortURLCollection(BaseHandler):
     check_roles = 'admin'
     cache_resource = True
+    cache_tags = ['shorturls']
     invalidate_cache = True
+    invalidate_cache_tags = ['shorturls']
 
     def get(self):
         """
@@ -53,6 +55,8 @@ class ShortURLCollection(BaseHandler):
 
 class ShortURLInstance(BaseHandler):
     check_roles = 'admin'
+    invalidate_cache = True
+    invalidate_cache_tags = ['shorturls']
 
     def delete(self, shorturl_id):
         """
@@ -6,7 +6,8 @@ from datetime import timedelta
 from globaleaks.event import events_monitored
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.models import Stats, Anomalies
-from globaleaks.orm import transact
+from globaleaks.orm import transact, get_transactions_stats
+from globaleaks.rest.apicache import ApiCache
 from globaleaks.state import State
 from globaleaks.utils.utility import datetime_to_ISO8601, datetime_now, \
     iso_to_gregorian
@@ -187,7 +188,28 @@ class JobsTiming(BaseHandler):
         for job in State.jobs:
             response.append({
               'name': job.name,
-              'timings': job.last_executions
+              'timings': job.last_executions,
+              'report': job.report
             })
 
         return response
+
+
+class TransactionsTiming(BaseHandler):
+    """
+    This handler return the timing statistics of the database transactions
+    """
+    check_roles = 'admin'
+
+    def get(self):
+        return get_transactions_stats()
+
+
+class ApiCacheStats(BaseHandler):
+    """
+    This handler return the statistics of the cache of the API
+    """
+    check_roles = 'admin'
+
+    def get(self):
+        return ApiCache.get_stats(None if self.request.tid == 1 else self.request.tid)
@@ -104,7 +104,9 @@ class StepCollection(OperationHandler):
     """
     check_roles = 'admin'
     cache_resource = True
+    cache_tags = ['questionnaires']
     invalidate_cache = True
+    invalidate_cache_tags = ['questionnaires']
 
     def post(self):
         """
@@ -139,6 +141,7 @@ class StepInstance(BaseHandler):
     """
     check_roles = 'admin'
     invalidate_cache = True
+    invalidate_cache_tags = ['questionnaires']
 
     def put(self, step_id):
         """
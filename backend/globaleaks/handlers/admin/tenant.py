@@ -104,8 +104,10 @@ def delete(session, id):
 class TenantCollection(BaseHandler):
     check_roles = 'admin'
     cache_resource = True
+    cache_tags = ['tenants']
     root_tenant_only = True
     invalidate_cache = True
+    invalidate_cache_tags = ['tenants']
     invalidate_tenant_states = True
 
     def get(self):
@@ -183,7 +183,9 @@ def get_user_list(session, tid, language):
 class UsersCollection(BaseHandler):
     check_roles = 'admin'
     cache_resource = True
+    cache_tags = ['users', 'contexts']
     invalidate_cache = True
+    invalidate_cache_tags = ['users']
 
     def get(self):
         """
@@ -204,6 +206,7 @@ class UsersCollection(BaseHandler):
 class UserInstance(BaseHandler):
     check_roles = 'admin'
     invalidate_cache = True
+    invalidate_cache_tags = ['users', 'contexts']
 
     def put(self, user_id):
         """
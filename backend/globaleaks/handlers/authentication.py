@@ -3,12 +3,13 @@
 # Handlers dealing with platform authentication
 from random import SystemRandom
 from six import text_type
+from sqlalchemy import bindparam
 from twisted.internet.defer import inlineCallbacks, returnValue
 
 from globaleaks.utils import security
 from globaleaks.handlers.base import BaseHandler, Sessions, new_session
 from globaleaks.models import InternalTip, User
-from globaleaks.orm import transact
+from globaleaks.orm import cached_query, transact
 from globaleaks.rest import errors, requests
 from globaleaks.settings import Settings
 from globaleaks.state import State
@@ -43,11 +44,24 @@ def random_login_delay():
     return 0
 
 
+query_wbtip_by_receipt_hash = cached_query(lambda session: session.query(InternalTip)
+                                                                  .filter(InternalTip.receipt_hash == bindparam('receipt_hash'),
+                                                                          InternalTip.tid == bindparam('tid')))
+
+query_user_by_token = cached_query(lambda session: session.query(User)
+                                                          .filter(User.auth_token == bindparam('token'),
+                                                                  User.state != u'disabled',
+                                                                  User.tid == bindparam('tid')))
+
+query_user_by_username = cached_query(lambda session: session.query(User)
+                                                             .filter(User.username == bindparam('username'),
+                                                                     User.state != u'disabled',
+                                                                     User.tid == bindparam('tid')))
+
+
 def db_get_wbtip_by_receipt(session, tid, receipt):
     hashed_receipt = security.hash_password(receipt, State.tenant_cache[tid].receipt_salt)
-    return session.query(InternalTip) \
-                  .filter(InternalTip.receipt_hash == text_type(hashed_receipt, 'utf-8'),
-                          InternalTip.tid == tid).one_or_none()
+    return query_wbtip_by_receipt_hash(session, receipt_hash=text_type(hashed_receipt, 'utf-8'), tid=tid).one_or_none()
 
 
 @transact
@@ -78,13 +92,9 @@ def login(session, tid, username, password, client_using_tor, token=''):
     login returns a tuple (user_id, state, pcn)
     """
     if token:
-        user = session.query(User).filter(User.auth_token == token, \
-                                          User.state != u'disabled', \
-                                          User.tid == tid).one_or_none()
+        user = query_user_by_token(session, token=token, tid=tid).one_or_none()
     else:
-        user = session.query(User).filter(User.username == username, \
-                                          User.state != u'disabled', \
-                                          User.tid == tid).one_or_none()
+        user = query_user_by_username(session, username=username, tid=tid).one_or_none()
 
     if user is None or (not token and not security.check_password(password, user.salt, user.password)):
         log.debug("Login: Invalid credentials")
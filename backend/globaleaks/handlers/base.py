@@ -2,7 +2,6 @@
 #
 # Base class for all the handlers
 import base64
-import collections
 import copy
 import json
 import mimetypes
@@ -18,6 +17,7 @@ from twisted.internet.defer import inlineCallbacks
 
 from globaleaks.event import track_handler
 from globaleaks.rest import errors, requests
+from globaleaks.rest.validator import get_type_validator, get_validator
 from globaleaks.utils.securetempfile import SecureTemporaryFile
 from globaleaks.utils.security import generateRandomKey, sha512
 from globaleaks.settings import Settings
@@ -120,8 +120,11 @@ class BaseHandler(object):
     handler_exec_time_threshold = HANDLER_EXEC_TIME_THRESHOLD
     uniform_answer_time = False
     cache_resource = False
+    cache_immutable = False
+    cache_tags = []
     invalidate_global_cache = False
     invalidate_cache = False
+    invalidate_cache_tags = []
     invalidate_tenant_states = False
     bypass_basic_auth = False
     root_tenant_only = False
@@ -238,41 +241,7 @@ class BaseHandler(object):
 
     @staticmethod
     def validate_type(value, type):
-        retval = False
-
-        if value is None:
-            log.err("-- Invalid python_type, in [%s] expected %s", value, type)
-
-        # if it's callable, than assumes is a primitive class
-        elif callable(type):
-            retval = BaseHandler.validate_python_type(value, type)
-            if not retval:
-                log.err("-- Invalid python_type, in [%s] expected %s", value, type)
-
-        # value as "{foo:bar}"
-        elif isinstance(type, collections.Mapping):
-            retval = BaseHandler.validate_jmessage(value, type)
-            if not retval:
-                log.err("-- Invalid JSON/dict [%s] expected %s", value, type)
-
-        # regexp
-        elif isinstance(type, str):
-            retval = BaseHandler.validate_regexp(value, type)
-            if not retval:
-                log.err("-- Failed Match in regexp [%s] against %s", value, type)
-
-        # value as "[ type ]"
-        elif isinstance(type, collections.Iterable):
-            # empty list is ok
-            if not value:
-                retval = True
-
-            else:
-                retval = all(BaseHandler.validate_type(x, type[0]) for x in value)
-                if not retval:
-                    log.err("-- List validation failed [%s] of %s", value, type)
-
-        return retval
+        return get_type_validator(type)(value)
 
     @staticmethod
     def validate_jmessage(jmessage, message_template):
@@ -280,70 +249,14 @@ class BaseHandler(object):
         Takes a string that represents a JSON messages and checks to see if it
         conforms to the message type it is supposed to be.
 
-        This message must be either a dict or a list. This function may be called
-        recursively to validate sub-parameters that are also go GLType.
+        This message must be either a dict or a list and the keys not included
+        in the message template are stripped.
 
         message: the message string that should be validated
 
         message_type: the GLType class it should match.
         """
-        if isinstance(message_template, dict):
-            success_check = 0
-            keys_to_strip = []
-            for key, value in jmessage.items():
-                if key not in message_template:
-                    # strip whatever is not validated
-                    #
-                    # reminder: it's not possible to raise an exception for the
-                    # in case more values are present because it's normal that the
-                    # client will send automatically more data.
-                    #
-                    # e.g. the client will always send 'creation_date' attributes of
-                    #      objects and attributes like this are present generally only
-                    #      from the second request on.
-                    #
-                    keys_to_strip.append(key)
-                    continue
-
-                if not BaseHandler.validate_type(value, message_template[key]):
-                    log.err("Received key %s: type validation fail", key)
-                    raise errors.InputValidationError("Key (%s) type validation failure" % key)
-                success_check += 1
-
-            for key in keys_to_strip:
-                del jmessage[key]
-
-            for key, value in message_template.items():
-                if key not in jmessage:
-                    log.debug("Key %s expected but missing!",  key)
-                    log.debug("Received schema %s - Expected %s",
-                              jmessage.keys(), message_template.keys())
-                    raise errors.InputValidationError("Missing key %s" % key)
-
-                if not BaseHandler.validate_type(jmessage[key], value):
-                    log.err("Expected key: %s type validation failure", key)
-                    raise errors.InputValidationError("Key (%s) double validation failure" % key)
-
-                if isinstance(message_template[key], dict) or isinstance(message_template[key], list):
-                    if message_template[key]:
-                        BaseHandler.validate_jmessage(jmessage[key], message_template[key])
-
-                success_check += 1
-
-            if success_check != len(message_template) * 2:
-                log.err("Success counter double check failure: %d", success_check)
-                raise errors.InputValidationError("Success counter double check failure")
-
-            return True
-
-        elif isinstance(message_template, list):
-            if not all(BaseHandler.validate_type(x, message_template[0]) for x in jmessage):
-                raise errors.InputValidationError("Not every element in %s is %s" %
-                                                (jmessage, message_template[0]))
-            return True
-
-        else:
-            raise errors.InputValidationError("invalid json massage: expected dict or list")
+        return get_validator(message_template)(jmessage)
 
     @staticmethod
     def validate_message(message, message_template):
@@ -8,42 +8,70 @@ from globaleaks.rest import requests
 from globaleaks.utils.utility import datetime_to_ISO8601, datetime_now
 
 
-def serialize_identityaccessrequest(session, tid, identityaccessrequest):
-    itip, user = session.query(models.InternalTip, models.User) \
-                      .filter(models.InternalTip.id == models.ReceiverTip.internaltip_id,
-                              models.ReceiverTip.id == identityaccessrequest.receivertip_id,
-                              models.ReceiverTip.receiver_id == models.User.id,
-                              models.User.tid == tid).one()
-
-    reply_user = session.query(models.User) \
-                      .filter(models.User.id == identityaccessrequest.reply_user_id,
-                              models.User.tid == tid).one_or_none()
+def db_prepare_identityaccessrequests_serialization(session, tid, iars):
+    data = {'rtips': {}, 'reply_users': set()}
+
+    rtips_ids = set(iar.receivertip_id for iar in iars)
+    reply_users_ids = set(iar.reply_user_id for iar in iars if iar.reply_user_id is not None)
+
+    if rtips_ids:
+        for rtip_id, creation_date, user_name in session.query(models.ReceiverTip.id, models.InternalTip.creation_date, models.User.name) \
+                                                        .filter(models.InternalTip.id == models.ReceiverTip.internaltip_id,
+                                                                models.ReceiverTip.id.in_(rtips_ids),
+                                                                models.ReceiverTip.receiver_id == models.User.id,
+                                                                models.User.tid == tid):
+            data['rtips'][rtip_id] = (creation_date, user_name)
+
+    if reply_users_ids:
+        data['reply_users'] = set(x[0] for x in session.query(models.User.id)
+                                                       .filter(models.User.id.in_(reply_users_ids),
+                                                               models.User.tid == tid))
+
+    return data
+
+
+def serialize_identityaccessrequest(session, tid, identityaccessrequest, data=None):
+    if data is None:
+        data = db_prepare_identityaccessrequests_serialization(session, tid, [identityaccessrequest])
+
+    submission_date, request_user_name = data['rtips'][identityaccessrequest.receivertip_id]
+
+    reply_user_id = identityaccessrequest.reply_user_id
+
     return {
         'id': identityaccessrequest.id,
         'receivertip_id': identityaccessrequest.receivertip_id,
         'request_date': datetime_to_ISO8601(identityaccessrequest.request_date),
-        'request_user_name': user.name,
+        'request_user_name': request_user_name,
         'request_motivation': identityaccessrequest.request_motivation,
         'reply_date': datetime_to_ISO8601(identityaccessrequest.reply_date),
-        'reply_user_name': reply_user.id if reply_user is not None else '',
+        'reply_user_name': reply_user_id if reply_user_id in data['reply_users'] else '',
         'reply': identityaccessrequest.reply,
         'reply_motivation': identityaccessrequest.reply_motivation,
-        'submission_date': datetime_to_ISO8601(itip.creation_date)
+        'submission_date': datetime_to_ISO8601(submission_date)
     }
 
 
+def db_serialize_identityaccessrequest_list(session, tid, iars):
+    data = db_prepare_identityaccessrequests_serialization(session, tid, iars)
+
+    return [serialize_identityaccessrequest(session, tid, iar, data) for iar in iars]
+
 
 def db_get_identityaccessrequest_list(session, tid, rtip_id):
-    return [serialize_identityaccessrequest(session, tid, iar) for iar in session.query(models.IdentityAccessRequest).filter(models.IdentityAccessRequest.receivertip_id == rtip_id)]
+    iars = session.query(models.IdentityAccessRequest).filter(models.IdentityAccessRequest.receivertip_id == rtip_id).all()
+
+    return db_serialize_identityaccessrequest_list(session, tid, iars)
 
 
 @transact
 def get_identityaccessrequest_list(session, tid):
-    return [serialize_identityaccessrequest(session, tid, iar)
-        for iar in session.query(models.IdentityAccessRequest).filter(models.IdentityAccessRequest.reply == u'pending',
-                                                                      models.IdentityAccessRequest.receivertip_id == models.ReceiverTip.id,
-                                                                      models.ReceiverTip.internaltip_id == models.InternalTip.id,
-                                                                      models.InternalTip.tid == tid)]
+    iars = session.query(models.IdentityAccessRequest).filter(models.IdentityAccessRequest.reply == u'pending',
+                                                              models.IdentityAccessRequest.receivertip_id == models.ReceiverTip.id,
+                                                              models.ReceiverTip.internaltip_id == models.InternalTip.id,
+                                                              models.InternalTip.tid == tid).all()
+
+    return db_serialize_identityaccessrequest_list(session, tid, iars)
 
 
 @transact
@@ -1,42 +1,137 @@
 # -*- coding: utf-8 -*-
 #
 # Handlers dealing with download of texts translations and customiations
+import json
 import os
+import threading
 
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
-from globaleaks.orm import transact
+from globaleaks.orm import transact_ro
 from globaleaks.rest import errors
-from globaleaks.utils.security import directory_traversal_check
+from globaleaks.utils.security import directory_traversal_check, sha256
 from globaleaks.settings import Settings
-from globaleaks.utils.utility import read_json_file
+from globaleaks.utils.utility import read_file
 
 
 def langfile_path(lang):
     return os.path.abspath(os.path.join(Settings.client_path, 'l10n', '%s.json' % lang))
 
 
-@transact
-def get_l10n(session, tid, lang):
-    path = langfile_path(lang)
-    directory_traversal_check(Settings.client_path, path)
+class L10NBase(object):
+    """
+    The translations distributed with the client parsed once and shared by
+    all the tenants; the texts returned should never be modified.
 
-    if not os.path.exists(path):
-        raise errors.ResourceNotFound()
+    Every translation is identified by a version derived from its content
+    so that it can be served as an immutable resource.
+    """
+    texts = {}
+    versions = {}
+    lock = threading.Lock()
 
-    texts = read_json_file(path)
+    @classmethod
+    def load_lang(cls, lang):
+        if lang not in cls.texts:
+            path = langfile_path(lang)
+            directory_traversal_check(Settings.client_path, path)
 
-    custom_texts = session.query(models.CustomTexts).filter(models.CustomTexts.lang == lang, models.CustomTexts.tid == tid).one_or_none()
-    custom_texts = custom_texts.texts if custom_texts is not None else {}
+            if not os.path.exists(path):
+                raise errors.ResourceNotFound()
+
+            data = read_file(path)
+
+            cls.texts[lang] = json.loads(data)
+            cls.versions[lang] = sha256(data)[:16].decode()
+
+    @classmethod
+    def get(cls, lang):
+        with cls.lock:
+            cls.load_lang(lang)
+            return cls.texts[lang]
+
+    @classmethod
+    def get_version(cls, lang):
+        with cls.lock:
+            cls.load_lang(lang)
+            return cls.versions[lang]
+
+    @classmethod
+    def get_versions(cls, langs):
+        """
+        Return the versions of the translations available among the ones
+        of the specified languages
+        """
+        ret = {}
+
+        for lang in langs:
+            try:
+                ret[lang] = cls.get_version(lang)
+            except errors.ResourceNotFound:
+                pass
 
-    texts.update(custom_texts)
+        return ret
+
+    @classmethod
+    def load(cls, langs):
+        cls.get_versions(langs)
+
+
+@transact_ro
+def get_l10n(session, tid, lang):
+    texts = L10NBase.get(lang)
+
+    custom_texts = session.query(models.CustomTexts).filter(models.CustomTexts.lang == lang, models.CustomTexts.tid == tid).one_or_none()
+    if custom_texts is not None and custom_texts.texts:
+        # Only the customized tenants need their own copy of the texts
+        texts = dict(texts)
+        texts.update(custom_texts.texts)
 
     return texts
 
 
+@transact_ro
+def get_l10n_custom_texts(session, tid, lang):
+    custom_texts = session.query(models.CustomTexts).filter(models.CustomTexts.lang == lang, models.CustomTexts.tid == tid).one_or_none()
+
+    return custom_texts.texts if custom_texts is not None else {}
+
+
 class L10NHandler(BaseHandler):
     check_roles = '*'
     cache_resource = True
+    cache_tags = ['l10n:{lang}']
 
     def get(self, lang):
         return get_l10n(self.request.tid, lang)
+
+
+class L10NBaseHandler(BaseHandler):
+    """
+    Serve the translations distributed with the client, that are the same
+    for all the tenants, at an address including their version so that the
+    clients can store them forever.
+    """
+    check_roles = '*'
+    cache_resource = True
+    cache_immutable = True
+    cache_tags = ['l10n_base:{lang}']
+
+    def get(self, lang, version):
+        if version != L10NBase.get_version(lang):
+            raise errors.ResourceNotFound()
+
+        return L10NBase.get(lang)
+
+
+class L10NCustomHandler(BaseHandler):
+    """
+    Serve only the texts customized by the tenant, to be applied by the
+    clients over the translations served by L10NBaseHandler.
+    """
+    check_roles = '*'
+    cache_resource = True
+    cache_tags = ['l10n:{lang}']
+
+    def get(self, lang):
+        return get_l10n_custom_texts(self.request.tid, lang)
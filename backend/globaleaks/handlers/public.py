@@ -1,19 +1,49 @@
 # -*- coding: utf-8 -*-
 #
 # Handlers dealing with public API exporting main platform configuration/resources
+import base64
 import copy
 
+from twisted.internet.defer import inlineCallbacks, returnValue
+
 from globaleaks import models, LANGUAGES_SUPPORTED, LANGUAGES_SUPPORTED_CODES
 from globaleaks.handlers.admin.file import db_get_file
+from globaleaks.handlers.admin.modelimgs import model_map
 from globaleaks.handlers.base import BaseHandler
+from globaleaks.handlers.l10n import L10NBase
 from globaleaks.models.config import ConfigFactory, NodeL10NFactory
-from globaleaks.orm import transact
+from globaleaks.orm import transact_ro
+from globaleaks.rest import errors
 from globaleaks.state import State
+from globaleaks.utils.security import sha256
 from globaleaks.utils.sets import merge_dicts
 from globaleaks.utils.structures import get_localized_values
 
 special_fields = ['whistleblower_identity']
 
+# Content type of the files that are referenced by the public resources
+media_files = {
+    'logo': 'image/png',
+    'favicon': 'image/x-icon',
+    'css': 'text/css',
+    'script': 'application/javascript'
+}
+
+
+def media_version(data):
+    return sha256(data)[:16].decode()
+
+
+def media_url(kind, id, data):
+    """
+    Return the address of the image or file with the specified content or
+    an empty string if the content is empty
+    """
+    if not data:
+        return ''
+
+    return 'media/%s/%s/%s' % (kind, id, media_version(data))
+
 
 def db_prepare_contexts_serialization(session, contexts):
     data = {'imgs': {}, 'receivers': {}}
@@ -22,7 +52,7 @@ def db_prepare_contexts_serialization(session, contexts):
 
     if contexts_ids:
         for o in session.query(models.ContextImg).filter(models.ContextImg.id.in_(contexts_ids)):
-            data['imgs'][o.id] = o.data
+            data['imgs'][o.id] = media_url('contexts', o.id, o.data)
 
         for o in session.query(models.ReceiverContext).filter(models.ReceiverContext.context_id.in_(contexts_ids)).order_by(models.ReceiverContext.presentation_order):
             if o.context_id not in data['receivers']:
@@ -43,7 +73,7 @@ def db_prepare_receivers_serialization(session, receivers):
             data['users'][o.id] = o
 
         for o in session.query(models.UserImg).filter(models.UserImg.id.in_(receivers_ids)):
-            data['imgs'][o.id] = o.data
+            data['imgs'][o.id] = media_url('users', o.id, o.data)
 
     return data
 
@@ -112,18 +142,20 @@ def db_serialize_node(session, tid, language):
 
     node = ConfigFactory(session, tid, 'public_node').serialize()
 
+    languages_enabled = models.EnabledLanguage.list(session, tid) if node['wizard_done'] else list(LANGUAGES_SUPPORTED_CODES)
+
     misc_dict = {
-        'languages_enabled': models.EnabledLanguage.list(session, tid) if node['wizard_done'] else list(LANGUAGES_SUPPORTED_CODES),
+        'languages_enabled': languages_enabled,
+        'l10n_versions': L10NBase.get_versions(languages_enabled) if node['wizard_done'] else {},
         'languages_supported': LANGUAGES_SUPPORTED,
         'configured': configured,
         'accept_submissions': State.accept_submissions,
-        'logo': db_get_file(session, tid, u'logo'),
-        'favicon': db_get_file(session, tid, u'favicon'),
-        'css': db_get_file(session, tid, u'css'),
-        'homepage': db_get_file(session, tid, u'homepage'),
-        'script': db_get_file(session, tid, u'script')
+        'homepage': db_get_file(session, tid, u'homepage')
     }
 
+    for id in media_files:
+        misc_dict[id] = media_url('files', id, db_get_file(session, tid, id))
+
     l10n_dict = NodeL10NFactory(session, tid).localized_dict(language)
 
     return merge_dicts(node, l10n_dict, misc_dict)
@@ -366,7 +398,7 @@ def db_get_public_receiver_list(session, tid, language):
     return ret
 
 
-@transact
+@transact_ro
 def get_public_resources(session, tid, language):
     return {
         'node': db_serialize_node(session, tid, language),
@@ -376,12 +408,52 @@ def get_public_resources(session, tid, language):
     }
 
 
+@transact_ro
+def get_media(session, tid, kind, id, version):
+    if kind == 'files':
+        data = db_get_file(session, tid, id) if id in media_files else ''
+        content_type = media_files.get(id)
+    else:
+        model = models.Context if kind == 'contexts' else models.User
+        data = session.query(model_map[kind].data).filter(model_map[kind].id == id,
+                                                          model.id == id,
+                                                          model.tid == tid).scalar()
+        content_type = 'image/png'
+
+    # Only the current content is served at the address of a version
+    if not data or media_version(data) != version:
+        raise errors.ResourceNotFound()
+
+    return content_type, base64.b64decode(data)
+
+
 class PublicResource(BaseHandler):
     check_roles = '*'
     cache_resource = True
+    cache_tags = ['node', 'contexts', 'questionnaires', 'users', 'files']
 
     def get(self):
         """
         Get all the public resources.
         """
         return get_public_resources(self.request.tid, self.request.language)
+
+
+class MediaHandler(BaseHandler):
+    """
+    Serve the images and the files referenced by the public resources at
+    addresses including the version of their content so that the clients
+    can store them forever.
+    """
+    check_roles = '*'
+    cache_resource = True
+    cache_immutable = True
+    cache_tags = ['{kind}']
+
+    @inlineCallbacks
+    def get(self, kind, id, version):
+        content_type, data = yield get_media(self.request.tid, kind, id, version)
+
+        self.request.setHeader(b'content-type', content_type)
+
+        returnValue(data)
@@ -1,15 +1,16 @@
 # -*- coding: utf-8 -*-
 #
 # API handling recipient user functionalities
+from sqlalchemy.orm import undefer
 from sqlalchemy.sql.expression import func, distinct
 
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.handlers.rtip import db_postpone_expiration_date, db_delete_itip
-from globaleaks.handlers.submission import db_serialize_archived_preview_schema
+from globaleaks.handlers.submission import db_get_archived_preview_schemas
 from globaleaks.handlers.user import db_user_update_user
 from globaleaks.handlers.user import user_serialize_user
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import requests, errors
 from globaleaks.state import State
 from globaleaks.utils.structures import get_localized_values
@@ -37,7 +38,7 @@ def receiver_serialize_receiver(session, tid, receiver, user, language):
     return get_localized_values(ret_dict, receiver, receiver.localized_keys, language)
 
 
-@transact
+@transact_ro
 def get_receiver_settings(session, tid, receiver_id, language):
     receiver, user = session.query(models.Receiver, models.User) \
                             .filter(models.Receiver.id == receiver_id,
@@ -61,13 +62,13 @@ def update_receiver_settings(session, state, tid, receiver_id, request, language
     return receiver_serialize_receiver(session, tid, receiver, user, language)
 
 
-@transact
+@transact_ro
 def get_receivertip_list(session, tid, receiver_id, language):
     rtip_summary_list = []
 
     rtips = session.query(models.ReceiverTip).filter(models.ReceiverTip.receiver_id == receiver_id,
                                                      models.ReceiverTip.internaltip_id == models.InternalTip.id,
-                                                     models.InternalTip.tid == tid)
+                                                     models.InternalTip.tid == tid).all()
 
     itips_ids = [rtip.internaltip_id for rtip in rtips]
 
@@ -75,17 +76,19 @@ def get_receivertip_list(session, tid, receiver_id, language):
         return []
 
     itips_by_id = {}
-    aqs_by_itip = {}
     comments_by_itip = {}
     internalfiles_by_itip = {}
     messages_by_rtip = {}
 
-    for itip, archivedschema in session.query(models.InternalTip, models.ArchivedSchema) \
-                                     .filter(models.InternalTip.id.in_(itips_ids),
-                                             models.ArchivedSchema.hash == models.InternalTip.questionnaire_hash,
-                                             models.InternalTip.tid == tid):
+    for itip in session.query(models.InternalTip) \
+                       .options(undefer('preview')) \
+                       .filter(models.InternalTip.id.in_(itips_ids),
+                               models.InternalTip.tid == tid):
         itips_by_id[itip.id] = itip
-        aqs_by_itip[itip.id] = archivedschema
+
+    previews_by_hash = db_get_archived_preview_schemas(session,
+                                                       set(itip.questionnaire_hash for itip in itips_by_id.values()),
+                                                       language)
 
     result = session.query(models.ReceiverTip.id, func.count(distinct(models.Message.id))) \
                     .filter(models.ReceiverTip.receiver_id == receiver_id,
@@ -108,7 +111,6 @@ def get_receivertip_list(session, tid, receiver_id, language):
 
     for rtip in rtips:
         internaltip = itips_by_id[rtip.internaltip_id]
-        archivedschema = aqs_by_itip[rtip.internaltip_id]
 
         rtip_summary_list.append({
             'id': rtip.id,
@@ -125,7 +127,7 @@ def get_receivertip_list(session, tid, receiver_id, language):
             'comment_count': comments_by_itip.get(internaltip.id, 0),
             'message_count': messages_by_rtip.get(rtip.id, 0),
             'https': internaltip.https,
-            'preview_schema': db_serialize_archived_preview_schema(session, archivedschema.preview, language),
+            'preview_schema': previews_by_hash[internaltip.questionnaire_hash],
             'preview': internaltip.preview,
             'total_score': internaltip.total_score,
             'label': rtip.label
@@ -5,8 +5,9 @@ import os
 import string
 
 from six import text_type
+from sqlalchemy import bindparam
 from twisted.internet import threads
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet.defer import inlineCallbacks, returnValue
 
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
@@ -14,7 +15,7 @@ from globaleaks.handlers.custodian import serialize_identityaccessrequest, db_ge
 from globaleaks.handlers.operation import OperationHandler
 from globaleaks.handlers.submission import serialize_usertip
 from globaleaks.models import serializers
-from globaleaks.orm import transact
+from globaleaks.orm import cached_query, transact, transact_ro
 from globaleaks.rest import errors, requests
 from globaleaks.settings import Settings
 from globaleaks.utils.security import directory_traversal_check
@@ -22,10 +23,11 @@ from globaleaks.state import State
 from globaleaks.utils.utility import log, get_expiration, datetime_now, datetime_never, \
     datetime_to_ISO8601
 
-def receiver_serialize_rfile(session, rfile):
-    ifile = session.query(models.InternalFile) \
-                   .filter(models.InternalFile.id == models.ReceiverFile.internalfile_id,
-                           models.ReceiverFile.id == rfile.id).one()
+def receiver_serialize_rfile(session, rfile, ifile=None):
+    if ifile is None:
+        ifile = session.query(models.InternalFile) \
+                       .filter(models.InternalFile.id == models.ReceiverFile.internalfile_id,
+                               models.ReceiverFile.id == rfile.id).one()
 
     if rfile.status == 'unavailable':
         return {
@@ -54,8 +56,9 @@ def receiver_serialize_rfile(session, rfile):
     }
 
 
-def receiver_serialize_wbfile(session, wbfile):
-    rtip = models.db_get(session, models.ReceiverTip, models.ReceiverTip.id == wbfile.receivertip_id)
+def receiver_serialize_wbfile(session, wbfile, receiver_id=None):
+    if receiver_id is None:
+        receiver_id = models.db_get(session, models.ReceiverTip, models.ReceiverTip.id == wbfile.receivertip_id).receiver_id
 
     return {
         'id': wbfile.id,
@@ -65,18 +68,46 @@ def receiver_serialize_wbfile(session, wbfile):
         'size': wbfile.size,
         'content_type': wbfile.content_type,
         'downloads': wbfile.downloads,
-        'author': rtip.receiver_id
+        'author': receiver_id
     }
 
 
-def serialize_comment(session, comment):
+def db_prepare_comments_serialization(session, comments):
+    data = {'authors': {}}
+
+    authors_ids = set(c.author_id for c in comments if c.author_id is not None)
+
+    if authors_ids:
+        for user_id, name in session.query(models.User.id, models.User.name).filter(models.User.id.in_(authors_ids)):
+            data['authors'][user_id] = name
+
+    return data
+
+
+def db_prepare_messages_serialization(session, messages):
+    data = {'authors': {}}
+
+    rtips_ids = set(m.receivertip_id for m in messages if m.type != 'whistleblower')
+
+    if rtips_ids:
+        for rtip_id, name in session.query(models.ReceiverTip.id, models.User.name) \
+                                    .filter(models.ReceiverTip.id.in_(rtips_ids),
+                                            models.User.id == models.ReceiverTip.receiver_id):
+            data['authors'][rtip_id] = name
+
+    return data
+
+
+def serialize_comment(session, comment, data=None):
     author = 'Recipient'
 
     if comment.type == 'whistleblower':
         author = 'Whistleblower'
     elif comment.author_id is not None:
-        author = session.query(models.User) \
-                        .filter(models.User.id == comment.author_id).one().name
+        if data is None:
+            data = db_prepare_comments_serialization(session, [comment])
+
+        author = data['authors'][comment.author_id]
 
     return {
         'id': comment.id,
@@ -87,14 +118,14 @@ def serialize_comment(session, comment):
     }
 
 
-def serialize_message(session, message):
+def serialize_message(session, message, data=None):
     if message.type == 'whistleblower':
         author = 'Whistleblower'
     else:
-        author = session.query(models.User) \
-                        .filter(models.User.id == models.ReceiverTip.receiver_id,
-                                models.ReceiverTip.id == models.Message.receivertip_id,
-                                models.Message.id == message.id).one().name
+        if data is None:
+            data = db_prepare_messages_serialization(session, [message])
+
+        author = data['authors'][message.receivertip_id]
 
     return {
         'id': message.id,
@@ -123,13 +154,19 @@ def serialize_rtip(session, rtip, itip, language):
     return ret
 
 
+query_rtip = cached_query(lambda session: session.query(models.ReceiverTip, models.InternalTip)
+                                                 .filter(models.ReceiverTip.id == bindparam('rtip_id'),
+                                                         models.ReceiverTip.receiver_id == bindparam('user_id'),
+                                                         models.ReceiverTip.internaltip_id == models.InternalTip.id,
+                                                         models.InternalTip.tid == bindparam('tid')))
+
+
 def db_access_rtip(session, tid, user_id, rtip_id):
-    return models.db_get(session,
-                         (models.ReceiverTip, models.InternalTip),
-                         models.ReceiverTip.id == rtip_id,
-                         models.ReceiverTip.receiver_id == user_id,
-                         models.ReceiverTip.internaltip_id == models.InternalTip.id,
-                         models.InternalTip.tid == tid)
+    ret = query_rtip(session, rtip_id=rtip_id, user_id=user_id, tid=tid).one_or_none()
+    if ret is None:
+        raise errors.ModelNotFound((models.ReceiverTip, models.InternalTip))
+
+    return ret
 
 
 def db_access_wbfile(session, tid, user_id, wbfile_id):
@@ -153,27 +190,22 @@ def db_access_wbfile(session, tid, user_id, wbfile_id):
 
 
 def db_receiver_get_rfile_list(session, tid, rtip_id):
-    rfiles = session.query(models.ReceiverFile) \
+    rfiles = session.query(models.ReceiverFile, models.InternalFile) \
                     .filter(models.ReceiverFile.receivertip_id == models.ReceiverTip.id,
+                            models.ReceiverFile.internalfile_id == models.InternalFile.id,
                             models.ReceiverTip.id == rtip_id,
                             models.ReceiverTip.internaltip_id == models.InternalTip.id,
                             models.InternalTip.tid == tid)
 
-    return [receiver_serialize_rfile(session, rfile) for rfile in rfiles]
+    return [receiver_serialize_rfile(session, rfile, ifile) for rfile, ifile in rfiles]
 
 
 def db_receiver_get_wbfile_list(session, tid, itip_id):
-    rtips = session.query(models.ReceiverTip) \
-                   .filter(models.ReceiverTip.internaltip_id == itip_id)
+    wbfiles = session.query(models.WhistleblowerFile, models.ReceiverTip.receiver_id) \
+                     .filter(models.WhistleblowerFile.receivertip_id == models.ReceiverTip.id,
+                             models.ReceiverTip.internaltip_id == itip_id)
 
-    rtips_ids = [rt.id for rt in rtips]
-
-    wbfiles = []
-    if rtips_ids:
-        wbfiles = session.query(models.WhistleblowerFile) \
-                        .filter(models.WhistleblowerFile.receivertip_id.in_(rtips_ids))
-
-    return [receiver_serialize_wbfile(session, wbfile) for wbfile in wbfiles]
+    return [receiver_serialize_wbfile(session, wbfile, receiver_id) for wbfile, receiver_id in wbfiles]
 
 
 @transact
@@ -206,11 +238,15 @@ def receiver_get_rfile_list(session, tid, rtip_id):
 def db_get_rtip(session, tid, user_id, rtip_id, language):
     rtip, itip = db_access_rtip(session, tid, user_id, rtip_id)
 
+    return serialize_rtip(session, rtip, itip, language)
+
+
+def db_register_rtip_access(session, tid, user_id, rtip_id):
+    rtip, _ = db_access_rtip(session, tid, user_id, rtip_id)
+
     rtip.access_counter += 1
     rtip.last_access = datetime_now()
 
-    return serialize_rtip(session, rtip, itip, language)
-
 
 def db_mark_file_for_secure_deletion(session, relpath):
     abspath = os.path.join(Settings.attachments_path, relpath)
@@ -317,12 +353,32 @@ def set_receivertip_variable(session, tid, user_id, rtip_id, key, value):
 
 
 @transact
-def get_rtip(session, tid, user_id, rtip_id, language):
+def register_rtip_access(session, tid, user_id, rtip_id):
+    return db_register_rtip_access(session, tid, user_id, rtip_id)
+
+
+@transact_ro
+def serialize_rtip_by_id(session, tid, user_id, rtip_id, language):
     return db_get_rtip(session, tid, user_id, rtip_id, language)
 
 
+@inlineCallbacks
+def get_rtip(tid, user_id, rtip_id, language):
+    # The access is registered by the writer while the serialization of the
+    # tip, that is the expensive part, is performed by a reader
+    yield register_rtip_access(tid, user_id, rtip_id)
+
+    rtip = yield serialize_rtip_by_id(tid, user_id, rtip_id, language)
+
+    returnValue(rtip)
+
+
 def db_get_itip_comment_list(session, tid, itip):
-    return [serialize_comment(session, comment) for comment in session.query(models.Comment).filter(models.Comment.internaltip_id == itip.id)]
+    comments = session.query(models.Comment).filter(models.Comment.internaltip_id == itip.id).all()
+
+    data = db_prepare_comments_serialization(session, comments)
+
+    return [serialize_comment(session, comment, data) for comment in comments]
 
 
 @transact
@@ -356,7 +412,11 @@ def create_comment(session, tid, user_id, rtip_id, request):
 
 
 def db_get_itip_message_list(session, tid, rtip):
-    return [serialize_message(session, message) for message in session.query(models.Message).filter(models.Message.receivertip_id == rtip.id)]
+    messages = session.query(models.Message).filter(models.Message.receivertip_id == rtip.id).all()
+
+    data = db_prepare_messages_serialization(session, messages)
+
+    return [serialize_message(session, message, data) for message in messages]
 
 
 @transact
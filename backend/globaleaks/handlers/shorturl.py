@@ -1,17 +1,23 @@
 # -*- coding: utf-8 -*-
 #
 # Handlers implementing the url shortener redirect
+from sqlalchemy import bindparam
 from twisted.internet.defer import inlineCallbacks
 
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
-from globaleaks.orm import transact
+from globaleaks.orm import cached_query, transact
 from globaleaks.rest import errors
 
 
+query_shorturl = cached_query(lambda session: session.query(models.ShortURL)
+                                                     .filter(models.ShortURL.shorturl == bindparam('shorturl'),
+                                                             models.ShortURL.tid == bindparam('tid')))
+
+
 @transact
 def translate_shorturl(session, tid, shorturl):
-    shorturl = session.query(models.ShortURL).filter(models.ShortURL.shorturl == shorturl, models.ShortURL.tid == tid).one_or_none()
+    shorturl = query_shorturl(session, shorturl=shorturl, tid=tid).one_or_none()
     if shorturl is None:
         raise errors.ResourceNotFound()
 
@@ -1,11 +1,158 @@
 # -*- coding: utf-8 -*-
 #
 # Handler exposing application files
+import mimetypes
 import os
+import re
+import stat
 
-from globaleaks.handlers.base import BaseHandler
+from twisted.web.http import datetimeToString, stringToDatetime
+
+from globaleaks.handlers.base import BaseHandler, FileProducer
 from globaleaks.rest import errors
-from globaleaks.utils.security import directory_traversal_check
+from globaleaks.rest.apicache import ApiCacheEntry, gzipdata, write_cache_entry
+from globaleaks.settings import Settings
+from globaleaks.utils.security import directory_traversal_check, sha256
+from globaleaks.utils.utility import log
+
+# Files carrying the hash of their content in their name (e.g. scripts.3f2a9c1d.js)
+# change address at every change and are served as immutable resources
+FINGERPRINT_REGEXP = re.compile(r'\.[a-f0-9]{8,}\.[a-z0-9]+$')
+
+# Extensions of the precompressed variants built together with the client
+PRECOMPRESSED_EXTENSIONS = {
+    'gzip': '.gz',
+    'br': '.br'
+}
+
+# Content types compressed in memory when the client is not built with their
+# precompressed variants
+COMPRESSIBLE_TYPES = re.compile(r'^(text/|application/(javascript|json|xml)|image/svg\+xml)')
+
+
+class StaticFile(ApiCacheEntry):
+    """
+    A client file with all its precompressed variants.
+
+    The variants of the files kept in memory are their content while the
+    variants of the larger files are the paths from which they are streamed.
+    """
+    __slots__ = ['mtime', 'file_size', 'in_memory']
+
+    def __init__(self, path, st, in_memory):
+        self.mtime = st.st_mtime
+        self.file_size = st.st_size
+        self.in_memory = in_memory
+        self.tags = frozenset()
+
+        content_type, encoding = mimetypes.guess_type(path)
+        if content_type is None or encoding is not None:
+            content_type = 'application/octet-stream'
+
+        self.content_type = content_type
+        self.variants = {'identity': path}
+
+        for coding, extension in PRECOMPRESSED_EXTENSIONS.items():
+            if os.path.isfile(path + extension):
+                self.variants[coding] = path + extension
+
+        if not in_memory:
+            self.etag = '%x-%x' % (int(self.mtime), self.file_size)
+            self.size = 0
+            return
+
+        for coding, x in list(self.variants.items()):
+            with open(x, 'rb') as f:
+                self.variants[coding] = f.read()
+
+        if 'gzip' not in self.variants and COMPRESSIBLE_TYPES.match(content_type):
+            self.variants['gzip'] = gzipdata(self.variants['identity'])
+
+        self.etag = sha256(self.variants['identity'])[:32].decode()
+        self.size = sum(len(x) for x in self.variants.values())
+
+    def is_current(self, st):
+        return self.mtime == st.st_mtime and self.file_size == st.st_size
+
+
+class StaticFileCache(object):
+    """
+    In-memory cache of the files of the client.
+
+    The files are loaded at the startup together with their precompressed
+    variants; the files larger than Settings.static_cache_file_max_size or
+    whose variants exceed the budget of Settings.static_cache_size are
+    streamed from the disk. Every file is reloaded as soon as its
+    modification is noticed.
+    """
+    # path -> StaticFile
+    files = {}
+
+    size = 0
+
+    @classmethod
+    def load(cls, path, st):
+        cls.remove(path)
+
+        f = None
+
+        if st.st_size <= Settings.static_cache_file_max_size:
+            # The budget is charged with all the variants of the file
+            f = StaticFile(path, st, True)
+            if cls.size + f.size > Settings.static_cache_size:
+                f = None
+
+        if f is None:
+            f = StaticFile(path, st, False)
+
+        cls.files[path] = f
+
+        cls.size += f.size
+
+        return f
+
+    @classmethod
+    def remove(cls, path):
+        f = cls.files.pop(path, None)
+        if f is not None:
+            cls.size -= f.size
+
+    @classmethod
+    def get(cls, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
+
+        if st is None or not stat.S_ISREG(st.st_mode):
+            cls.remove(path)
+            return
+
+        f = cls.files.get(path)
+        if f is None or not f.is_current(st):
+            f = cls.load(path, st)
+
+        return f
+
+    @classmethod
+    def preload(cls, root):
+        """
+        Load all the files contained in the specified directory
+        """
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                if os.path.splitext(filename)[1] in PRECOMPRESSED_EXTENSIONS.values():
+                    continue
+
+                try:
+                    cls.get(os.path.join(dirpath, filename))
+                except (IOError, OSError) as excep:
+                    log.err("Unable to load the client file %s: %s", filename, excep)
+
+    @classmethod
+    def clear(cls):
+        cls.files.clear()
+        cls.size = 0
 
 
 class StaticFileHandler(BaseHandler):
@@ -17,6 +164,19 @@ class StaticFileHandler(BaseHandler):
 
         self.root = "%s%s" % (os.path.abspath(path), "/")
 
+    def not_modified_since(self, f):
+        if self.request.getHeader(b'if-none-match') is not None:
+            return False
+
+        if_modified_since = self.request.getHeader(b'if-modified-since')
+        if if_modified_since is None:
+            return False
+
+        try:
+            return int(f.mtime) <= stringToDatetime(if_modified_since)
+        except ValueError:
+            return False
+
     def get(self, filename):
         if not filename:
             filename = 'index.html'
@@ -25,10 +185,22 @@ class StaticFileHandler(BaseHandler):
 
         directory_traversal_check(self.root, abspath)
 
-        if os.path.exists(abspath + '.gz') and os.path.isfile(abspath + '.gz'):
-            return self.write_file(filename + '.gz', abspath + '.gz')
-        if os.path.exists(abspath) and os.path.isfile(abspath):
-            return self.write_file(filename, abspath)
-        else:
+        f = StaticFileCache.get(abspath)
+        if f is None:
             raise errors.ResourceNotFound()
 
+        self.request.setHeader("Last-Modified", datetimeToString(int(f.mtime)))
+
+        ret = write_cache_entry(self.request, f, True, FINGERPRINT_REGEXP.search(filename) is not None)
+        if ret is None:
+            return
+
+        if self.not_modified_since(f):
+            self.request.responseHeaders.removeHeader("Content-encoding")
+            self.request.setResponseCode(304)
+            return
+
+        if f.in_memory:
+            return ret
+
+        return FileProducer(self.request, ret).start()
@@ -3,7 +3,9 @@
 # Handlerse dealing with submission interface
 import copy
 import json
+import threading
 
+from collections import OrderedDict
 from six import text_type
 
 from globaleaks import models
@@ -18,6 +20,15 @@ from globaleaks.utils.token import TokenList
 from globaleaks.utils.utility import log, get_expiration, \
     datetime_now, datetime_never, datetime_to_ISO8601
 
+# Maximum number of localized archived questionnaires kept in memory
+ARCHIVED_SCHEMAS_CACHE_SIZE = 256
+
+# (column, questionnaire hash, language) -> localized questionnaire sorted
+# from the least recently used entry to the most recently used one
+__ARCHIVED_SCHEMAS_CACHE = OrderedDict()
+__ARCHIVED_SCHEMAS_CACHE_LOCK = threading.Lock()
+
+
 def get_submission_sequence_number(itip):
     return "%s-%d" % (itip.creation_date.strftime("%Y%m%d"), itip.progressive)
 
@@ -85,6 +96,63 @@ def db_serialize_archived_preview_schema(session, preview_schema, language):
     return preview
 
 
+def _db_get_localized_archived_schemas(session, column, serialize, questionnaire_hashes, language):
+    ret = {}
+    missing = set()
+
+    with __ARCHIVED_SCHEMAS_CACHE_LOCK:
+        for questionnaire_hash in questionnaire_hashes:
+            key = (column, questionnaire_hash, language)
+            if key in __ARCHIVED_SCHEMAS_CACHE:
+                # Mark the entry as the most recently used one
+                ret[questionnaire_hash] = __ARCHIVED_SCHEMAS_CACHE.pop(key)
+                __ARCHIVED_SCHEMAS_CACHE[key] = ret[questionnaire_hash]
+            else:
+                missing.add(questionnaire_hash)
+
+    if not missing:
+        return ret
+
+    for questionnaire_hash, schema in session.query(models.ArchivedSchema.hash, getattr(models.ArchivedSchema, column)) \
+                                             .filter(models.ArchivedSchema.hash.in_(missing)):
+        ret[questionnaire_hash] = serialize(session, schema, language)
+
+        with __ARCHIVED_SCHEMAS_CACHE_LOCK:
+            __ARCHIVED_SCHEMAS_CACHE[(column, questionnaire_hash, language)] = ret[questionnaire_hash]
+
+            while len(__ARCHIVED_SCHEMAS_CACHE) > ARCHIVED_SCHEMAS_CACHE_SIZE:
+                __ARCHIVED_SCHEMAS_CACHE.popitem(last=False)
+
+    return ret
+
+
+def db_get_archived_questionnaire_schema(session, questionnaire_hash, language):
+    """
+    Return the questionnaire archived with the specified hash localized in
+    the specified language.
+
+    The archived questionnaires never change and their localized versions
+    are kept in an LRU cache; the returned structure is shared by all the
+    callers and should never be modified.
+    """
+    ret = _db_get_localized_archived_schemas(session, 'schema', db_serialize_archived_questionnaire_schema, [questionnaire_hash], language)
+    if questionnaire_hash not in ret:
+        raise errors.ModelNotFound(models.ArchivedSchema)
+
+    return ret[questionnaire_hash]
+
+
+def db_get_archived_preview_schemas(session, questionnaire_hashes, language):
+    """
+    Return a dictionary mapping each of the specified hashes to the preview
+    of the archived questionnaire localized in the specified language.
+
+    The previews are cached as the questionnaires returned by
+    db_get_archived_questionnaire_schema and should never be modified.
+    """
+    return _db_get_localized_archived_schemas(session, 'preview', db_serialize_archived_preview_schema, questionnaire_hashes, language)
+
+
 def db_serialize_questionnaire_answers_recursively(session, answers, answers_by_group, groups_by_answer):
     ret = {}
 
@@ -99,8 +167,7 @@ def db_serialize_questionnaire_answers_recursively(session, answers, answers_by_
 
 
 def db_serialize_questionnaire_answers(session, tid, usertip, internaltip):
-    aqs = session.query(models.ArchivedSchema).filter(models.ArchivedSchema.hash == internaltip.questionnaire_hash).one()
-    questionnaire = db_serialize_archived_questionnaire_schema(session, aqs.schema, State.tenant_cache[tid].default_language)
+    questionnaire = db_get_archived_questionnaire_schema(session, internaltip.questionnaire_hash, State.tenant_cache[tid].default_language)
 
     answers = []
     answers_by_group = {}
@@ -223,8 +290,6 @@ def db_get_itip_receiver_list(session, itip):
 
 
 def serialize_itip(session, internaltip, language):
-    aq = session.query(models.ArchivedSchema).filter(models.ArchivedSchema.hash == internaltip.questionnaire_hash).one()
-
     return {
         'id': internaltip.id,
         'creation_date': datetime_to_ISO8601(internaltip.creation_date),
@@ -232,7 +297,7 @@ def serialize_itip(session, internaltip, language):
         'expiration_date': datetime_to_ISO8601(internaltip.expiration_date),
         'sequence_number': get_submission_sequence_number(internaltip),
         'context_id': internaltip.context_id,
-        'questionnaire': db_serialize_archived_questionnaire_schema(session, aq.schema, language),
+        'questionnaire': db_get_archived_questionnaire_schema(session, internaltip.questionnaire_hash, language),
         'receivers': db_get_itip_receiver_list(session, internaltip),
         'https': internaltip.https,
         'enable_two_way_comments': internaltip.enable_two_way_comments,
@@ -129,6 +129,7 @@ class UserInstance(BaseHandler):
     """
     check_roles = {'admin', 'receiver', 'custodian'}
     invalidate_cache = True
+    invalidate_cache_tags = ['users']
 
     def get(self):
         return get_user_settings(self.request.tid,
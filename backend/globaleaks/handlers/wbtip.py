@@ -3,9 +3,10 @@
 # Handlers dealing with tip interface for whistleblowers (wbtip)
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
-from globaleaks.handlers.rtip import serialize_comment, serialize_message, db_get_itip_comment_list, WBFileHandler
+from globaleaks.handlers.rtip import serialize_comment, serialize_message, db_get_itip_comment_list, \
+    db_prepare_messages_serialization, WBFileHandler
 from globaleaks.handlers.submission import serialize_usertip, \
-    db_save_questionnaire_answers, db_serialize_archived_questionnaire_schema
+    db_save_questionnaire_answers, db_get_archived_questionnaire_schema
 from globaleaks.orm import transact
 from globaleaks.rest import errors, requests
 from globaleaks.utils.utility import log, datetime_now, datetime_to_ISO8601
@@ -21,9 +22,10 @@ def wb_serialize_ifile(session, ifile):
     }
 
 
-def wb_serialize_wbfile(session, wbfile):
-    receiver_id = session.query(models.ReceiverTip.receiver_id) \
-                         .filter(models.ReceiverTip.id == wbfile.receivertip_id).one()[0]
+def wb_serialize_wbfile(session, wbfile, receiver_id=None):
+    if receiver_id is None:
+        receiver_id = session.query(models.ReceiverTip.receiver_id) \
+                             .filter(models.ReceiverTip.id == wbfile.receivertip_id).one()[0]
 
     return {
         'id': wbfile.id,
@@ -43,11 +45,11 @@ def db_get_rfile_list(session, tid, itip_id):
 
 
 def db_get_wbfile_list(session, tid, itip_id):
-    wbfiles = session.query(models.WhistleblowerFile) \
+    wbfiles = session.query(models.WhistleblowerFile, models.ReceiverTip.receiver_id) \
                      .filter(models.WhistleblowerFile.receivertip_id == models.ReceiverTip.id,
                              models.ReceiverTip.internaltip_id == itip_id)
 
-    return [wb_serialize_wbfile(session, wbfile) for wbfile in wbfiles]
+    return [wb_serialize_wbfile(session, wbfile, receiver_id) for wbfile, receiver_id in wbfiles]
 
 
 def db_get_wbtip(session, tid, itip_id, language):
@@ -100,9 +102,11 @@ def get_itip_message_list(session, tid, wbtip_id, receiver_id):
                               models.ReceiverTip.internaltip_id == wbtip_id,
                               models.ReceiverTip.receiver_id == receiver_id,
                               models.InternalTip.id == wbtip_id,
-                              models.InternalTip.tid == tid)
+                              models.InternalTip.tid == tid).all()
 
-    return [serialize_message(session, message) for message in messages]
+    data = db_prepare_messages_serialization(session, messages)
+
+    return [serialize_message(session, message, data) for message in messages]
 
 @transact
 def create_message(session, tid, wbtip_id, receiver_id, request):
@@ -134,9 +138,7 @@ def update_identity_information(session, tid, tip_id, identity_field_id, identit
     if internaltip.identity_provided:
         return
 
-    aqs = session.query(models.ArchivedSchema).filter(models.ArchivedSchema.hash == internaltip.questionnaire_hash).one()
-
-    questionnaire = db_serialize_archived_questionnaire_schema(session, aqs.schema, language)
+    questionnaire = db_get_archived_questionnaire_schema(session, internaltip.questionnaire_hash, language)
     for step in questionnaire:
         for field in step['children']:
             if field['id'] == identity_field_id and field['template_id'] == 'whistleblower_identity':
@@ -1,4 +1,5 @@
 from globaleaks.jobs import anomalies, \
+                            cache_warmer, \
                             cleaning, \
                             delivery, \
                             exit_nodes_refresh, \
@@ -8,10 +9,12 @@ from globaleaks.jobs import anomalies, \
                             session_management, \
                             statistics, \
                             update_check, \
-                            certificate_check
+                            certificate_check, \
+                            vacuum
 
 jobs_list = [
     anomalies.Anomalies,
+    cache_warmer.CacheWarmer,
     cleaning.Cleaning,
     delivery.Delivery,
     exit_nodes_refresh.ExitNodesRefresh,
@@ -21,6 +24,7 @@ jobs_list = [
     statistics.Statistics,
     update_check.UpdateCheck,
     certificate_check.CertificateCheck,
+    vacuum.Vacuum,
 ]
 
 services_list = [
@@ -20,6 +20,9 @@ class BaseJob(task.LoopingCall):
     last_executions = []
     shutdown = False
 
+    # Details about the last execution reported by the jobs along the timings
+    report = None
+
     def __init__(self):
         self.name = self.__class__.__name__
 
@@ -0,0 +1,86 @@
+# -*- coding: utf-8
+# Implementation of the pre-computation of the public cached resources
+import json
+
+from twisted.internet.defer import inlineCallbacks, returnValue
+
+from globaleaks.handlers.l10n import L10NBase, get_l10n_custom_texts
+from globaleaks.handlers.public import PublicResource, get_public_resources
+from globaleaks.jobs.base import LoopingJob
+from globaleaks.rest.apicache import ApiCache
+from globaleaks.state import State
+
+__all__ = ['CacheWarmer']
+
+
+class CacheWarmer(LoopingJob):
+    """
+    Compute the cache entries of the public resources and of the translations
+    (base and tenant customizations) of the enabled languages after the
+    startup and after every invalidation so that the first visitors do not
+    pay the cost of their computation.
+
+    The entries are computed one at a time in order to not compete with the
+    requests of the users; the requests arriving while an entry is computed
+    share the same computation.
+    """
+    interval = 10
+    monitor_interval = 5 * 60
+
+    def get_start_time(self):
+        return 0
+
+    def get_stale_tids(self):
+        if ApiCache.stale_all:
+            tids = set(State.tenant_cache)
+        else:
+            tids = ApiCache.stale_tids.intersection(State.tenant_cache)
+
+        ApiCache.stale_all = False
+        ApiCache.stale_tids = frozenset()
+
+        return sorted(tids)
+
+    def get_resources(self, tid, lang):
+        @inlineCallbacks
+        def public():
+            data = yield get_public_resources(tid, lang)
+            returnValue(('application/json', json.dumps(data)))
+
+        def l10n_base():
+            return 'application/json', json.dumps(L10NBase.get(lang))
+
+        @inlineCallbacks
+        def l10n_custom():
+            data = yield get_l10n_custom_texts(tid, lang)
+            returnValue(('application/json', json.dumps(data)))
+
+        ret = [
+            (b'/public', public, PublicResource.cache_tags),
+            (('/l10n/%s/custom' % lang).encode(), l10n_custom, ['l10n:%s' % lang])
+        ]
+
+        for version in L10NBase.get_versions([lang]).values():
+            ret.append((('/l10n/%s/%s' % (lang, version)).encode(), l10n_base, ['l10n_base:%s' % lang]))
+
+        return ret
+
+    @inlineCallbacks
+    def operation(self):
+        if not State.settings.enable_api_cache:
+            return
+
+        warmed = 0
+
+        for tid in self.get_stale_tids():
+            for lang in State.tenant_cache[tid].get('languages_enabled', []):
+                for resource, f, tags in self.get_resources(tid, lang):
+                    if self.shutdown or ApiCache.contains(tid, resource, lang):
+                        continue
+
+                    yield ApiCache.compute(tid, resource, lang, f, tags)
+                    warmed += 1
+
+        self.report = {
+            'warmed_entries': warmed
+        }
@@ -0,0 +1,78 @@
+# -*- coding: utf-8
+# Implementation of the incremental release of the free pages of the database
+import time
+
+from twisted.internet.defer import inlineCallbacks
+
+from globaleaks.jobs.base import LoopingJob
+from globaleaks.orm import get_pending_transactions, transact
+
+__all__ = ['Vacuum']
+
+
+class Vacuum(LoopingJob):
+    """
+    The database uses the incremental auto-vacuum and the pages freed by the
+    deletions are kept in the database file until this job releases them.
+
+    The pages are released in small slices, each one executed in a separate
+    transaction and only while no other transaction is pending, so that the
+    job never delays the requests of the users.
+    """
+    interval = 10 * 60
+    monitor_interval = 5 * 60
+
+    # Number of pages released by each slice
+    slice_pages = 256
+
+    # Maximum time (seconds) spent releasing pages at every execution
+    max_run_time = 30
+
+    def get_start_time(self):
+        return self.interval
+
+    @transact
+    def vacuum_slice(self, session, pages):
+        """
+        Release up to the specified number of free pages and return a tuple
+        (released pages, remaining free pages, page size)
+        """
+        page_size = session.execute('PRAGMA page_size').scalar()
+        before = session.execute('PRAGMA freelist_count').scalar()
+
+        # The statement releases one page at every step and it is executed
+        # on the DBAPI cursor to be able to step it until its completion
+        cursor = session.connection().connection.cursor()
+        try:
+            cursor.execute('PRAGMA incremental_vacuum(%d)' % pages).fetchall()
+        finally:
+            cursor.close()
+
+        after = session.execute('PRAGMA freelist_count').scalar()
+
+        return before - after, after, page_size
+
+    @inlineCallbacks
+    def operation(self):
+        start_time = time.time()
+        reclaimed_pages = reclaimed_bytes = 0
+        remaining_pages = None
+
+        while not self.shutdown and time.time() - start_time < self.max_run_time:
+            if get_pending_transactions():
+                break
+
+            released, remaining_pages, page_size = yield self.vacuum_slice(self.slice_pages)
+
+            reclaimed_pages += released
+            reclaimed_bytes += released * page_size
+
+            if not released or not remaining_pages:
+                break
+
+        self.report = {
+            'reclaimed_pages': reclaimed_pages,
+            'reclaimed_bytes': reclaimed_bytes,
+            'remaining_pages': remaining_pages,
+            'vacuum_time': int((time.time() - start_time) * 1000)
+        }
@@ -196,8 +196,8 @@ class _ArchivedSchema(Model):
 
     hash = Column(Unicode(64), primary_key=True, nullable=False)
 
-    schema = Column(JSON, nullable=False)
-    preview = Column(JSON, nullable=False)
+    schema = Column(ImmutableJSON, nullable=False)
+    preview = Column(ImmutableJSON, nullable=False)
 
     unicode_keys = ['hash']
 
@@ -220,7 +220,8 @@ class _Comment(Model):
     @declared_attr
     def __table_args__(cls): # pylint: disable=no-self-argument
         return (ForeignKeyConstraint(['internaltip_id'], ['internaltip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
-                ForeignKeyConstraint(['author_id'], ['user.id'], ondelete='SET NULL', deferrable=True, initially='DEFERRED'),)
+                ForeignKeyConstraint(['author_id'], ['user.id'], ondelete='SET NULL', deferrable=True, initially='DEFERRED'),
+                Index('idx_comment_internaltip_id', 'internaltip_id'))
 
 
 class _Config(Model):
@@ -560,7 +561,8 @@ class _FieldAnswer(Model):
     @declared_attr
     def __table_args__(cls): # pylint: disable=no-self-argument
         return (ForeignKeyConstraint(['internaltip_id'], ['internaltip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
-                ForeignKeyConstraint(['fieldanswergroup_id'], ['fieldanswergroup.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'))
+                ForeignKeyConstraint(['fieldanswergroup_id'], ['fieldanswergroup.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                Index('idx_fieldanswer_internaltip_id', 'internaltip_id'))
 
 
 class _FieldAnswerGroup(Model):
@@ -661,7 +663,8 @@ class _InternalFile(Model):
 
     @declared_attr
     def __table_args__(cls): # pylint: disable=no-self-argument
-        return (ForeignKeyConstraint(['internaltip_id'], ['internaltip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),)
+        return (ForeignKeyConstraint(['internaltip_id'], ['internaltip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                Index('idx_internalfile_new_creation_date', 'new', 'creation_date'))
 
 
 class _InternalTip(Model):
@@ -678,7 +681,6 @@ class _InternalTip(Model):
     update_date = Column(DateTime, default=datetime_now, nullable=False)
     context_id = Column(Unicode(36), nullable=False)
     questionnaire_hash = Column(Unicode(64), nullable=False)
-    preview = Column(JSON, nullable=False)
     progressive = Column(Integer, default=0, nullable=False)
     https = Column(Boolean, default=False, nullable=False)
     total_score = Column(Integer, default=0, nullable=False)
@@ -693,11 +695,19 @@ class _InternalTip(Model):
     wb_last_access = Column(DateTime, default=datetime_now, nullable=False)
     wb_access_counter = Column(Integer, default=0, nullable=False)
 
+    @declared_attr
+    def preview(cls): # pylint: disable=no-self-argument
+        # The preview is only used by the lists of the tips and it is
+        # loaded and decoded only when accessed or explicitly undeferred
+        return deferred(Column(JSON, nullable=False))
+
     @declared_attr
     def __table_args__(cls): # pylint: disable=no-self-argument
         return (ForeignKeyConstraint(['tid'], ['tenant.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
                 ForeignKeyConstraint(['context_id'], ['context.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
-                ForeignKeyConstraint(['questionnaire_hash'], ['archivedschema.hash'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'))
+                ForeignKeyConstraint(['questionnaire_hash'], ['archivedschema.hash'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                Index('idx_internaltip_receipt_hash', 'receipt_hash'),
+                Index('idx_internaltip_expiration_date', 'expiration_date'))
 
 
 class _Mail(Model):
@@ -720,7 +730,8 @@ class _Mail(Model):
 
     @declared_attr
     def __table_args__(cls): # pylint: disable=no-self-argument
-        return (ForeignKeyConstraint(['tid'], ['tenant.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),)
+        return (ForeignKeyConstraint(['tid'], ['tenant.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                Index('idx_mail_creation_date', 'creation_date'))
 
 
 class _Message(Model):
@@ -741,7 +752,8 @@ class _Message(Model):
     @declared_attr
     def __table_args__(cls): # pylint: disable=no-self-argument
         return (ForeignKeyConstraint(['receivertip_id'], ['receivertip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
-                CheckConstraint(cls.type.in_(['receiver', 'whistleblower'])))
+                CheckConstraint(cls.type.in_(['receiver', 'whistleblower'])),
+                Index('idx_message_receivertip_id', 'receivertip_id'))
 
 
 class _Questionnaire(Model):
@@ -865,7 +877,9 @@ class _ReceiverTip(Model):
     @declared_attr
     def __table_args__(cls): # pylint: disable=no-self-argument
         return (ForeignKeyConstraint(['receiver_id'], ['receiver.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
-                ForeignKeyConstraint(['internaltip_id'], ['internaltip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'))
+                ForeignKeyConstraint(['internaltip_id'], ['internaltip.id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED'),
+                Index('idx_receivertip_receiver_id', 'receiver_id'),
+                Index('idx_receivertip_internaltip_id', 'internaltip_id'))
 
 
 class _SecureFileDelete(Model):
@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from sqlalchemy import not_
+from sqlalchemy import bindparam, not_
 
 from six import text_type
 
@@ -7,6 +7,13 @@ from globaleaks import __version__
 from globaleaks.models import Config, ConfigL10N, EnabledLanguage
 from globaleaks.models.properties import *
 from globaleaks.models.config_desc import ConfigDescriptor, ConfigFilters
+from globaleaks.orm import cached_query
+
+
+query_config = cached_query(lambda session: session.query(Config)
+                                                   .filter(Config.tid == bindparam('tid'),
+                                                           Config.var_name == bindparam('var_name')))
+
 
 class ConfigFactory(object):
     """
@@ -29,7 +36,7 @@ class ConfigFactory(object):
             self.res[key].set_v(request[key])
 
     def get_cfg(self, var_name):
-        return self.session.query(Config).filter(Config.tid == self.tid, Config.var_name == var_name).one()
+        return query_config(self.session, tid=self.tid, var_name=var_name).one()
 
     def get_val(self, var_name):
         return self.get_cfg(var_name).get_v()
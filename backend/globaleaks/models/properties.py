@@ -1,17 +1,25 @@
 # -*- coding: utf-8 -*
 # pylint: disable=unused-import
+import hashlib
 import json
+import threading
 
+from collections import OrderedDict
 from six import text_type
 
-from sqlalchemy import Column, CheckConstraint, ForeignKeyConstraint, UniqueConstraint, types
+from sqlalchemy import Column, CheckConstraint, ForeignKeyConstraint, Index, UniqueConstraint, types
 from sqlalchemy.types import Boolean, DateTime, Integer, Unicode, UnicodeText
 from sqlalchemy.ext.declarative import declarative_base, declared_attr
+from sqlalchemy.orm import deferred
 from sqlalchemy.schema import ForeignKey
 
 from globaleaks.utils.utility import uuid4
 # pylint: enable=unused-import
 
+# Maximum number of decoded values shared by the ImmutableJSON columns
+IMMUTABLE_JSON_CACHE_SIZE = 256
+
+
 class JSON(types.TypeDecorator):
     """Stores and retrieves JSON as TEXT."""
     impl = types.UnicodeText
@@ -27,3 +35,40 @@ class JSON(types.TypeDecorator):
             return json.loads(value)
 
         return value
+
+
+class ImmutableJSON(JSON):
+    """
+    Stores and retrieves JSON as TEXT sharing the decoded values among all
+    the loads of identical contents.
+
+    It is intended for large documents that are never modified after their
+    creation (e.g. the archived questionnaires); the values returned are
+    shared and should never be modified in place. The values are cached by
+    the digest of their content in order to not retain the encoded texts.
+    """
+    cache = OrderedDict()
+    cache_lock = threading.Lock()
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return value
+
+        key = hashlib.sha256(value.encode('utf-8')).digest()
+
+        with self.cache_lock:
+            if key in self.cache:
+                # Mark the value as the most recently used one
+                ret = self.cache.pop(key)
+                self.cache[key] = ret
+                return ret
+
+        ret = json.loads(value)
+
+        with self.cache_lock:
+            self.cache[key] = ret
+
+            while len(self.cache) > IMMUTABLE_JSON_CACHE_SIZE:
+                self.cache.popitem(last=False)
+
+        return ret
@@ -1,20 +1,79 @@
 # -*- coding: utf-8
 import random
+import threading
 import time
 import platform
 
 from sqlalchemy import create_engine, event
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext import baked
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
 
 from twisted.internet import reactor
 from twisted.internet.threads import deferToThreadPool
+from globaleaks.utils.histogram import Histogram
 from globaleaks.utils.utility import datetime_now, deferred_sleep, log
 
 
 __DB_URI = 'sqlite:'
 __THREAD_POOL = None
+__RO_THREAD_POOL = None
+
+# Engines and session factories are created once per database URI and
+# shared by all the transactions for the whole life of the process.
+__ENGINES = {}
+__SESSION_FACTORIES = {}
+__ENGINES_LOCK = threading.Lock()
+
+# Size of the connection pool of the shared engine; it matches the maximum
+# size of the ORM thread pool so that each thread can keep its own connection.
+ENGINE_POOL_SIZE = 16
+
+# Parameters (in seconds) of the exponential backoff used to retry the
+# transactions failing because the database is locked
+LOCK_RETRY_BASE_DELAY = 0.01
+LOCK_RETRY_MAX_DELAY = 1
+
+# Upper bounds of the buckets of the histograms of the transactions statistics
+TIME_HISTOGRAM_BOUNDS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000] # ms
+QUERIES_HISTOGRAM_BOUNDS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+
+__TRANSACTIONS_STATS = {}
+__TRANSACTIONS_STATS_LOCK = threading.Lock()
+
+# Number of SQL statements executed by each thread
+__QUERIES_COUNTER = threading.local()
+
+# Number of transactions enqueued or in execution
+__PENDING_TRANSACTIONS = 0
+__PENDING_TRANSACTIONS_LOCK = threading.Lock()
+
+# Maximum number of statements kept in the cache of the cached queries
+CACHED_QUERIES_SIZE = 200
+
+__BAKERY = baked.bakery(size=CACHED_QUERIES_SIZE)
+
+
+class TransactionStats(object):
+    def __init__(self):
+        self.queue_time = Histogram(TIME_HISTOGRAM_BOUNDS)
+        self.execution_time = Histogram(TIME_HISTOGRAM_BOUNDS)
+        self.commit_time = Histogram(TIME_HISTOGRAM_BOUNDS)
+        self.queries = Histogram(QUERIES_HISTOGRAM_BOUNDS)
+        self.lock_retries = 0
+        self.failures = 0
+
+    def serialize(self):
+        return {
+            'queue_time': self.queue_time.serialize(),
+            'execution_time': self.execution_time.serialize(),
+            'commit_time': self.commit_time.serialize(),
+            'queries': self.queries.serialize(),
+            'lock_retries': self.lock_retries,
+            'failures': self.failures
+        }
 
 
 def make_db_uri(db_file):
@@ -37,17 +96,34 @@ def set_db_uri(db_uri):
     global __DB_URI
     __DB_URI = db_uri
 
+    # The database file could be replaced after the change of uri
+    # and the cached connections should not be reused
+    dispose_engines()
+
 
 def get_db_uri():
     global __DB_URI
     return __DB_URI
 
 
-def get_engine(db_uri=None, foreign_keys=True):
+def get_engine(db_uri=None, foreign_keys=True, pooled=False):
     if db_uri is None:
         db_uri = get_db_uri()
 
-    engine = create_engine(db_uri, connect_args={'timeout': 30})
+    if pooled:
+        # pysqlite connections are safe to be used by different threads
+        # as long as they are not used concurrently and this is guaranteed
+        # by the pool that hands out every connection to a single thread.
+        engine = create_engine(db_uri,
+                               connect_args={'timeout': 30, 'check_same_thread': False},
+                               poolclass=QueuePool,
+                               pool_size=ENGINE_POOL_SIZE,
+                               max_overflow=-1)
+
+        event.listen(engine, 'connect', set_runtime_pragmas)
+        event.listen(engine, 'before_cursor_execute', count_query)
+    else:
+        engine = create_engine(db_uri, connect_args={'timeout': 30})
 
     if foreign_keys:
         def on_connect(conn, record):
@@ -58,11 +134,146 @@ def get_engine(db_uri=None, foreign_keys=True):
     return engine
 
 
+def set_runtime_pragmas(conn, record):
+    """
+    Configure the connections used at runtime.
+
+    The write-ahead log lets the readers proceed concurrently with the writer
+    without incurring in "database is locked" errors.
+    """
+    from globaleaks.settings import Settings
+
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = %s' % Settings.db_synchronous)
+    conn.execute('PRAGMA cache_size = %d' % Settings.db_cache_size)
+    conn.execute('PRAGMA mmap_size = %d' % Settings.db_mmap_size)
+    conn.execute('PRAGMA temp_store = %s' % Settings.db_temp_store)
+
+
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    __QUERIES_COUNTER.value = get_queries_count() + 1
+
+
+def get_queries_count():
+    """
+    Return the number of SQL statements executed by the current thread
+    """
+    return getattr(__QUERIES_COUNTER, 'value', 0)
+
+
+def record_transaction_stats(name, queue_time, execution_time, commit_time, queries, lock_retries, failed):
+    with __TRANSACTIONS_STATS_LOCK:
+        stats = __TRANSACTIONS_STATS.setdefault(name, TransactionStats())
+
+        stats.lock_retries += lock_retries
+
+        if failed:
+            stats.failures += 1
+            return
+
+        stats.queue_time.add(queue_time * 1000)
+        stats.execution_time.add(execution_time * 1000)
+        stats.commit_time.add(commit_time * 1000)
+        stats.queries.add(queries)
+
+
+def get_transactions_stats():
+    with __TRANSACTIONS_STATS_LOCK:
+        return [dict(name=name, **stats.serialize()) for name, stats in sorted(__TRANSACTIONS_STATS.items())]
+
+
+def reset_transactions_stats():
+    with __TRANSACTIONS_STATS_LOCK:
+        __TRANSACTIONS_STATS.clear()
+
+
+def update_pending_transactions(delta):
+    global __PENDING_TRANSACTIONS
+
+    with __PENDING_TRANSACTIONS_LOCK:
+        __PENDING_TRANSACTIONS += delta
+
+
+def get_pending_transactions():
+    """
+    Return the number of transactions enqueued or in execution
+    """
+    return __PENDING_TRANSACTIONS
+
+
+def lock_retry_delay(retries):
+    """
+    Exponential backoff with full jitter
+    """
+    return random.uniform(0, min(LOCK_RETRY_MAX_DELAY, LOCK_RETRY_BASE_DELAY * 2 ** retries))
+
+
+def _get_shared(db_uri=None):
+    if db_uri is None:
+        db_uri = get_db_uri()
+
+    with __ENGINES_LOCK:
+        if db_uri not in __ENGINES:
+            __ENGINES[db_uri] = get_engine(db_uri, pooled=True)
+            __SESSION_FACTORIES[db_uri] = sessionmaker(bind=__ENGINES[db_uri])
+
+        return __ENGINES[db_uri], __SESSION_FACTORIES[db_uri]
+
+
+def get_shared_engine(db_uri=None):
+    """
+    Return the engine shared by all the transactions operating on db_uri
+    creating it on first use.
+    """
+    return _get_shared(db_uri)[0]
+
+
+def get_session_factory(db_uri=None):
+    """
+    Return the session factory bound to the shared engine of db_uri
+    """
+    return _get_shared(db_uri)[1]
+
+
+def dispose_engines():
+    """
+    Close all the connections of the shared engines and forget them.
+    """
+    with __ENGINES_LOCK:
+        for engine in __ENGINES.values():
+            engine.dispose()
+
+        __ENGINES.clear()
+        __SESSION_FACTORIES.clear()
+
 
 def get_session(db_uri=None):
-    engine  = get_engine(db_uri)
-    session = sessionmaker(bind=engine)
-    return session()
+    return get_session_factory(db_uri)()
+
+
+def cached_query(fn):
+    """
+    Return a cached version of the query built by fn(session).
+
+    The query is built and compiled to SQL only at its first execution and
+    the statement is then reused by all the subsequent executions; for this
+    reason the query should not depend on anything other than the session
+    and its variable parts have to be expressed with bindparam().
+
+    The returned function accepts a session and the values of the bound
+    parameters and returns a result supporting all(), first(), one() and
+    one_or_none():
+
+        get_user = cached_query(lambda session: session.query(User).filter(User.id == bindparam('id')))
+
+        user = get_user(session, id=user_id).one_or_none()
+    """
+    baked_query = __BAKERY(fn)
+
+    def execute(session, **params):
+        return baked_query(session).params(**params)
+
+    return execute
 
 
 def set_thread_pool(thread_pool):
@@ -75,12 +286,28 @@ def get_thread_pool():
     return __THREAD_POOL
 
 
+def set_ro_thread_pool(thread_pool):
+    global __RO_THREAD_POOL
+    __RO_THREAD_POOL = thread_pool
+
+
+def get_ro_thread_pool():
+    global __RO_THREAD_POOL
+    return __RO_THREAD_POOL
+
+
 class transact(object):
     """
     Class decorator for managing transactions.
+
+    Transactions are executed on the writer thread pool that is composed by
+    a single thread in order to serialize all the writes on the database.
     """
+    readonly = False
+
     def __init__(self, method):
         self.method = method
+        self.name = method.__module__ + '.' + method.__name__
         self.instance = None
 
     def __get__(self, instance, owner):
@@ -88,7 +315,8 @@ class transact(object):
         return self
 
     def __call__(self, *args, **kwargs):
-        return self.run(self._wrap, self.method, *args, **kwargs)
+        update_pending_transactions(1)
+        return self.run(self._wrap, self.method, time.time(), *args, **kwargs)
 
     def run(self, function, *args, **kwargs):
         return deferToThreadPool(reactor,
@@ -97,37 +325,82 @@ class transact(object):
                                  *args,
                                  **kwargs)
 
-    def _wrap(self, function, *args, **kwargs):
+    def _wrap(self, function, enqueue_time, *args, **kwargs):
         """
         Wrap provided function calling it inside a thread and
         passing the store to it.
         """
+        start_time = time.time()
+        queries_count = get_queries_count()
+        execution_time = commit_time = 0
+        lock_retries = 0
+        failed = True
+
         session = get_session()
 
         try:
             while True:
                 try:
+                    execution_start_time = time.time()
+
                     if self.instance:
                         result = function(self.instance, session, *args, **kwargs)
                     else:
                         result = function(session, *args, **kwargs)
 
-                    session.commit()
+                    commit_start_time = time.time()
+
+                    if self.readonly:
+                        session.rollback()
+                    else:
+                        session.commit()
+
+                    commit_time = time.time() - commit_start_time
+                    execution_time = commit_start_time - execution_start_time
                 except OperationalError as e:
                     session.rollback()
 
                     if "database is locked" not in str(e):
                         raise
 
-                    time.sleep(0.1)
+                    time.sleep(lock_retry_delay(lock_retries))
+                    lock_retries += 1
                 except:
                     session.rollback()
                     raise
                 else:
+                    failed = False
                     return result
         finally:
             session.close()
 
+            update_pending_transactions(-1)
+
+            record_transaction_stats(self.name,
+                                     start_time - enqueue_time,
+                                     execution_time,
+                                     commit_time,
+                                     get_queries_count() - queries_count,
+                                     lock_retries,
+                                     failed)
+
+
+class transact_ro(transact):
+    """
+    Class decorator for managing read-only transactions.
+
+    Transactions are executed on the reader thread pool and never committed
+    so that they are never blocked by the writer and any change is discarded.
+    """
+    readonly = True
+
+    def run(self, function, *args, **kwargs):
+        return deferToThreadPool(reactor,
+                                 get_ro_thread_pool(),
+                                 function,
+                                 *args,
+                                 **kwargs)
+
 
 class transact_sync(transact):
     def run(self, function, *args, **kwargs):
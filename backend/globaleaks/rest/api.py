@@ -5,7 +5,6 @@
 #   This file defines the URI mapping for the GlobaLeaks API and its factory
 
 import json
-import re
 import sys
 import types
 
@@ -52,6 +51,8 @@ from globaleaks.handlers.admin import step as admin_step
 from globaleaks.handlers.admin import tenant as admin_tenant
 from globaleaks.handlers.admin import user as admin_user
 from globaleaks.rest import apicache, requests, errors
+from globaleaks.rest.router import Router
+from globaleaks.rest.validator import compile_descriptors
 from globaleaks.settings import Settings
 from globaleaks.state import State, extract_exception_traceback_and_schedule_email
 
@@ -68,6 +69,8 @@ api_spec = [
 
     ## Public API ##
     (r'/public', public.PublicResource),
+    (r'/media/(contexts|users)/' + uuid_regexp + r'/([a-f0-9]{16})', public.MediaHandler),
+    (r'/media/(files)/(logo|favicon|css|script)/([a-f0-9]{16})', public.MediaHandler),
 
     # User Preferences Handler
     (r'/preferences', user.UserInstance),
@@ -131,6 +134,8 @@ api_spec = [
     (r'/admin/activities/(summary|details)', admin_statistics.RecentEventsCollection),
     (r'/admin/anomalies', admin_statistics.AnomalyCollection),
     (r'/admin/jobs', admin_statistics.JobsTiming),
+    (r'/admin/transactions', admin_statistics.TransactionsTiming),
+    (r'/admin/cache', admin_statistics.ApiCacheStats),
     (r'/admin/l10n/(' + '|'.join(LANGUAGES_SUPPORTED_CODES) + ')', admin_l10n.AdminL10NHandler),
     (r'/admin/files/(logo|favicon|css|homepage|script)', admin_file.FileInstance),
     (r'/admin/config', admin_config.AdminConfigHandler),
@@ -158,6 +163,8 @@ api_spec = [
     (r'/s/(.+)', file.FileHandler),
     (r'(/u/.{1,255})', shorturl.ShortURL),
     (r'/l10n/(' + '|'.join(LANGUAGES_SUPPORTED_CODES) + ')', l10n.L10NHandler),
+    (r'/l10n/(' + '|'.join(LANGUAGES_SUPPORTED_CODES) + ')/custom', l10n.L10NCustomHandler),
+    (r'/l10n/(' + '|'.join(LANGUAGES_SUPPORTED_CODES) + ')/([a-f0-9]{16})', l10n.L10NBaseHandler),
 
     ## This handler attempts to route all non routed get requests
     (r'/([a-zA-Z0-9_\-\/\.\@]*)', staticfile.StaticFileHandler, {'path': Settings.client_path})
@@ -189,13 +196,13 @@ def decorate_method(h, method):
 
 
 class APIResourceWrapper(Resource):
-    _registry = None
+    _router = None
     isLeaf = True
     method_map = {'get': 200, 'post': 201, 'put': 202, 'delete': 200}
 
     def __init__(self):
         Resource.__init__(self)
-        self._registry = []
+        self._router = Router()
         self.handler = None
 
         for tup in api_spec:
@@ -205,19 +212,17 @@ class APIResourceWrapper(Resource):
             else:
                 pattern, handler, args = tup
 
-            if not pattern.startswith("^"):
-                pattern = "^" + pattern
-
-            if not pattern.endswith("$"):
-                pattern += "$"
-
             if not hasattr(handler, '_decorated'):
                 handler._decorated = True
                 for m in ['get', 'put', 'post', 'delete']:
                     if hasattr(handler, m):
                         decorate_method(handler, m)
 
-            self._registry.append((re.compile(pattern), handler, args))
+            self._router.add(pattern, handler, args)
+
+        self._router.compile()
+
+        compile_descriptors()
 
     def should_redirect_https(self, request):
         hostname = request.hostname
@@ -306,7 +311,9 @@ class APIResourceWrapper(Resource):
             request.hostname = request.getRequestHostname()
 
         request.hostname = request.hostname.split(b':')[0]
-        request.port = request.getHost().port
+        # The requests forwarded by the https workers on the unix socket
+        # are not received on any port
+        request.port = getattr(request.getHost(), 'port', None)
 
         if (request.hostname == b'localhost' or
             isIPAddress(request.hostname) or
@@ -363,26 +370,24 @@ class APIResourceWrapper(Resource):
             self.redirect_https(request)
             return b''
 
-        match = None
-        for regexp, handler, args in self._registry:
-            try:
-                match = regexp.match(request.path.decode('utf-8'))
-            except UnicodeDecodeError:
-                match = None
-            if match:
-                break
+        try:
+            match = self._router.resolve(request.path.decode('utf-8'))
+        except UnicodeDecodeError:
+            match = None
 
         if match is None:
             self.handle_exception(errors.ResourceNotFound(), request)
             return b''
 
+        handler, args, groups = match
+
         method = request.method.lower().decode('utf-8')
         if not method in self.method_map.keys() or not hasattr(handler, method):
             self.handle_exception(errors.MethodNotImplemented(), request)
             return b''
 
         f = getattr(handler, method)
-        groups = [text_type(g) for g in match.groups()]
+        groups = [text_type(g) for g in groups]
 
         self.handler = handler(State, request, **args)
 
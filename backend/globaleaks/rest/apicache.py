@@ -1,12 +1,24 @@
 # -*- coding: utf-8 -*-
+import hashlib
+import inspect
 import io
 import gzip
 import json
 import types
+import weakref
+from collections import OrderedDict
 
 from six import text_type, binary_type
 
 from twisted.internet import defer
+from twisted.python.failure import Failure
+
+from globaleaks.settings import Settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 
 def gzipdata(data):
@@ -21,76 +33,404 @@ def gzipdata(data):
     return fgz.getvalue()
 
 
+def parse_accept_encoding_header(value):
+    """
+    Return a dictionary mapping the codings included in the header to their
+    quality value; the identity coding is acceptable unless excluded.
+    """
+    codings = {}
+
+    if isinstance(value, binary_type):
+        value = value.decode('utf-8', 'ignore')
+
+    for part in (value or '').split(','):
+        params = part.strip().split(';')
+        coding = params[0].strip().lower()
+        if not coding:
+            continue
+
+        q = 1.0
+        for param in params[1:]:
+            param = param.strip()
+            if param.startswith('q='):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+
+        codings[coding] = q
+
+    codings.setdefault('identity', codings.get('*', 1.0))
+
+    return codings
+
+
+class ApiCacheVariants(dict):
+    """
+    Representations of a content in all the supported codings
+    """
+
+
+class ApiCacheEntry(object):
+    """
+    Cached content of a resource precompressed in all the supported codings.
+
+    The entries with identical content (e.g. the translations of the tenants
+    without customizations) share the same variants that are compressed once.
+    """
+    __slots__ = ['content_type', 'variants', 'etag', 'tags', 'size']
+
+    # Content codings ordered by preference
+    codings = ['br', 'gzip', 'identity']
+
+    # etag -> variants of all the entries in memory
+    shared_variants = weakref.WeakValueDictionary()
+
+    def __init__(self, content_type, data, tags=None):
+        if isinstance(data, text_type):
+            data = data.encode()
+
+        self.content_type = content_type
+        self.etag = hashlib.sha256(data).hexdigest()[:32]
+        self.tags = frozenset(tags or [])
+
+        self.variants = self.shared_variants.get(self.etag)
+        if self.variants is None:
+            self.variants = ApiCacheVariants(identity=data, gzip=gzipdata(data))
+
+            if brotli is not None:
+                self.variants['br'] = brotli.compress(data)
+
+            self.shared_variants[self.etag] = self.variants
+
+        self.size = sum(len(x) for x in self.variants.values())
+
+    def get_etag(self, coding):
+        # Every variant is a different representation and needs a strong ETag
+        return '"%s-%s"' % (self.etag, coding)
+
+    def negotiate(self, accept_encoding):
+        """
+        Return the coding of the variant to be served to a client sending
+        the specified Accept-Encoding header.
+        """
+        accepted = parse_accept_encoding_header(accept_encoding)
+
+        best, best_q = 'identity', 0
+        for coding in self.codings:
+            q = accepted.get(coding, accepted.get('*', 0))
+            if coding in self.variants and q > best_q:
+                best, best_q = coding, q
+
+        return best
+
+
 class ApiCache(object):
+    """
+    In-memory cache of the content of the cacheable API resources.
+
+    The total size of the cached content is bounded by Settings.api_cache_size
+    and the variants shared by several entries are counted once;
+    when the budget is exceeded the least recently used entries of the tenant
+    occupying the largest share of the cache are evicted so that a tenant
+    with many resources and languages cannot evict the entries of the others.
+
+    Every entry is tagged with the data it depends on (e.g. 'node', 'contexts',
+    'l10n:en') so that a change only invalidates the affected entries; the
+    entries without tags are considered to depend on any data of the tenant.
+
+    Concurrent misses of the same entry share a single computation.
+    """
+    # tid -> OrderedDict((resource, language) -> ApiCacheEntry) sorted
+    # from the least recently used entry to the most recently used one
     memory_cache_dict = {}
 
+    # tid -> hits, misses, evictions, bytes and entries of the tenant
+    stats = {}
+
+    size = 0
+
+    # etag -> number of the cached entries sharing the same variants
+    references = {}
+
+    # (tid, resource, language) -> deferreds waiting for the computation
+    # of the entry in progress
+    pending = {}
+
+    # Counter of the invalidations used to discard the entries computed
+    # while an invalidation was happening
+    version = 0
+
+    # Tenants whose entries have been invalidated since the last execution
+    # of the CacheWarmer job; all the tenants are stale after the startup
+    stale_tids = frozenset()
+    stale_all = True
+
+    @classmethod
+    def get_tenant_stats(cls, tid):
+        if tid not in cls.stats:
+            cls.stats[tid] = {'hits': 0, 'misses': 0, 'evictions': 0, 'bytes': 0, 'entries': 0}
+
+        return cls.stats[tid]
+
     @classmethod
     def get(cls, tid, resource, language):
-        if tid in cls.memory_cache_dict \
-           and resource in cls.memory_cache_dict[tid] \
-           and language in cls.memory_cache_dict[tid][resource]:
-            return cls.memory_cache_dict[tid][resource][language]
+        stats = cls.get_tenant_stats(tid)
+
+        key = (resource, language)
+        entries = cls.memory_cache_dict.get(tid)
+        if entries is None or key not in entries:
+            stats['misses'] += 1
+            return
+
+        # Mark the entry as the most recently used one
+        entry = entries.pop(key)
+        entries[key] = entry
+
+        stats['hits'] += 1
+
+        return entry
+
+    @classmethod
+    def contains(cls, tid, resource, language):
+        return (resource, language) in cls.memory_cache_dict.get(tid, {})
+
+    @classmethod
+    def compute(cls, tid, resource, language, f, tags=None):
+        """
+        Compute and cache an entry by means of f that should return (or fire
+        with) a tuple (content_type, data) and return a deferred firing with
+        the entry.
+
+        If the same entry is already being computed the deferred fires with
+        the result of the computation in progress.
+        """
+        key = (tid, resource, language)
+        if key in cls.pending:
+            d = defer.Deferred()
+            cls.pending[key].append(d)
+            return d
+
+        cls.pending[key] = []
+        version = cls.version
+
+        def callback(result):
+            content_type, data = result
+
+            if cls.version == version:
+                return cls.set(tid, resource, language, content_type, data, tags)
+
+            return ApiCacheEntry(content_type, data, tags)
+
+        def notify(result):
+            for d in cls.pending.pop(key):
+                if isinstance(result, Failure):
+                    d.errback(result)
+                else:
+                    d.callback(result)
+
+            return result
+
+        return defer.maybeDeferred(f).addCallback(callback).addBoth(notify)
 
     @classmethod
-    def set(cls, tid, resource, language, content_type, data):
-        data = gzipdata(data)
+    def set(cls, tid, resource, language, content_type, data, tags=None):
+        entry = ApiCacheEntry(content_type, data, tags)
 
-        if tid not in ApiCache.memory_cache_dict:
-            cls.memory_cache_dict[tid] = {}
+        cls.remove(tid, resource, language)
 
-        if resource not in ApiCache.memory_cache_dict[tid]:
-            cls.memory_cache_dict[tid][resource] = {}
+        if entry.size > Settings.api_cache_size:
+            return entry
 
-        entry = (content_type, data)
+        if tid not in cls.memory_cache_dict:
+            cls.memory_cache_dict[tid] = OrderedDict()
 
-        cls.memory_cache_dict[tid][resource][language] = entry
+        cls.memory_cache_dict[tid][(resource, language)] = entry
+
+        stats = cls.get_tenant_stats(tid)
+        stats['bytes'] += entry.size
+        stats['entries'] += 1
+
+        references = cls.references.get(entry.etag, 0)
+        if not references:
+            cls.size += entry.size
+
+        cls.references[entry.etag] = references + 1
+
+        while cls.size > Settings.api_cache_size:
+            cls.evict()
 
         return entry
 
     @classmethod
-    def invalidate(cls, tid=None):
+    def remove(cls, tid, resource, language):
+        entries = cls.memory_cache_dict.get(tid)
+        if entries is None or (resource, language) not in entries:
+            return False
+
+        entry = entries.pop((resource, language))
+        if not entries:
+            del cls.memory_cache_dict[tid]
+
+        stats = cls.get_tenant_stats(tid)
+        stats['bytes'] -= entry.size
+        stats['entries'] -= 1
+
+        references = cls.references.pop(entry.etag) - 1
+        if references:
+            cls.references[entry.etag] = references
+        else:
+            cls.size -= entry.size
+
+        return True
+
+    @classmethod
+    def evict(cls):
+        """
+        Evict the least recently used entry of the tenant using the largest
+        amount of memory.
+        """
+        tid = max(cls.memory_cache_dict, key=lambda x: cls.stats[x]['bytes'])
+
+        resource, language = next(iter(cls.memory_cache_dict[tid]))
+
+        cls.remove(tid, resource, language)
+
+        cls.stats[tid]['evictions'] += 1
+
+    @classmethod
+    def invalidate(cls, tid=None, tags=None):
+        """
+        Invalidate the entries of the specified tenant or of all the tenants
+        depending on any of the specified tags or, if no tags are specified,
+        all the entries.
+        """
+        tids = [tid] if tid is not None else list(cls.memory_cache_dict)
+
+        cls.version += 1
+
         if tid is not None:
-            cls.memory_cache_dict.pop(tid, None)
+            cls.stale_tids = cls.stale_tids.union([tid])
         else:
-            cls.memory_cache_dict.clear()
+            cls.stale_all = True
+
+        for x in tids:
+            for (resource, language), entry in list(cls.memory_cache_dict.get(x, {}).items()):
+                if not tags or not entry.tags or entry.tags.intersection(tags):
+                    cls.remove(x, resource, language)
+
+    @classmethod
+    def get_stats(cls, tid=None):
+        """
+        Return the statistics of the cache limited to the specified tenant
+        or including all the tenants
+        """
+        tids = [tid] if tid is not None else sorted(cls.stats)
+
+        return {
+            'size': cls.size,
+            'max_size': Settings.api_cache_size,
+            'tenants': [dict(tid=x, **cls.get_tenant_stats(x)) for x in tids]
+        }
+
+
+def format_tags(tags, f, *args, **kwargs):
+    """
+    Format the tags declared by a handler with the arguments of its method
+    e.g. 'l10n:{lang}' -> 'l10n:en'
+    """
+    if not tags:
+        return []
+
+    callargs = inspect.getcallargs(f, *args, **kwargs)
+
+    return [tag.format(**callargs) for tag in tags]
+
+
+def write_cache_entry(request, entry, public, immutable=False):
+    """
+    Serve the variant of the entry accepted by the client or, if the client
+    already owns the same representation, an empty 304 response.
+
+    The resources declared immutable are served at addresses that change
+    with their content and the clients are allowed to store them forever.
+    """
+    coding = entry.negotiate(request.getHeader(b'accept-encoding'))
+    etag = entry.get_etag(coding)
+
+    request.setHeader("Content-type", entry.content_type)
+    request.setHeader("ETag", etag)
+    request.setHeader("Vary", "Accept-Encoding")
+
+    if public and immutable:
+        request.setHeader("Cache-control", "public, max-age=31536000, immutable")
+        request.responseHeaders.removeHeader("Pragma")
+        request.responseHeaders.removeHeader("Expires")
+    elif public:
+        # Let the browsers store the public resources and revalidate them
+        # at every use by means of conditional requests
+        request.setHeader("Cache-control", "no-cache")
+        request.responseHeaders.removeHeader("Pragma")
+        request.responseHeaders.removeHeader("Expires")
+
+    if_none_match = request.getHeader(b'if-none-match')
+    if if_none_match is not None:
+        if isinstance(if_none_match, binary_type):
+            if_none_match = if_none_match.decode('utf-8', 'ignore')
+
+        if etag in [x.strip() for x in if_none_match.split(',')] or if_none_match.strip() == '*':
+            request.setResponseCode(304)
+            return
+
+    if coding != 'identity':
+        request.setHeader("Content-encoding", coding)
+
+    return entry.variants[coding]
 
 
 def decorator_cache_get(f):
     def decorator_cache_get_wrapper(self, *args, **kwargs):
+        public = self.check_roles == '*'
+
         c = ApiCache.get(self.request.tid, self.request.path, self.request.language)
         if c is None:
-            d = defer.maybeDeferred(f, self, *args, **kwargs)
-
-            def callback(data):
-                if isinstance(data, (dict, list)):
-                    self.request.setHeader(b'content-type', b'application/json')
-                    data = json.dumps(data)
+            def compute():
+                def callback(data):
+                    if isinstance(data, (dict, list)):
+                        self.request.setHeader(b'content-type', b'application/json')
+                        data = json.dumps(data)
 
-                self.request.setHeader("Content-encoding", "gzip")
+                    return self.request.responseHeaders.getRawHeaders("Content-type", ["application/json"])[0], data
 
-                c = self.request.responseHeaders.getRawHeaders("Content-type", ["application/json"])[0]
-                return ApiCache.set(self.request.tid, self.request.path, self.request.language, c, data)[1]
+                return defer.maybeDeferred(f, self, *args, **kwargs).addCallback(callback)
 
-            d.addCallback(callback)
+            tags = format_tags(self.cache_tags, f, self, *args, **kwargs)
+            d = ApiCache.compute(self.request.tid, self.request.path, self.request.language, compute, tags)
+            d.addCallback(lambda entry: write_cache_entry(self.request, entry, public, self.cache_immutable))
 
             return d
 
-        else:
-            self.request.setHeader("Content-encoding", "gzip")
-            self.request.setHeader("Content-type", c[0])
-
-        return c[1]
+        return write_cache_entry(self.request, c, public, self.cache_immutable)
 
     return decorator_cache_get_wrapper
 
 
 def decorator_cache_invalidate(f):
     def decorator_cache_invalidate_wrapper(self, *args, **kwargs):
-        if self.invalidate_cache and self.request.tid != 1:
-            ApiCache.invalidate(self.request.tid)
-        else:
-            ApiCache.invalidate()
+        tags = format_tags(self.invalidate_cache_tags, f, self, *args, **kwargs)
+
+        # The data of the root tenant is partially shared with the other tenants
+        tid = self.request.tid if self.invalidate_cache and self.request.tid != 1 else None
+
+        def invalidate(result):
+            ApiCache.invalidate(tid, tags)
+            return result
+
+        invalidate(None)
 
-        return f(self, *args, **kwargs)
+        # The entries are invalidated again when the transaction is committed
+        # in order to discard the ones computed by the concurrent readers
+        # while the change was in progress
+        return defer.maybeDeferred(f, self, *args, **kwargs).addBoth(invalidate)
 
     return decorator_cache_invalidate_wrapper
@@ -0,0 +1,227 @@
+# -*- coding: utf-8
+#   router
+#   ******
+#
+#   Dispatcher of the requests to the handlers registered in the api_spec
+import re
+
+# Characters having a special meaning in a regular expression
+REGEXP_SPECIAL_CHARS = set('.^$*+?{}[]\\|()')
+REGEXP_QUANTIFIERS = set('*+?{')
+
+
+def literal_prefix(pattern):
+    """
+    Return the literal text that any path matched by the pattern starts with
+    """
+    if top_level_alternation(pattern):
+        return ''
+
+    prefix = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        step = 1
+
+        if c == '\\':
+            if i + 1 == len(pattern) or pattern[i + 1].isalnum():
+                break
+
+            c = pattern[i + 1]
+            step = 2
+
+        elif c in REGEXP_SPECIAL_CHARS:
+            break
+
+        # A quantified character is not part of the literal prefix
+        if i + step < len(pattern) and pattern[i + step] in REGEXP_QUANTIFIERS:
+            break
+
+        prefix.append(c)
+        i += step
+
+    return ''.join(prefix)
+
+
+def top_level_alternation(pattern):
+    depth = 0
+    escaped = in_class = False
+
+    for c in pattern:
+        if escaped:
+            escaped = False
+        elif c == '\\':
+            escaped = True
+        elif in_class:
+            in_class = c != ']'
+        elif c == '[':
+            in_class = True
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == '|' and depth == 0:
+            return True
+
+    return False
+
+
+class Route(object):
+    __slots__ = ['index', 'pattern', 'regexp', 'handler', 'args', 'prefix', 'literal']
+
+    def __init__(self, index, pattern, handler, args):
+        if pattern.startswith('^'):
+            pattern = pattern[1:]
+
+        if pattern.endswith('$') and not pattern.endswith('\\$'):
+            pattern = pattern[:-1]
+
+        self.index = index
+        self.pattern = pattern
+        self.regexp = re.compile('^' + pattern + '$')
+        self.handler = handler
+        self.args = args
+        self.prefix = literal_prefix(pattern)
+        self.literal = self.prefix == pattern.replace('\\', '')
+
+
+class Matcher(object):
+    """
+    Single regular expression matching any of a list of routes and telling
+    which is the first one matching a path.
+    """
+    __slots__ = ['regexp', 'routes']
+
+    def __init__(self, routes):
+        self.routes = {}
+
+        alternatives = []
+        group = 1
+        for route in routes:
+            self.routes[group] = (route, group + 1, group + 1 + route.regexp.groups)
+            alternatives.append('(%s)' % route.pattern)
+            group += 1 + route.regexp.groups
+
+        self.regexp = re.compile('^(?:%s)$' % '|'.join(alternatives))
+
+    def match(self, path):
+        match = self.regexp.match(path)
+        if match is None:
+            return
+
+        # The group closed last is the one wrapping the whole alternative
+        route, start, end = self.routes[match.lastindex]
+
+        return route, match.groups()[start - 1:end - 1]
+
+
+class TrieNode(object):
+    __slots__ = ['children', 'routes', 'matcher']
+
+    def __init__(self):
+        self.children = {}
+        self.routes = []
+        self.matcher = None
+
+
+class Router(object):
+    """
+    Dispatcher resolving the handler registered for a path.
+
+    The routes are tried in the order of their registration and the first
+    matching one wins, as if every pattern was tried in sequence, but:
+    - the paths of the routes without parameters are resolved by a dictionary;
+    - the other routes are indexed in a trie by the literal prefix of their
+      pattern and the candidates for a path are tried at once by a single
+      regular expression combining them.
+    """
+    def __init__(self):
+        self.routes = []
+        self.exact = {}
+        self.root = TrieNode()
+
+    def add(self, pattern, handler, args=None):
+        self.routes.append(Route(len(self.routes), pattern, handler, args or {}))
+
+    def compile(self):
+        """
+        Build the indexes of the registered routes
+        """
+        self.exact = {}
+        self.root = TrieNode()
+
+        for route in self.routes:
+            node = self.root
+            for c in route.prefix:
+                node = node.children.setdefault(c, TrieNode())
+
+            node.routes.append(route)
+
+        # The path of a literal route is resolved to the first route matching
+        # it that could also be a route with parameters registered before it
+        for route in self.routes:
+            if route.literal:
+                path = route.prefix
+                self.exact.setdefault(path, self._resolve(path))
+
+        matchers = {}
+
+        def visit(node, candidates):
+            candidates = sorted(candidates + node.routes, key=lambda x: x.index)
+            if candidates:
+                key = tuple(x.index for x in candidates)
+                if key not in matchers:
+                    matchers[key] = Matcher(candidates)
+
+                node.matcher = matchers[key]
+
+            for child in node.children.values():
+                visit(child, candidates)
+
+        visit(self.root, [])
+
+    def _resolve(self, path):
+        node = self.root
+        candidates = list(node.routes)
+        for c in path:
+            node = node.children.get(c)
+            if node is None:
+                break
+
+            candidates.extend(node.routes)
+
+        for route in sorted(candidates, key=lambda x: x.index):
+            match = route.regexp.match(path)
+            if match is not None:
+                return route, match.groups()
+
+    def resolve(self, path):
+        """
+        Return a tuple (handler, args, groups) for the first route matching
+        the path or None if no route matches it.
+        """
+        ret = self.exact.get(path)
+        if ret is None:
+            matcher = None
+            node = self.root
+            for c in path:
+                if node.matcher is not None:
+                    matcher = node.matcher
+
+                node = node.children.get(c)
+                if node is None:
+                    break
+            else:
+                if node.matcher is not None:
+                    matcher = node.matcher
+
+            if matcher is None:
+                return
+
+            ret = matcher.match(path)
+            if ret is None:
+                return
+
+        route, groups = ret
+
+        return route.handler, route.args, groups
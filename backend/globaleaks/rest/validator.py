@@ -0,0 +1,192 @@
+# -*- coding: utf-8
+#   validator
+#   *********
+#
+# Compilation of the request descriptors of rest/requests.py into functions
+# validating the messages received by the handlers.
+#
+# A descriptor is compiled once into a tree of closures specialized on the
+# type of each of its values so that at every request the messages are not
+# validated by inspecting the descriptor again.
+import collections
+import re
+
+from six import text_type
+
+from globaleaks.rest import errors, requests
+from globaleaks.utils.utility import log
+
+# id(descriptor) -> (descriptor, validator) of the descriptors defined in
+# rest/requests.py; the descriptor is referenced in order to prevent the reuse
+# of its id. The descriptors built at runtime (e.g. the ones of the operations)
+# are compiled at every use in order to not keep them alive forever.
+__VALIDATORS = {}
+
+
+def compile_python_type(python_type):
+    if python_type == requests.SkipSpecificValidation:
+        def validate(value):
+            return value is not None
+
+    elif python_type == int:
+        def validate(value):
+            try:
+                int(value)
+                return True
+            except:
+                return False
+
+    elif python_type == bool:
+        def validate(value):
+            return isinstance(value, bool) or value == u'true' or value == u'false'
+
+    else:
+        def validate(value):
+            return isinstance(value, python_type)
+
+    return validate
+
+
+def compile_regexp(regexp):
+    match = re.compile(regexp).match
+
+    def validate(value):
+        if value is None:
+            return False
+
+        try:
+            value = text_type(value)
+        except:
+            return False
+
+        return match(value) is not None
+
+    return validate
+
+
+def compile_list(descriptor, memo):
+    if descriptor:
+        validate_item = compile_type(descriptor[0], memo)
+    else:
+        validate_item = lambda value: False
+
+    def validate(value):
+        if not isinstance(value, list):
+            return False
+
+        for x in value:
+            if not validate_item(x):
+                return False
+
+        return True
+
+    return validate
+
+
+def compile_mapping(descriptor, memo):
+    """
+    The validator of a dictionary strips the keys not included in the
+    descriptor, as the client sends additional data like the creation date
+    of the objects, and raises an InputValidationError if any of the keys
+    of the descriptor is missing or invalid.
+    """
+    fields = []
+    keys = frozenset(descriptor)
+
+    def validate(value):
+        if not isinstance(value, dict):
+            log.err("-- Invalid JSON/dict [%s]", value)
+            raise errors.InputValidationError("invalid json message: expected dict")
+
+        if len(value) != len(keys) or not keys.issuperset(value):
+            for key in [x for x in value if x not in keys]:
+                del value[key]
+
+        for key, validate_value in fields:
+            if key not in value:
+                log.debug("Key %s expected but missing!", key)
+                raise errors.InputValidationError("Missing key %s" % key)
+
+            if not validate_value(value[key]):
+                log.err("Received key %s: type validation fail", key)
+                raise errors.InputValidationError("Key (%s) type validation failure" % key)
+
+        return True
+
+    # The validator is memoized before compiling the values in order to
+    # support the descriptors referencing themselves
+    memo[id(descriptor)] = validate
+
+    fields.extend((key, compile_type(value, memo)) for key, value in descriptor.items())
+
+    return validate
+
+
+def compile_type(descriptor, memo):
+    if id(descriptor) in memo:
+        return memo[id(descriptor)]
+
+    # if it's callable, than assumes is a primitive class
+    if callable(descriptor):
+        return compile_python_type(descriptor)
+
+    # value as "{foo:bar}"
+    elif isinstance(descriptor, collections.Mapping):
+        return compile_mapping(descriptor, memo)
+
+    # regexp
+    elif isinstance(descriptor, str):
+        return compile_regexp(descriptor)
+
+    # value as "[ type ]"
+    elif isinstance(descriptor, collections.Iterable):
+        return compile_list(descriptor, memo)
+
+    return lambda value: False
+
+
+def get_type_validator(descriptor):
+    """
+    Return a function returning True if a value conforms to the descriptor
+    or False otherwise; the dictionaries not conforming to the descriptor
+    raise an InputValidationError.
+    """
+    ret = __VALIDATORS.get(id(descriptor))
+    if ret is None or ret[0] is not descriptor:
+        return compile_type(descriptor, {})
+
+    return ret[1]
+
+
+def get_validator(descriptor):
+    """
+    Return a function validating a message against the descriptor, that
+    should be either a dict or a list, and raising an InputValidationError
+    if the message does not conform to it.
+    """
+    if isinstance(descriptor, dict):
+        return get_type_validator(descriptor)
+
+    elif isinstance(descriptor, list):
+        validate_list = get_type_validator(descriptor)
+
+        def validate(message):
+            if not validate_list(message):
+                raise errors.InputValidationError("Not every element in %s is %s" % (message, descriptor[0]))
+
+            return True
+
+        return validate
+
+    raise errors.InputValidationError("invalid json massage: expected dict or list")
+
+
+def compile_descriptors():
+    """
+    Compile all the descriptors defined in rest/requests.py
+    """
+    for name in dir(requests):
+        descriptor = getattr(requests, name)
+        if name.endswith('Desc') or name.endswith('DescRaw'):
+            if isinstance(descriptor, (dict, list)) and id(descriptor) not in __VALIDATORS:
+                __VALIDATORS[id(descriptor)] = (descriptor, compile_type(descriptor, {}))
@@ -71,8 +71,26 @@ class SettingsClass(object):
         self.bind_remote_ports = [80, 443]
         self.bind_local_ports = [8082, 8083]
 
+        # the https workers forward the requests to the backend over
+        # a unix socket instead of over the tcp port 8082
+        self.bind_unix_socket = True
+
         self.db_type = 'sqlite'
 
+        # sqlite tuning of the connections used at runtime
+        self.db_cache_size = -16384 # 16MB (negative values are expressed in KB)
+        self.db_mmap_size = 67108864 # 64MB
+        self.db_synchronous = 'NORMAL'
+        self.db_temp_store = 'MEMORY'
+
+        # maximum size (bytes) of the content kept in memory by the ApiCache
+        self.api_cache_size = 33554432 # 32MB
+
+        # maximum size (bytes) of the client files kept in memory and of each
+        # of them; the larger files are streamed from the disk
+        self.static_cache_size = 33554432 # 32MB
+        self.static_cache_file_max_size = 4194304 # 4MB
+
         # debug defaults
         self.orm_debug = False
 
@@ -188,6 +206,7 @@ class SettingsClass(object):
         self.attachments_path = os.path.abspath(os.path.join(self.working_path, 'attachments'))
         self.tmp_path = os.path.abspath(os.path.join(self.working_path, 'tmp'))
         self.backups_path = os.path.abspath(os.path.join(self.working_path, 'backups'))
+        self.unix_socket_path = os.path.abspath(os.path.join(self.working_path, 'backend.sock'))
         self.static_db_source = os.path.abspath(os.path.join(self.src_path, 'globaleaks', 'db'))
 
         self.db_schema = os.path.join(self.static_db_source, 'sqlite.sql')
@@ -73,7 +73,10 @@ class StateClass(ObjectDict):
         self.tenant_cache = {}
         self.tenant_hostname_id_map = {}
 
-        self.set_orm_tp(ThreadPool(4, 16))
+        # All the writes are serialized on a single thread while the reads
+        # are executed concurrently on a separate pool
+        self.set_orm_tp(ThreadPool(1, 1))
+        self.set_orm_ro_tp(ThreadPool(4, 16))
         self.TempUploadFiles = TempDict(timeout=3600)
 
 
@@ -87,6 +90,10 @@ class StateClass(ObjectDict):
         self.orm_tp = orm_tp
         orm.set_thread_pool(orm_tp)
 
+    def set_orm_ro_tp(self, orm_ro_tp):
+        self.orm_ro_tp = orm_ro_tp
+        orm.set_ro_thread_pool(orm_ro_tp)
+
     def get_agent(self, tid=1):
         if self.tenant_cache[tid].anonymize_outgoing_connections:
             return get_tor_agent(self.settings.socks_host, self.settings.socks_port)
@@ -252,11 +259,8 @@ class StateClass(ObjectDict):
 
             self.onion_service_job.remove_unwanted_hidden_services().addBoth(f) # pylint: disable=no-member
 
-        # Power cycle HTTPS processes
-        def g(*args):
-            return self.process_supervisor.maybe_launch_https_workers()
-
-        self.process_supervisor.shutdown(friendly=True).addBoth(g)  # pylint: disable=no-member
+        # Update the TLS configuration of the HTTPS processes
+        self.process_supervisor.reload_https_workers()
 
     def format_and_send_mail(self, session, tid, user_desc, template_vars):
         subject, body = Templating().get_mail_subject_and_body(template_vars)
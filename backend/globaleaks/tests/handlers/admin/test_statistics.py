@@ -86,3 +86,36 @@ class TestJobsTiming(helpers.TestHandler):
         handler = self.request({}, role='admin')
 
         yield handler.get()
+
+
+class TestTransactionsTiming(helpers.TestHandler):
+    _handler = statistics.TransactionsTiming
+
+    @inlineCallbacks
+    def test_get(self):
+        handler = self.request({}, role='admin')
+
+        response = yield handler.get()
+
+        self.assertTrue(isinstance(response, list))
+
+        for elem in response:
+            for k in ['name', 'queue_time', 'execution_time', 'commit_time', 'queries', 'lock_retries', 'failures']:
+                self.assertTrue(k in elem)
+
+
+class TestApiCacheStats(helpers.TestHandler):
+    _handler = statistics.ApiCacheStats
+
+    @inlineCallbacks
+    def test_get(self):
+        handler = self.request({}, role='admin')
+
+        response = yield handler.get()
+
+        for k in ['size', 'max_size', 'tenants']:
+            self.assertTrue(k in response)
+
+        for elem in response['tenants']:
+            for k in ['tid', 'hits', 'misses', 'evictions', 'bytes', 'entries']:
+                self.assertTrue(k in elem)
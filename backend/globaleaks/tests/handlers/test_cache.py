@@ -1,14 +1,21 @@
 # -*- coding: utf-8 -*-
-from twisted.internet.defer import inlineCallbacks
+import os
+import zlib
 
-from globaleaks.rest.apicache import ApiCache, gzipdata
+from twisted.internet.defer import Deferred, inlineCallbacks
+
+from globaleaks.handlers.admin import l10n as admin_l10n
+from globaleaks.rest.apicache import ApiCache, ApiCacheEntry, decorator_cache_get, decorator_cache_invalidate, gzipdata
+from globaleaks.settings import Settings
 from globaleaks.tests import helpers
 
 
-class TestApiCache(helpers.TestGL):
+class TestApiCache(helpers.TestHandler):
+    _handler = admin_l10n.AdminL10NHandler
+
     @inlineCallbacks
     def setUp(self):
-        yield helpers.TestGL.setUp(self)
+        yield helpers.TestHandler.setUp(self)
 
         ApiCache.invalidate()
 
@@ -20,14 +27,217 @@ class TestApiCache(helpers.TestGL):
         ApiCache.set(1, "passante_di_professione", "it", 'text/plain', 'ititit')
         ApiCache.set(1, "passante_di_professione", "en", 'text/plain', 'enenen')
         ApiCache.set(2, "passante_di_professione", "ca", 'text/plain', 'cacaca')
-        self.assertTrue("passante_di_professione" in ApiCache.memory_cache_dict[1])
-        self.assertTrue("passante_di_professione" in ApiCache.memory_cache_dict[2])
+        self.assertTrue(("passante_di_professione", "it") in ApiCache.memory_cache_dict[1])
+        self.assertTrue(("passante_di_professione", "en") in ApiCache.memory_cache_dict[1])
+        self.assertTrue(("passante_di_professione", "ca") in ApiCache.memory_cache_dict[2])
         self.assertIsNone(ApiCache.get(1, "passante_di_professione", "ca"))
-        self.assertTrue("it" in ApiCache.memory_cache_dict[1]['passante_di_professione'])
-        self.assertTrue("en" in ApiCache.memory_cache_dict[1]['passante_di_professione'])
-        self.assertIsNone(ApiCache.get(1, "passante_di_professione", "ca"))
-        self.assertEqual(ApiCache.get(1, "passante_di_professione", "it")[1], gzipdata('ititit'))
-        self.assertEqual(ApiCache.get(1, "passante_di_professione", "en")[1], gzipdata('enenen'))
-        self.assertEqual(ApiCache.get(2, "passante_di_professione", "ca")[1], gzipdata('cacaca'))
+        self.assertEqual(ApiCache.get(1, "passante_di_professione", "it").variants['identity'], b'ititit')
+        self.assertEqual(ApiCache.get(1, "passante_di_professione", "en").variants['identity'], b'enenen')
+        self.assertEqual(ApiCache.get(2, "passante_di_professione", "ca").variants['identity'], b'cacaca')
         ApiCache.invalidate()
         self.assertEqual(ApiCache.memory_cache_dict, {})
+
+    def test_cache_stats(self):
+        ApiCache.stats.clear()
+
+        ApiCache.set(1, "passante_di_professione", "it", 'text/plain', 'ititit')
+        ApiCache.get(1, "passante_di_professione", "it")
+        ApiCache.get(1, "passante_di_professione", "en")
+
+        entry_size = ApiCacheEntry('text/plain', 'ititit').size
+
+        stats = ApiCache.get_stats(1)
+        self.assertEqual(stats['size'], entry_size)
+        self.assertEqual(stats['tenants'], [{'tid': 1,
+                                             'hits': 1,
+                                             'misses': 1,
+                                             'evictions': 0,
+                                             'bytes': entry_size,
+                                             'entries': 1}])
+
+        ApiCache.invalidate(1)
+        self.assertEqual(ApiCache.size, 0)
+        self.assertEqual(ApiCache.get_stats(1)['tenants'][0]['bytes'], 0)
+
+    def test_cache_eviction(self):
+        entry_size = ApiCacheEntry('text/plain', 'a' * 100).size
+        self.patch(Settings, 'api_cache_size', entry_size * 4)
+
+        for i in range(3):
+            ApiCache.set(1, "resource%d" % i, "en", 'text/plain', 'abc'[i] * 100)
+
+        ApiCache.set(2, "resource", "en", 'text/plain', 'd' * 100)
+
+        # The least recently used entry of the largest tenant is evicted
+        ApiCache.get(1, "resource0", "en")
+        ApiCache.set(2, "resource", "it", 'text/plain', 'e' * 100)
+
+        self.assertLessEqual(ApiCache.size, Settings.api_cache_size)
+        self.assertIsNone(ApiCache.get(1, "resource1", "en"))
+        self.assertIsNotNone(ApiCache.get(1, "resource0", "en"))
+        self.assertIsNotNone(ApiCache.get(2, "resource", "en"))
+        self.assertEqual(ApiCache.get_tenant_stats(1)['evictions'], 1)
+        self.assertEqual(ApiCache.get_tenant_stats(2)['evictions'], 0)
+
+        # The entries bigger than the whole cache are never stored
+        ApiCache.set(3, "resource", "en", 'text/plain', os.urandom(entry_size * 8))
+        self.assertIsNone(ApiCache.get(3, "resource", "en"))
+
+    def test_cache_size_shared_variants(self):
+        ApiCache.stats.clear()
+
+        entry_size = ApiCacheEntry('text/plain', 'x' * 100).size
+        self.patch(Settings, 'api_cache_size', entry_size * 2)
+
+        # The entries with identical content share the variants counted once
+        for tid in range(1, 5):
+            ApiCache.set(tid, "resource", "en", 'text/plain', 'x' * 100)
+
+        self.assertEqual(ApiCache.size, entry_size)
+        for tid in range(1, 5):
+            self.assertIsNotNone(ApiCache.get(tid, "resource", "en"))
+            self.assertEqual(ApiCache.get_tenant_stats(tid)['evictions'], 0)
+
+        ApiCache.invalidate(1)
+        self.assertEqual(ApiCache.size, entry_size)
+
+        ApiCache.invalidate()
+        self.assertEqual(ApiCache.size, 0)
+        self.assertEqual(ApiCache.references, {})
+
+    def test_cache_tags(self):
+        ApiCache.set(1, "/public", "en", 'application/json', '{}', ['node', 'contexts'])
+        ApiCache.set(1, "/l10n/en", "en", 'application/json', '{}', ['l10n:en'])
+        ApiCache.set(1, "/l10n/it", "it", 'application/json', '{}', ['l10n:it'])
+        ApiCache.set(1, "/untagged", "en", 'application/json', '{}')
+        ApiCache.set(2, "/l10n/en", "en", 'application/json', '{}', ['l10n:en'])
+
+        ApiCache.invalidate(1, ['l10n:en'])
+
+        self.assertIsNotNone(ApiCache.get(1, "/public", "en"))
+        self.assertIsNone(ApiCache.get(1, "/l10n/en", "en"))
+        self.assertIsNotNone(ApiCache.get(1, "/l10n/it", "it"))
+        self.assertIsNone(ApiCache.get(1, "/untagged", "en"))
+        self.assertIsNotNone(ApiCache.get(2, "/l10n/en", "en"))
+
+        ApiCache.invalidate(None, ['contexts', 'l10n:en'])
+
+        self.assertIsNone(ApiCache.get(1, "/public", "en"))
+        self.assertIsNotNone(ApiCache.get(1, "/l10n/it", "it"))
+        self.assertIsNone(ApiCache.get(2, "/l10n/en", "en"))
+
+    def test_cache_invalidate_decorator(self):
+        ApiCache.set(1, "/l10n/en", "en", 'application/json', '{}', ['l10n:en'])
+        ApiCache.set(1, "/l10n/it", "it", 'application/json', '{}', ['l10n:it'])
+
+        handler = self.request({}, role='admin')
+        decorator_cache_invalidate(lambda self, lang: None)(handler, lang=u'en')
+
+        self.assertIsNone(ApiCache.get(1, "/l10n/en", "en"))
+        self.assertIsNotNone(ApiCache.get(1, "/l10n/it", "it"))
+
+    @inlineCallbacks
+    def test_cache_invalidate_decorator_concurrent_compute(self):
+        write = Deferred()
+        read = Deferred()
+
+        handler = self.request({}, role='admin')
+        d = decorator_cache_invalidate(lambda self, lang: write)(handler, lang=u'en')
+
+        # A reader computes the entry after the invalidation and before the
+        # commit of the change
+        d1 = ApiCache.compute(1, "/l10n/en", "en", lambda: read, ['l10n:en'])
+        read.callback(('application/json', '{"old": "data"}'))
+        yield d1
+
+        write.callback(None)
+        yield d
+
+        self.assertFalse(ApiCache.contains(1, "/l10n/en", "en"))
+
+    def test_cache_entry_shared_variants(self):
+        entry_1 = ApiCache.set(1, "/l10n/en", "en", 'application/json', '{"a": "b"}')
+        entry_2 = ApiCache.set(2, "/l10n/en", "en", 'application/json', '{"a": "b"}')
+        entry_3 = ApiCache.set(2, "/l10n/it", "it", 'application/json', '{"a": "c"}')
+
+        self.assertIs(entry_1.variants, entry_2.variants)
+        self.assertIsNot(entry_1.variants, entry_3.variants)
+
+    def test_cache_entry_negotiation(self):
+        entry = ApiCacheEntry('application/json', '{}')
+
+        self.assertEqual(entry.negotiate(None), 'identity')
+        self.assertEqual(entry.negotiate('gzip, deflate'), 'gzip')
+        self.assertEqual(entry.negotiate('gzip;q=0.5, identity'), 'identity')
+        self.assertEqual(entry.negotiate('*'), 'br' if 'br' in entry.variants else 'gzip')
+        self.assertEqual(entry.negotiate('gzip;q=0, identity;q=0'), 'identity')
+        self.assertNotEqual(entry.get_etag('gzip'), entry.get_etag('identity'))
+
+    @inlineCallbacks
+    def test_cache_get_decorator(self):
+        f = decorator_cache_get(lambda self: {'antani': 'sblinda'})
+
+        handler = self.request({}, role='admin', headers={'Accept-Encoding': 'gzip'})
+        response = yield f(handler)
+        self.assertEqual(zlib.decompress(response, 16 + zlib.MAX_WBITS), b'{"antani": "sblinda"}')
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders('Content-encoding'), ['gzip'])
+
+        etag = handler.request.responseHeaders.getRawHeaders('ETag')[0]
+
+        handler = self.request({}, role='admin', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        response = yield f(handler)
+        self.assertIsNone(response)
+        self.assertEqual(handler.request.responseCode, 304)
+
+        # The identity variant has a different ETag
+        handler = self.request({}, role='admin', headers={'If-None-Match': etag})
+        response = yield f(handler)
+        self.assertEqual(response, b'{"antani": "sblinda"}')
+
+    @inlineCallbacks
+    def test_cache_compute(self):
+        calls = []
+        d = Deferred()
+
+        def f():
+            calls.append(None)
+            return d
+
+        d1 = ApiCache.compute(1, "/public", "en", f, ['node'])
+        d2 = ApiCache.compute(1, "/public", "en", f, ['node'])
+
+        d.callback(('application/json', '{}'))
+
+        entry1 = yield d1
+        entry2 = yield d2
+
+        self.assertEqual(len(calls), 1)
+        self.assertIs(entry1, entry2)
+        self.assertIs(ApiCache.get(1, "/public", "en"), entry1)
+
+    @inlineCallbacks
+    def test_cache_compute_invalidated(self):
+        d = Deferred()
+
+        d1 = ApiCache.compute(1, "/public", "en", lambda: d, ['node'])
+
+        # The entry computed before the invalidation could be outdated
+        ApiCache.invalidate(1, ['node'])
+
+        d.callback(('application/json', '{}'))
+
+        entry = yield d1
+        self.assertEqual(entry.variants['identity'], b'{}')
+        self.assertFalse(ApiCache.contains(1, "/public", "en"))
+
+    @inlineCallbacks
+    def test_cache_get_decorator_immutable(self):
+        f = decorator_cache_get(lambda self: {'antani': 'sblinda'})
+
+        handler = self.request({})
+        handler.check_roles = '*'
+        handler.cache_immutable = True
+
+        yield f(handler)
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders('Cache-control'),
+                         ['public, max-age=31536000, immutable'])
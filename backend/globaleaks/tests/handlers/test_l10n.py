@@ -31,3 +31,47 @@ class TestL10NHandler(helpers.TestHandler):
         response = yield handler.get(lang=u'en')
         self.assertIn('12345', response)
         self.assertEqual('54321', response['12345'])
+
+    @inlineCallbacks
+    def test_get_shares_base_texts(self):
+        texts_1 = yield l10n.get_l10n(1, u'en')
+        texts_2 = yield l10n.get_l10n(2, u'en')
+
+        # The tenants without customizations share the texts of the client
+        self.assertIs(texts_1, l10n.L10NBase.get(u'en'))
+        self.assertIs(texts_2, texts_1)
+
+
+class TestL10NBaseHandler(helpers.TestHandler):
+    _handler = l10n.L10NBaseHandler
+
+    @inlineCallbacks
+    def test_get(self):
+        version = l10n.L10NBase.get_version(u'en')
+
+        handler = self.request()
+        response = yield handler.get(u'en', version)
+        self.assertIs(response, l10n.L10NBase.get(u'en'))
+
+        # Outdated versions are never served at the address of another one
+        handler = self.request()
+        self.assertRaises(errors.ResourceNotFound, handler.get, u'en', u'0' * 16)
+
+
+class TestL10NCustomHandler(helpers.TestHandler):
+    _handler = l10n.L10NCustomHandler
+
+    @inlineCallbacks
+    def test_get(self):
+        handler = self.request()
+        response = yield handler.get(lang=u'en')
+        self.assertEqual(response, {})
+
+        self._handler = admin_l10n.AdminL10NHandler
+        handler = self.request(custom_texts, role='admin')
+        yield handler.put(lang=u'en')
+
+        self._handler = l10n.L10NCustomHandler
+        handler = self.request()
+        response = yield handler.get(lang=u'en')
+        self.assertEqual(response, custom_texts)
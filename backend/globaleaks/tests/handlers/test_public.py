@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
+import base64
 import json
 
 from globaleaks.handlers import public
-from globaleaks.rest import requests
+from globaleaks.handlers.admin import file, modelimgs
+from globaleaks.rest import errors, requests
 from globaleaks.tests import helpers
 from twisted.internet.defer import inlineCallbacks
 
@@ -16,3 +18,31 @@ class TestPublicResource(helpers.TestHandlerWithPopulatedDB):
         response = yield handler.get()
 
         self._handler.validate_message(json.dumps(response), requests.PublicResourcesDesc)
+
+
+class TestMediaHandler(helpers.TestHandlerWithPopulatedDB):
+    _handler = public.MediaHandler
+
+    @inlineCallbacks
+    def test_get(self):
+        yield file.add_file(1, u'logo', u'', base64.b64encode(b'logo'))
+        yield modelimgs.add_model_img(1, 'contexts', self.dummyContext['id'], b'picture')
+
+        resources = yield public.get_public_resources(1, u'en')
+
+        # The public resources only include the addresses of the media
+        kind, id, version = resources['node']['logo'].split('/')[1:]
+        handler = self.request()
+        response = yield handler.get(kind, id, version)
+        self.assertEqual(response, b'logo')
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders('content-type'), ['image/png'])
+
+        context = [c for c in resources['contexts'] if c['id'] == self.dummyContext['id']][0]
+        kind, id, version = context['picture'].split('/')[1:]
+        handler = self.request()
+        response = yield handler.get(kind, id, version)
+        self.assertEqual(response, b'picture')
+
+        # Only the current version of the media is served
+        handler = self.request()
+        yield self.assertFailure(handler.get(kind, id, u'0' * 16), errors.ResourceNotFound)
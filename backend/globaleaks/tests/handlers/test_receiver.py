@@ -36,6 +36,9 @@ class TestUserInstance(helpers.TestHandlerWithPopulatedDB):
 class TestTipsCollection(helpers.TestHandlerWithPopulatedDB):
     _handler = receiver.TipsCollection
 
+    # Maximum number of SQL statements issued to serialize the list of tips
+    query_budget = 6
+
     @inlineCallbacks
     def setUp(self):
         yield helpers.TestHandlerWithPopulatedDB.setUp(self)
@@ -50,6 +53,15 @@ class TestTipsCollection(helpers.TestHandlerWithPopulatedDB):
             self.assertEqual(ret[idx]['comment_count'], 3)
             self.assertEqual(ret[idx]['message_count'], 2)
 
+    @inlineCallbacks
+    def test_get_query_budget(self):
+        # The number of queries should not depend on the number of tips
+        for _ in range(2):
+            yield self.perform_full_submission_actions()
+
+            handler = self.request(user_id=self.dummyReceiver_1['id'], role='receiver')
+            yield self.assert_query_budget(self.query_budget, handler.get)
+
 
 class TestTipsOperations(helpers.TestHandlerWithPopulatedDB):
     _handler = receiver.TipsOperations
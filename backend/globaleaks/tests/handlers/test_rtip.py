@@ -13,6 +13,9 @@ from globaleaks.utils.utility import datetime_now, ISO8601_to_datetime
 class TestRTipInstance(helpers.TestHandlerWithPopulatedDB):
     _handler = rtip.RTipInstance
 
+    # Maximum number of SQL statements issued to serialize a tip
+    query_budget = 17
+
     @inlineCallbacks
     def setUp(self):
         yield helpers.TestHandlerWithPopulatedDB.setUp(self)
@@ -25,6 +28,18 @@ class TestRTipInstance(helpers.TestHandlerWithPopulatedDB):
             handler = self.request(role='receiver', user_id = rtip_desc['receiver_id'])
             yield handler.get(rtip_desc['id'])
 
+    @inlineCallbacks
+    def test_get_query_budget(self):
+        # The number of queries should not depend on the number of
+        # comments, messages and files associated to the tip
+        for _ in range(2):
+            yield self.perform_full_submission_actions()
+
+            rtip_descs = yield self.get_rtips()
+            for rtip_desc in rtip_descs:
+                handler = self.request(role='receiver', user_id = rtip_desc['receiver_id'])
+                yield self.assert_query_budget(self.query_budget, handler.get, rtip_desc['id'])
+
     @inlineCallbacks
     def test_put_postpone(self):
         now = datetime_now()
@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+
 from six import text_type
 from twisted.internet.defer import inlineCallbacks
+from twisted.web.http import datetimeToString
 
-from globaleaks.handlers.staticfile import StaticFileHandler
+from globaleaks.handlers.staticfile import StaticFileCache, StaticFileHandler
 from globaleaks.rest import errors
+from globaleaks.rest.apicache import gzipdata
 from globaleaks.settings import Settings
 from globaleaks.tests import helpers
 
@@ -13,13 +19,118 @@ FUTURE = 100
 class TestStaticFileHandler(helpers.TestHandler):
     _handler = StaticFileHandler
 
+    def setUp(self):
+        StaticFileCache.clear()
+
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+        with open(os.path.join(self.path, 'script.js'), 'wb') as f:
+            f.write(b'alert(1);' * 100)
+
+        with open(os.path.join(self.path, 'script.0123456789abcdef.js'), 'wb') as f:
+            f.write(b'alert(2);')
+
+        return helpers.TestHandler.setUp(self)
+
+    def tearDown(self):
+        StaticFileCache.clear()
+
+        return helpers.TestHandler.tearDown(self)
+
     @inlineCallbacks
     def test_get_existent(self):
         handler = self.request(kwargs={'path': Settings.client_path})
-        yield handler.get('')
-        self.assertTrue(text_type(handler.request.getResponseBody(), 'utf-8').startswith('<!doctype html>'))
+        response = yield handler.get('')
+        self.assertTrue(text_type(response, 'utf-8').startswith('<!doctype html>'))
 
     def test_get_unexistent(self):
         handler = self.request(kwargs={'path': Settings.client_path})
 
         return self.assertRaises(errors.ResourceNotFound, handler.get, u'unexistent')
+
+    def test_get_compressed(self):
+        handler = self.request(kwargs={'path': self.path}, headers={'Accept-Encoding': 'gzip'})
+        response = handler.get('script.js')
+        self.assertEqual(response, gzipdata(b'alert(1);' * 100))
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders('Content-encoding'), ['gzip'])
+
+        handler = self.request(kwargs={'path': self.path})
+        response = handler.get('script.js')
+        self.assertEqual(response, b'alert(1);' * 100)
+        self.assertFalse(handler.request.responseHeaders.hasHeader('Content-encoding'))
+
+    def test_get_precompressed(self):
+        with open(os.path.join(self.path, 'script.js.br'), 'wb') as f:
+            f.write(b'precompressed')
+
+        handler = self.request(kwargs={'path': self.path}, headers={'Accept-Encoding': 'gzip, br'})
+        response = handler.get('script.js')
+        self.assertEqual(response, b'precompressed')
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders('Content-encoding'), ['br'])
+
+    def test_get_not_modified(self):
+        handler = self.request(kwargs={'path': self.path})
+        handler.get('script.js')
+        etag = handler.request.responseHeaders.getRawHeaders('ETag')[0]
+        last_modified = handler.request.responseHeaders.getRawHeaders('Last-Modified')[0]
+
+        handler = self.request(kwargs={'path': self.path}, headers={'If-None-Match': etag})
+        self.assertEqual(handler.get('script.js'), None)
+        self.assertEqual(handler.request.responseCode, 304)
+
+        handler = self.request(kwargs={'path': self.path}, headers={'If-Modified-Since': last_modified})
+        self.assertEqual(handler.get('script.js'), None)
+        self.assertEqual(handler.request.responseCode, 304)
+
+        handler = self.request(kwargs={'path': self.path}, headers={'If-Modified-Since': datetimeToString(0)})
+        self.assertEqual(handler.get('script.js'), b'alert(1);' * 100)
+
+    def test_get_modified(self):
+        handler = self.request(kwargs={'path': self.path})
+        handler.get('script.js')
+
+        path = os.path.join(self.path, 'script.js')
+        with open(path, 'wb') as f:
+            f.write(b'alert(3);')
+
+        os.utime(path, (FUTURE, FUTURE))
+
+        handler = self.request(kwargs={'path': self.path})
+        self.assertEqual(handler.get('script.js'), b'alert(3);')
+
+    def test_cache_control(self):
+        handler = self.request(kwargs={'path': self.path})
+        handler.get('script.js')
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders('Cache-control'), ['no-cache'])
+
+        handler = self.request(kwargs={'path': self.path})
+        handler.get('script.0123456789abcdef.js')
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders('Cache-control'),
+                         ['public, max-age=31536000, immutable'])
+
+    @inlineCallbacks
+    def test_get_large_file(self):
+        self.patch(Settings, 'static_cache_file_max_size', 0)
+
+        handler = self.request(kwargs={'path': self.path})
+        yield handler.get('script.js')
+        self.assertEqual(handler.request.getResponseBody(), b'alert(1);' * 100)
+        self.assertEqual(StaticFileCache.size, 0)
+
+    def test_cache_size_variants(self):
+        # The budget is enough for the identity variant but not for the gzip one
+        self.patch(Settings, 'static_cache_size', len(b'alert(1);' * 100) + 1)
+
+        with open(os.path.join(self.path, 'script.js.gz'), 'wb') as f:
+            f.write(gzipdata(b'alert(1);' * 100))
+
+        self.assertFalse(StaticFileCache.get(os.path.join(self.path, 'script.js')).in_memory)
+        self.assertTrue(StaticFileCache.get(os.path.join(self.path, 'script.0123456789abcdef.js')).in_memory)
+        self.assertLessEqual(StaticFileCache.size, Settings.static_cache_size)
+
+    def test_preload(self):
+        StaticFileCache.preload(self.path)
+
+        self.assertEqual(len(StaticFileCache.files), 2)
+        self.assertTrue(StaticFileCache.size > 0)
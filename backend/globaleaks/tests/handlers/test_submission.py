@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
+from globaleaks import models
 from globaleaks.handlers import authentication, wbtip
-from globaleaks.handlers.submission import SubmissionInstance
+from globaleaks.handlers.submission import SubmissionInstance, \
+    db_get_archived_preview_schemas, db_get_archived_questionnaire_schema
 from globaleaks.jobs import delivery
+from globaleaks.orm import get_queries_count, transact
 from globaleaks.rest import errors
 from globaleaks.tests import helpers
 from globaleaks.utils.token import Token
@@ -152,3 +155,25 @@ class TestSubmissionPlaintextScenario(TestSubmissionEncryptedScenario):
         'encrypted': 0,
         'reference': 6
     }
+
+
+class TestArchivedSchemaCache(helpers.TestGLWithPopulatedDB):
+    @transact
+    def _test_archived_schema_cache(self, session):
+        questionnaire_hash = session.query(models.InternalTip.questionnaire_hash).first()[0]
+
+        x = db_get_archived_questionnaire_schema(session, questionnaire_hash, u'en')
+        y = db_get_archived_preview_schemas(session, [questionnaire_hash], u'en')[questionnaire_hash]
+
+        # The localized schemas are served from the cache without queries
+        queries_count = get_queries_count()
+        self.assertIs(db_get_archived_questionnaire_schema(session, questionnaire_hash, u'en'), x)
+        self.assertIs(db_get_archived_preview_schemas(session, [questionnaire_hash], u'en')[questionnaire_hash], y)
+        self.assertEqual(get_queries_count(), queries_count)
+
+        self.assertIsNot(db_get_archived_questionnaire_schema(session, questionnaire_hash, u'it'), x)
+
+    @inlineCallbacks
+    def test_archived_schema_cache(self):
+        yield self.perform_full_submission_actions()
+        yield self._test_archived_schema_cache()
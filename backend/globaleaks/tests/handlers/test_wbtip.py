@@ -7,6 +7,9 @@ from twisted.internet.defer import inlineCallbacks
 class TestWBTipInstance(helpers.TestHandlerWithPopulatedDB):
     _handler = wbtip.WBTipInstance
 
+    # Maximum number of SQL statements issued to serialize a tip
+    query_budget = 11
+
     @inlineCallbacks
     def setUp(self):
         yield helpers.TestHandlerWithPopulatedDB.setUp(self)
@@ -20,6 +23,18 @@ class TestWBTipInstance(helpers.TestHandlerWithPopulatedDB):
 
             yield handler.get()
 
+    @inlineCallbacks
+    def test_get_query_budget(self):
+        # The number of queries should not depend on the number of
+        # comments, messages and files associated to the tip
+        for _ in range(2):
+            yield self.perform_full_submission_actions()
+
+            wbtips_desc = yield self.get_wbtips()
+            for wbtip_desc in wbtips_desc:
+                handler = self.request(role='whistleblower', user_id = wbtip_desc['id'])
+                yield self.assert_query_budget(self.query_budget, handler.get)
+
 class TestWBTipCommentCollection(helpers.TestHandlerWithPopulatedDB):
     _handler = wbtip.WBTipCommentCollection
 
@@ -135,6 +135,7 @@ def init_state():
         dir_util.remove_tree(Settings.working_path, 0)
 
     orm.set_thread_pool(FakeThreadPool())
+    orm.set_ro_thread_pool(FakeThreadPool())
 
     State.settings.enable_api_cache = False
     State.tenant_cache[1] = ObjectDict()
@@ -630,6 +631,22 @@ class TestGL(unittest.TestCase):
 
         return [models.serializers.serialize_rfile(session, 1, rfile) for rfile in rfiles]
 
+    @inlineCallbacks
+    def assert_query_budget(self, budget, f, *args, **kwargs):
+        """
+        Call f and fail if it issues more SQL statements than the budget
+        """
+        queries_count = orm.get_queries_count()
+
+        ret = yield f(*args, **kwargs)
+
+        queries_count = orm.get_queries_count() - queries_count
+
+        self.assertTrue(queries_count <= budget,
+                        "%d SQL statements issued exceeding the budget of %d" % (queries_count, budget))
+
+        returnValue(ret)
+
     def db_test_model_count(self, session, model, n):
         self.assertEqual(session.query(model).count(), n)
 
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from globaleaks.handlers.l10n import L10NBase
+from globaleaks.jobs import cache_warmer
+from globaleaks.rest.apicache import ApiCache
+from globaleaks.state import State
+from globaleaks.tests import helpers
+from twisted.internet.defer import inlineCallbacks
+
+
+class TestCacheWarmer(helpers.TestGLWithPopulatedDB):
+    @inlineCallbacks
+    def setUp(self):
+        yield helpers.TestGLWithPopulatedDB.setUp(self)
+
+        State.settings.enable_api_cache = True
+        ApiCache.invalidate()
+
+    def tearDown(self):
+        State.settings.enable_api_cache = False
+
+        return helpers.TestGLWithPopulatedDB.tearDown(self)
+
+    @inlineCallbacks
+    def test_cache_warmer(self):
+        job = cache_warmer.CacheWarmer()
+        yield job.run()
+
+        for lang in State.tenant_cache[1].languages_enabled:
+            self.assertTrue(ApiCache.contains(1, b'/public', lang))
+            self.assertTrue(ApiCache.contains(1, ('/l10n/%s/%s' % (lang, L10NBase.get_version(lang))).encode(), lang))
+            self.assertTrue(ApiCache.contains(1, ('/l10n/%s/custom' % lang).encode(), lang))
+
+        self.assertGreater(job.report['warmed_entries'], 0)
+
+        # Only the invalidated tenants are processed by the next execution
+        ApiCache.invalidate(1, ['contexts'])
+
+        yield job.run()
+
+        self.assertTrue(ApiCache.contains(1, b'/public', State.tenant_cache[1].default_language))
+        self.assertEqual(job.report['warmed_entries'], len(set(State.tenant_cache[1].languages_enabled)))
+
+        # Let the scheduler start the job in order to be able to stop it
+        self.test_reactor.advance(1)
+        yield job.stop()
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from globaleaks import models
+from globaleaks.jobs import vacuum
+from globaleaks.orm import transact
+from globaleaks.tests import helpers
+from twisted.internet.defer import inlineCallbacks
+
+
+class TestVacuum(helpers.TestGLWithPopulatedDB):
+    @transact
+    def delete_config(self, session):
+        session.query(models.ConfigL10N).delete(synchronize_session=False)
+
+    @transact
+    def get_freelist_count(self, session):
+        return session.execute('PRAGMA freelist_count').scalar()
+
+    @inlineCallbacks
+    def test_vacuum(self):
+        yield self.delete_config()
+
+        free_pages = yield self.get_freelist_count()
+        self.assertGreater(free_pages, 0)
+
+        job = vacuum.Vacuum()
+        job.slice_pages = 1
+        yield job.run()
+
+        free_pages_after = yield self.get_freelist_count()
+        self.assertEqual(free_pages_after, 0)
+
+        self.assertEqual(job.report['reclaimed_pages'], free_pages)
+        self.assertEqual(job.report['remaining_pages'], 0)
+        self.assertGreater(job.report['reclaimed_bytes'], 0)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the execution of the transactions and of the cached queries.
+
+The transactions executed on the shared engine are compared with the ones
+creating an engine at every execution and the cached queries with the ones
+built and compiled at every execution. The functions need an initialized
+database.
+"""
+from __future__ import print_function
+
+import time
+from collections import OrderedDict
+
+from sqlalchemy.orm import sessionmaker
+from twisted.internet.defer import inlineCallbacks, returnValue
+
+from globaleaks import models, orm
+from globaleaks.models.config import query_config
+
+
+@orm.transact
+def count_config(session):
+    return session.query(models.Config).filter(models.Config.tid == 1).count()
+
+
+def get_session_with_new_engine(db_uri=None):
+    # Emulation of the previous behaviour creating an engine at every transaction
+    return sessionmaker(bind=orm.get_engine(db_uri))()
+
+
+@inlineCallbacks
+def time_transactions(transactions):
+    start = time.time()
+    for _ in range(transactions):
+        yield count_config()
+
+    returnValue(time.time() - start)
+
+
+@inlineCallbacks
+def benchmark_transactions(transactions=1000):
+    """
+    Time the execution of the transactions with an engine per transaction
+    and with the shared engine
+
+    :param transactions: the number of transactions executed
+    :return: a dictionary with the time spent by each configuration
+    """
+    results = OrderedDict()
+    results['executions'] = transactions
+
+    get_session = orm.get_session
+    orm.get_session = get_session_with_new_engine
+    try:
+        results['engine per transaction'] = yield time_transactions(transactions)
+    finally:
+        orm.get_session = get_session
+
+    results['shared engine'] = yield time_transactions(transactions)
+
+    returnValue(results)
+
+
+@orm.transact
+def benchmark_cached_query(session, executions=1000):
+    """
+    Time the executions of a query built at every execution and of the
+    same query cached
+
+    :param executions: the number of executions of each query
+    :return: a dictionary with the time spent by each query
+    """
+    results = OrderedDict()
+    results['executions'] = executions
+
+    start = time.time()
+    for _ in range(executions):
+        session.query(models.Config).filter(models.Config.tid == 1, models.Config.var_name == u'name').one()
+
+    results['built query'] = time.time() - start
+
+    start = time.time()
+    for _ in range(executions):
+        query_config(session, tid=1, var_name=u'name').one()
+
+    results['cached query'] = time.time() - start
+
+    return results
+
+
+def print_benchmark(results):
+    names = [x for x in results if x != 'executions']
+
+    for name in names:
+        print("%-25s %8.3fs (%.2f executions/s)" % (name, results[name], results['executions'] / results[name]))
+
+    print("speedup: %.1fx" % (results[names[0]] / results[names[1]]))
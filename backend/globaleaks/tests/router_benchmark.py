@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the dispatch of the requests to the handlers of the api_spec.
+
+The Router is compared with the sequential evaluation of the regular
+expressions of the routes on a mix of requests resembling the traffic of a
+platform, where most of the requests are directed to the files of the
+client and to the public resources.
+"""
+from __future__ import print_function
+
+import re
+import time
+from collections import OrderedDict
+
+from globaleaks.rest.router import Router
+
+UUID = u'0a1b2c3d-4e5f-6a7b-8c9d-0e1f2a3b4c5d'
+TOKEN = u'a' * 42
+VERSION = u'0123456789abcdef'
+
+# (path, weight) of the requests of the mix
+REQUEST_MIX = [
+    (u'/', 10),
+    (u'/index.html', 5),
+    (u'/js/scripts.min.js', 10),
+    (u'/css/styles.min.css', 10),
+    (u'/fonts/glyphicons-halflings-regular.woff2', 5),
+    (u'/data/images/logo.png', 5),
+    (u'/public', 10),
+    (u'/l10n/en/' + VERSION, 5),
+    (u'/l10n/en/custom', 5),
+    (u'/media/files/logo/' + VERSION, 5),
+    (u'/media/contexts/' + UUID + u'/' + VERSION, 3),
+    (u'/token', 3),
+    (u'/token/' + TOKEN, 2),
+    (u'/submission/' + TOKEN, 2),
+    (u'/submission/' + TOKEN + u'/file', 2),
+    (u'/session', 3),
+    (u'/authentication', 1),
+    (u'/wbtip', 2),
+    (u'/wbtip/comments', 1),
+    (u'/receiver/tips', 2),
+    (u'/rtip/' + UUID, 2),
+    (u'/rtip/' + UUID + u'/comments', 1),
+    (u'/admin/node', 1),
+    (u'/admin/users/' + UUID, 1),
+    (u'/admin/l10n/en', 1),
+    (u'/robots.txt', 1),
+    (u'/s/' + UUID, 1),
+    (u'/u/' + TOKEN, 1)
+]
+
+
+class SequentialRouter(object):
+    """
+    Dispatcher evaluating the regular expressions of the routes in sequence
+    """
+    def __init__(self, spec):
+        self.routes = []
+        for tup in spec:
+            pattern, handler, args = (tuple(tup) + ({},))[:3]
+            self.routes.append((re.compile('^' + pattern.lstrip('^').rstrip('$') + '$'), handler, args))
+
+    def resolve(self, path):
+        for regexp, handler, args in self.routes:
+            match = regexp.match(path)
+            if match is not None:
+                return handler, args, match.groups()
+
+
+def build_routers(spec):
+    router = Router()
+    for tup in spec:
+        router.add(*tup)
+
+    router.compile()
+
+    return SequentialRouter(spec), router
+
+
+def get_requests():
+    requests = []
+    for path, weight in REQUEST_MIX:
+        requests.extend([path] * weight)
+
+    return requests
+
+
+def time_router(router, requests, iterations):
+    start = time.time()
+
+    for _ in range(iterations):
+        for path in requests:
+            router.resolve(path)
+
+    return time.time() - start
+
+
+def benchmark_router(spec=None, iterations=1000):
+    """
+    Time the resolution of the request mix by the two dispatchers
+
+    :param spec: the routes; by default the api_spec
+    :param iterations: the number of times the request mix is resolved
+    :return: a dictionary with the time spent by each dispatcher
+    """
+    if spec is None:
+        from globaleaks.rest.api import api_spec
+        spec = api_spec
+
+    sequential, router = build_routers(spec)
+    requests = get_requests()
+
+    results = OrderedDict()
+    results['requests'] = len(requests) * iterations
+    results['sequential'] = time_router(sequential, requests, iterations)
+    results['router'] = time_router(router, requests, iterations)
+
+    return results
+
+
+def print_benchmark(results):
+    for name in ['sequential', 'router']:
+        print("%-10s %8.3fs (%.2f us/request)" %
+              (name, results[name], results[name] * 1000000.0 / results['requests']))
+
+    print("speedup: %.1fx" % (results['sequential'] / results['router']))
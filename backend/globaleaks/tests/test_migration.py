@@ -7,7 +7,9 @@ for each version one an empty and a populated db must be sessiond in directories
 """
 import os
 import shutil
+import tempfile
 
+from sqlalchemy import Column, Index, Integer, MetaData, Table, event, inspect
 from sqlalchemy.orm import sessionmaker
 
 from globaleaks import __version__, DATABASE_VERSION, FIRST_DATABASE_VERSION_SUPPORTED, models, orm
@@ -18,6 +20,7 @@ from globaleaks.orm import get_engine
 from globaleaks.rest import errors
 from globaleaks.settings import Settings
 from globaleaks.tests import helpers
+from globaleaks.utils import migration_benchmark
 from twisted.trial import unittest
 
 
@@ -96,6 +99,133 @@ class TestMigrationRoutines(unittest.TestCase):
         self.assertEqual(saved_key, pk)
         session.close()
 
+    def _dump_tables(self, db_file, tables):
+        engine = get_engine(orm.make_db_uri(db_file))
+        ret = {table: sorted(engine.execute('SELECT * FROM %s' % table).fetchall()) for table in tables}
+        engine.dispose()
+        return ret
+
+    def preconditions_39(self):
+        # The migration to version 40 copies the tables of the submissions
+        # by means of the generic migration function and the migration to
+        # version 41 does not alter their columns, so their content should
+        # be preserved
+        self.tables = ['comment', 'fieldanswer', 'internalfile', 'internaltip', 'mail', 'message', 'receivertip']
+        self.tables_content = self._dump_tables(self.start_db_file, self.tables)
+
+    def postconditions_39(self):
+        self.assertEqual(self.tables_content, self._dump_tables(self.final_db_file, self.tables))
+
+    def postconditions_40(self):
+        # The migration to version 41 is additive and applied in place
+        engine = get_engine(orm.make_db_uri(self.final_db_file))
+        indexes = [i['name'] for i in inspect(engine).get_indexes('receivertip')]
+        engine.dispose()
+
+        self.assertIn('idx_receivertip_receiver_id', indexes)
+        self.assertIn('idx_receivertip_internaltip_id', indexes)
+
+    def test_generated_db_migration(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path, True)
+
+        counts = migration_benchmark.generate_db(os.path.join(path, 'glbackend-38.db'), 38,
+                                                 tips=10, answers=3, files=2, messages=2)
+
+        self.assertEqual(counts['InternalTip'], 10)
+        self.assertGreaterEqual(counts['InternalFile'], 20)
+
+        return self._test(path, 38)
+
+    def test_generated_db_migration_content(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path, True)
+
+        migration_benchmark.generate_db(os.path.join(path, 'glbackend-39.db'), 39,
+                                        tips=10, answers=3, files=2, messages=2)
+
+        self._test(path, 39)
+
+        self.assertEqual(len(self.tables_content['internaltip']), 10)
+
+
+class TestAdditiveMigration(unittest.TestCase):
+    def setUp(self):
+        helpers.init_state()
+        self.db_file = os.path.join(Settings.tmp_path, 'additive.db')
+
+        engine = get_engine(orm.make_db_uri(self.db_file))
+        engine.execute('CREATE TABLE t (id INTEGER PRIMARY KEY)')
+        engine.execute('INSERT INTO t VALUES (1)')
+        engine.dispose()
+
+    def tearDown(self):
+        os.remove(self.db_file)
+
+    def _get_schema(self):
+        engine = get_engine(orm.make_db_uri(self.db_file))
+        inspector = inspect(engine)
+        ret = {name: ([c['name'] for c in inspector.get_columns(name)],
+                      [i['name'] for i in inspector.get_indexes(name)]) for name in inspector.get_table_names()}
+        engine.dispose()
+        return ret
+
+    def test_additive_migration(self):
+        metadata = MetaData()
+        Table('t', metadata,
+              Column('id', Integer, primary_key=True),
+              Column('value', Integer, server_default='0', nullable=False),
+              Index('idx_t_value', 'value'))
+        Table('u', metadata, Column('id', Integer, primary_key=True))
+
+        migration.perform_additive_migration(self.db_file, metadata)
+
+        self.assertEqual(self._get_schema(), {'t': (['id', 'value'], ['idx_t_value']),
+                                              'u': (['id'], [])})
+
+    def test_additive_migration_rollback(self):
+        metadata = MetaData()
+        Table('a', metadata, Column('id', Integer, primary_key=True))
+        Table('t', metadata,
+              Column('id', Integer, primary_key=True),
+              Column('value', Integer, nullable=False))
+
+        schema = self._get_schema()
+
+        # A not null column without a default value cannot be added to
+        # a non empty table and no change should be applied at all
+        self.assertRaises(Exception, migration.perform_additive_migration, self.db_file, metadata)
+
+        self.assertEqual(self._get_schema(), schema)
+
+
+class TestIncrementalVacuum(unittest.TestCase):
+    def _test(self, mode):
+        helpers.init_state()
+        db_file = os.path.join(Settings.tmp_path, 'vacuum.db')
+        self.addCleanup(os.remove, db_file)
+
+        engine = get_engine(orm.make_db_uri(db_file))
+        engine.execute('PRAGMA auto_vacuum = %s' % mode)
+        engine.execute('CREATE TABLE t (id INTEGER PRIMARY KEY)')
+
+        statements = []
+        event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+        migration.enable_incremental_vacuum(engine)
+
+        self.assertEqual(engine.execute('PRAGMA auto_vacuum').scalar(), 2)
+        engine.dispose()
+
+        return statements
+
+    def test_from_none(self):
+        self.assertIn('VACUUM', self._test('NONE'))
+
+    def test_from_full(self):
+        # The switch from FULL to INCREMENTAL does not require a rebuild
+        self.assertNotIn('VACUUM', self._test('FULL'))
+
 
 def test(path, version):
     return lambda self: self._test(path, version)
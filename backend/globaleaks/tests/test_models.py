@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import hashlib
+
+from twisted.internet.defer import inlineCallbacks
+
+from globaleaks import models
+from globaleaks.models.properties import ImmutableJSON
+from globaleaks.orm import transact
+from globaleaks.tests import helpers
+from globaleaks.utils.utility import datetime_now
+
+
+class TestQueryPlans(helpers.TestGL):
+    """
+    Verify that the queries executed on the hot paths are resolved
+    using the indexes and never require a full table scan.
+    """
+    def db_explain(self, session, query):
+        statement = query.statement.compile(dialect=session.bind.dialect)
+        params = [statement.params[k] for k in statement.positiontup]
+
+        return [row[-1] for row in session.connection().execute('EXPLAIN QUERY PLAN ' + str(statement), *params)]
+
+    def db_assert_no_scan(self, session, query):
+        for detail in self.db_explain(session, query):
+            self.assertFalse(detail.startswith('SCAN'), detail)
+            self.assertNotIn('TEMP B-TREE', detail)
+
+    @transact
+    def _test_query_plans(self, session):
+        uuid = u'00000000-0000-0000-0000-000000000000'
+
+        queries = [
+            session.query(models.ReceiverTip).filter(models.ReceiverTip.receiver_id == uuid),
+            session.query(models.ReceiverTip).filter(models.ReceiverTip.internaltip_id == uuid),
+            session.query(models.InternalFile).filter(models.InternalFile.new == True).order_by(models.InternalFile.creation_date),
+            session.query(models.Comment).filter(models.Comment.internaltip_id == uuid),
+            session.query(models.Message).filter(models.Message.receivertip_id == uuid),
+            session.query(models.FieldAnswer).filter(models.FieldAnswer.internaltip_id == uuid),
+            session.query(models.Config).filter(models.Config.tid == 1, models.Config.var_name == u'name'),
+            session.query(models.InternalTip).filter(models.InternalTip.receipt_hash == u'hash'),
+            session.query(models.InternalTip.id).filter(models.InternalTip.expiration_date < datetime_now())
+        ]
+
+        for query in queries:
+            self.db_assert_no_scan(session, query)
+
+        # The spool is always entirely processed in order of creation and the
+        # index is only used to avoid sorting the table at every execution
+        for detail in self.db_explain(session, session.query(models.Mail).order_by(models.Mail.creation_date)):
+            self.assertNotIn('TEMP B-TREE', detail)
+
+    def test_query_plans(self):
+        return self._test_query_plans()
+
+
+class TestJSONColumns(helpers.TestGLWithPopulatedDB):
+    def test_immutable_json(self):
+        t = ImmutableJSON()
+
+        x = t.process_result_value(u'{"a": [1, 2, 3]}', None)
+        self.assertEqual(x, {'a': [1, 2, 3]})
+        self.assertIs(t.process_result_value(u'{"a": [1, 2, 3]}', None), x)
+        self.assertIsNot(t.process_result_value(u'{"a": [1, 2]}', None), x)
+        self.assertIsNone(t.process_result_value(None, None))
+
+        # The cache does not retain the encoded texts
+        self.assertNotIn(u'{"a": [1, 2, 3]}', ImmutableJSON.cache)
+        self.assertIs(ImmutableJSON.cache[hashlib.sha256(b'{"a": [1, 2, 3]}').digest()], x)
+
+    @transact
+    def _test_deferred_preview(self, session):
+        itip = session.query(models.InternalTip).first()
+
+        # The preview is decoded only when accessed
+        self.assertNotIn('preview', itip.__dict__)
+        self.assertTrue(isinstance(itip.preview, dict))
+
+    @inlineCallbacks
+    def test_deferred_preview(self):
+        yield self.perform_full_submission_actions()
+        yield self._test_deferred_preview()
@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
+from sqlalchemy import bindparam
+from sqlalchemy.exc import OperationalError
+
+from globaleaks import models, orm
 from globaleaks.models import Counter
-from globaleaks.orm import get_session, transact
-from globaleaks.tests import helpers
+from globaleaks.models.config import query_config
+from globaleaks.orm import get_engine, get_session, get_shared_engine, transact, transact_ro
+from globaleaks.tests import helpers, orm_benchmark
 from twisted.internet.defer import inlineCallbacks
 
 
@@ -13,7 +18,10 @@ class TestORM(helpers.TestGL):
         # Verify setting enabled in the sqlite db
         self.assertEqual(session.execute("PRAGMA foreign_keys").fetchone()[0], 1)  # ON
         self.assertEqual(session.execute("PRAGMA secure_delete").fetchone()[0], 1) # ON
-        self.assertEqual(session.execute("PRAGMA auto_vacuum").fetchone()[0], 1)   # FULL
+        self.assertEqual(session.execute("PRAGMA auto_vacuum").fetchone()[0], 2)   # INCREMENTAL
+        self.assertEqual(session.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+        self.assertEqual(session.execute("PRAGMA synchronous").fetchone()[0], 1)   # NORMAL
+        self.assertEqual(session.execute("PRAGMA temp_store").fetchone()[0], 2)    # MEMORY
 
     @transact
     def _transact_with_success(self, session):
@@ -24,6 +32,20 @@ class TestORM(helpers.TestGL):
         self.db_add_config(session)
         raise Exception("antani")
 
+    @transact
+    def _transact_with_lock(self, session):
+        self.lock_failures -= 1
+        if self.lock_failures >= 0:
+            raise OperationalError('', {}, Exception('database is locked'))
+
+        return session.query(Counter).count()
+
+    @transact_ro
+    def _transact_ro(self, session):
+        self.db_add_config(session)
+        session.flush()
+        return session.query(Counter).count()
+
     def db_add_config(self, session):
         session.add(Counter({'tid': 1, 'key': 'antani', 'number': 31337}))
 
@@ -50,9 +72,117 @@ class TestORM(helpers.TestGL):
 
         self.assertEqual(count1, count2)
 
+    @inlineCallbacks
+    def test_transact_ro(self):
+        session = get_session()
+        count1 = session.query(Counter).count()
+
+        count = yield self._transact_ro()
+        self.assertEqual(count, count1 + 1)
+
+        # changes performed inside read-only transactions are discarded
+        count2 = session.query(Counter).count()
+        self.assertEqual(count1, count2)
+
+    @inlineCallbacks
+    def test_transactions_stats(self):
+        orm.reset_transactions_stats()
+
+        self.lock_failures = 2
+        yield self._transact_with_lock()
+        yield self.assertFailure(self._transact_with_exception(), Exception)
+
+        stats = {x['name']: x for x in orm.get_transactions_stats()}
+
+        x = stats['globaleaks.tests.test_orm._transact_with_lock']
+        self.assertEqual(x['lock_retries'], 2)
+        self.assertEqual(x['failures'], 0)
+        self.assertEqual(x['queries']['count'], 1)
+        self.assertEqual(x['queries']['max'], 1)
+        self.assertEqual(x['execution_time']['count'], 1)
+
+        x = stats['globaleaks.tests.test_orm._transact_with_exception']
+        self.assertEqual(x['failures'], 1)
+        self.assertEqual(x['execution_time']['count'], 0)
+
+    def test_lock_retry_delay(self):
+        for i in range(20):
+            self.assertTrue(0 <= orm.lock_retry_delay(i) <= orm.LOCK_RETRY_MAX_DELAY)
+
     def test_transact_decorate_function(self):
         @transact
         def transaction(session):
             self.assertTrue(getattr(session, 'query'))
 
         return transaction()
+
+    def test_shared_engine(self):
+        self.assertIs(get_shared_engine(), get_shared_engine())
+        self.assertIs(get_session().bind, get_session().bind)
+
+        engine = get_shared_engine()
+        orm.set_db_uri(orm.get_db_uri())
+        self.assertIsNot(engine, get_shared_engine())
+
+
+class TestSharedEngine(helpers.TestGLWithPopulatedDB):
+    @inlineCallbacks
+    def test_one_engine_per_uri(self):
+        engines = []
+
+        def counting_get_engine(*args, **kwargs):
+            engine = get_engine(*args, **kwargs)
+            engines.append(engine)
+            return engine
+
+        self.patch(orm, 'get_engine', counting_get_engine)
+
+        # Drop the shared engine in order to count its creation
+        orm.set_db_uri(orm.get_db_uri())
+
+        for _ in range(20):
+            yield orm_benchmark.count_config()
+
+        self.assertEqual(len(engines), 1)
+        self.assertIs(engines[0], get_shared_engine())
+
+    @inlineCallbacks
+    def test_benchmark(self):
+        results = yield orm_benchmark.benchmark_transactions(transactions=1)
+        self.assertEqual(list(results), ['executions', 'engine per transaction', 'shared engine'])
+
+
+class TestCachedQuery(helpers.TestGLWithPopulatedDB):
+    @transact
+    def _test_cached_query(self, session):
+        for var_name in [u'name', u'version']:
+            self.assertEqual(query_config(session, tid=1, var_name=var_name).one().var_name, var_name)
+
+        self.assertIsNone(query_config(session, tid=1000, var_name=u'name').one_or_none())
+
+    def test_cached_query(self):
+        return self._test_cached_query()
+
+    @transact
+    def _test_cached_query_reused(self, session):
+        builds = []
+
+        def build(session):
+            builds.append(None)
+            return session.query(models.Config).filter(models.Config.tid == bindparam('tid'),
+                                                       models.Config.var_name == bindparam('var_name'))
+
+        query = orm.cached_query(build)
+        for var_name in [u'name', u'version', u'name']:
+            self.assertEqual(query(session, tid=1, var_name=var_name).one().var_name, var_name)
+
+        # The query is built only at its first execution
+        self.assertEqual(len(builds), 1)
+
+    def test_cached_query_reused(self):
+        return self._test_cached_query_reused()
+
+    @inlineCallbacks
+    def test_benchmark(self):
+        results = yield orm_benchmark.benchmark_cached_query(executions=1)
+        self.assertEqual(list(results), ['executions', 'built query', 'cached query'])
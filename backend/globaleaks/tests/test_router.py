@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from twisted.trial import unittest
+
+from globaleaks.rest.api import api_spec
+from globaleaks.rest.router import Router, literal_prefix
+from globaleaks.tests import router_benchmark
+
+
+class TestRouter(unittest.TestCase):
+    def test_literal_prefix(self):
+        self.assertEqual(literal_prefix(r'/public'), '/public')
+        self.assertEqual(literal_prefix(r'/robots.txt'), '/robots')
+        self.assertEqual(literal_prefix(r'/token/([a-zA-Z0-9]{42})'), '/token/')
+        self.assertEqual(literal_prefix(r'/admin/\.well\-known'), '/admin/.well-known')
+        self.assertEqual(literal_prefix(r'/admin/stats/\d+'), '/admin/stats/')
+        self.assertEqual(literal_prefix(r'/files?'), '/file')
+        self.assertEqual(literal_prefix(r'/a|/b'), '')
+        self.assertEqual(literal_prefix(r'(/u/.{1,255})'), '')
+
+    def test_resolve_in_order(self):
+        router = Router()
+        router.add(r'/admin/files$', 'collection')
+        router.add(r'/admin/files/(logo|css)', 'file')
+        router.add(r'/admin/files/(.+)', 'any')
+        router.add(r'/admin/files/other', 'shadowed')
+        router.add(r'/([a-z/]*)', 'static', {'path': '/'})
+        router.compile()
+
+        self.assertEqual(router.resolve('/admin/files'), ('collection', {}, ()))
+        self.assertEqual(router.resolve('/admin/files/logo'), ('file', {}, ('logo',)))
+        self.assertEqual(router.resolve('/admin/files/other'), ('any', {}, ('other',)))
+        self.assertEqual(router.resolve('/admin'), ('static', {'path': '/'}, ('admin',)))
+        self.assertEqual(router.resolve('/'), ('static', {'path': '/'}, ('',)))
+        self.assertEqual(router.resolve('/ADMIN'), None)
+        self.assertEqual(router.resolve(''), None)
+
+    def test_resolve_api_spec(self):
+        sequential, router = router_benchmark.build_routers(api_spec)
+
+        paths = [path for path, _ in router_benchmark.REQUEST_MIX]
+        paths += ['', '/admin/files', '/admin/files/logo', '/admin/stats/3',
+                  '/robots_txt', '/l10n/en', '/l10n/xx/custom', '/a b']
+
+        for path in paths:
+            expected = sequential.resolve(path)
+            if expected is not None:
+                expected = (expected[0], expected[1], tuple(expected[2]))
+
+            self.assertEqual(router.resolve(path), expected)
+
+    def test_benchmark(self):
+        results = router_benchmark.benchmark_router(iterations=1)
+        self.assertEqual(results['requests'], len(router_benchmark.get_requests()))
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+import collections
+import copy
+import re
+
+from six import text_type
+from twisted.trial import unittest
+
+from globaleaks.rest import errors, requests
+from globaleaks.rest import validator
+from globaleaks.rest.validator import compile_descriptors, get_type_validator, get_validator
+
+UUID = u'0a1b2c3d-4e5f-6a7b-8c9d-0e1f2a3b4c5d'
+
+# Values used to generate the valid messages and to alter them
+SAMPLE_STRINGS = [u'', UUID, u'admin', u'enabled', u'inputbox', u'instance',
+                  u'int', u'homepage', u'list', u'set', u'pending', u'submission',
+                  u'abc', u'a@b.cc', u'https://www.globaleaks.org', u'/a', u'a' * 42,
+                  u'abcdefghijklmnop.onion']
+
+SAMPLE_VALUES = [None, 0, 1, 1.5, u'1', u'true', True, False, u'', u'text',
+                 [], [u'text'], [UUID], {}, {u'x': 1}]
+
+
+def legacy_validate_python_type(value, python_type):
+    if value is None:
+        return True
+
+    if python_type == requests.SkipSpecificValidation:
+        return True
+
+    if python_type == int:
+        try:
+            int(value)
+            return True
+        except:
+            return False
+
+    if python_type == bool:
+        if value == u'true' or value == u'false':
+            return True
+
+    return isinstance(value, python_type)
+
+
+def legacy_validate_type(value, type):
+    """
+    Recursive validation of the values as implemented before the compilation
+    of the descriptors
+    """
+    if value is None:
+        return False
+
+    elif callable(type):
+        return legacy_validate_python_type(value, type)
+
+    elif isinstance(type, collections.Mapping):
+        return legacy_validate_jmessage(value, type)
+
+    elif isinstance(type, str):
+        try:
+            value = text_type(value)
+        except:
+            return False
+
+        return bool(re.match(type, value))
+
+    elif isinstance(type, collections.Iterable):
+        if not value:
+            return True
+
+        return all(legacy_validate_type(x, type[0]) for x in value)
+
+    return False
+
+
+def legacy_validate_jmessage(jmessage, message_template):
+    if isinstance(message_template, dict):
+        for key in [x for x, _ in jmessage.items() if x not in message_template]:
+            del jmessage[key]
+
+        for key, value in jmessage.items():
+            if not legacy_validate_type(value, message_template[key]):
+                raise errors.InputValidationError()
+
+        for key, value in message_template.items():
+            if key not in jmessage or not legacy_validate_type(jmessage[key], value):
+                raise errors.InputValidationError()
+
+            if isinstance(value, (dict, list)) and value:
+                legacy_validate_jmessage(jmessage[key], value)
+
+        return True
+
+    elif isinstance(message_template, list):
+        if not all(legacy_validate_type(x, message_template[0]) for x in jmessage):
+            raise errors.InputValidationError()
+
+        return True
+
+    raise errors.InputValidationError()
+
+
+def sample(descriptor):
+    """
+    Generate a message conforming to the descriptor
+    """
+    if descriptor in (text_type, str, requests.SkipSpecificValidation):
+        return u'text'
+    elif descriptor == int:
+        return 1
+    elif descriptor == bool:
+        return True
+    elif descriptor == dict:
+        return {u'x': 1}
+    elif descriptor == list:
+        return [u'x']
+    elif isinstance(descriptor, dict):
+        return dict((key, sample(value)) for key, value in descriptor.items())
+    elif isinstance(descriptor, list):
+        return [sample(descriptor[0]), sample(descriptor[0])]
+
+    for x in SAMPLE_STRINGS:
+        if re.match(descriptor, x):
+            return x
+
+    return u''
+
+
+def variants(descriptor):
+    """
+    Generate messages conforming to the descriptor and messages differing
+    from them in one value or in one key
+    """
+    message = sample(descriptor)
+
+    yield message
+
+    if not isinstance(descriptor, dict):
+        for value in SAMPLE_VALUES:
+            yield [value]
+
+        return
+
+    for key, value_descriptor in descriptor.items():
+        for value in SAMPLE_VALUES:
+            x = copy.deepcopy(message)
+            x[key] = value
+            yield x
+
+        x = copy.deepcopy(message)
+        del x[key]
+        yield x
+
+        if isinstance(value_descriptor, list) and isinstance(value_descriptor[0], dict):
+            for child in variants(value_descriptor[0]):
+                x = copy.deepcopy(message)
+                x[key] = [child]
+                yield x
+
+    x = copy.deepcopy(message)
+    x[u'unexpected'] = 1
+    yield x
+
+
+def legacy_outcome(message, descriptor):
+    try:
+        legacy_validate_jmessage(message, descriptor)
+    except errors.InputValidationError:
+        return False, None
+    except Exception as e:
+        # The other exceptions resulted in an internal error of the handler
+        return type(e), None
+
+    return True, message
+
+
+def outcome(message, descriptor):
+    try:
+        get_validator(descriptor)(message)
+    except errors.InputValidationError:
+        return False, None
+
+    return True, message
+
+
+# Intended differences of the compiled validators from the recursive
+# validation: name -> (predicate matching the values of a message affected
+# by the difference given their descriptor, outcomes of the recursive
+# validation on the messages including them). The compiled validators
+# reject all these messages.
+DIVERGENCES = {
+    # compile_list: the values that are not lists are invalid. The recursive
+    # validation accepted the empty values (e.g. 0, False, u'' and {}) and the
+    # strings and dicts whose characters or keys conform to the descriptor of
+    # the items (e.g. u'abc' or {u'x': 1} for [text_type]), rejected the other
+    # strings and dicts and crashed on the other values.
+    'list': (lambda value, descriptor: isinstance(descriptor, list) and not isinstance(value, list),
+             (True, False, TypeError, AttributeError)),
+
+    # compile_mapping: the values that are not dicts are invalid. The
+    # recursive validation crashed on them.
+    'mapping': (lambda value, descriptor: isinstance(descriptor, dict) and not isinstance(value, dict),
+                (AttributeError,)),
+}
+
+
+def get_divergences(value, descriptor):
+    """
+    Return the names of the intended differences affecting the message
+    """
+    if value is None:
+        return set()
+
+    for name, (predicate, _) in DIVERGENCES.items():
+        if predicate(value, descriptor):
+            return {name}
+
+    ret = set()
+
+    if isinstance(descriptor, dict):
+        for key, value_descriptor in descriptor.items():
+            if key in value:
+                ret.update(get_divergences(value[key], value_descriptor))
+
+    elif isinstance(descriptor, list) and descriptor:
+        for x in value:
+            ret.update(get_divergences(x, descriptor[0]))
+
+    return ret
+
+
+def get_descriptors():
+    for name in sorted(dir(requests)):
+        descriptor = getattr(requests, name)
+        if isinstance(descriptor, (dict, list)) and (name.endswith('Desc') or name.endswith('DescRaw')):
+            yield name, descriptor
+
+
+class TestValidator(unittest.TestCase):
+    def test_python_types(self):
+        self.assertTrue(get_type_validator(int)(u'12'))
+        self.assertFalse(get_type_validator(int)(u'a'))
+        self.assertTrue(get_type_validator(bool)(u'true'))
+        self.assertFalse(get_type_validator(bool)(1))
+        self.assertTrue(get_type_validator(requests.SkipSpecificValidation)({}))
+        self.assertFalse(get_type_validator(requests.SkipSpecificValidation)(None))
+
+    def test_regexp(self):
+        self.assertTrue(get_type_validator(requests.uuid_regexp)(UUID))
+        self.assertFalse(get_type_validator(requests.uuid_regexp)(UUID + u'0'))
+        self.assertFalse(get_type_validator(requests.uuid_regexp)(None))
+
+    def test_list_scalars(self):
+        for value in [0, 1, False, True, 1.5, u'', u'text', {}, {u'x': 1}]:
+            self.assertFalse(get_type_validator([text_type])(value))
+            self.assertRaises(errors.InputValidationError, get_validator([text_type]), value)
+            self.assertRaises(errors.InputValidationError, get_validator(requests.ReceiverOperationDesc),
+                              dict(sample(requests.ReceiverOperationDesc), rtips=value))
+
+        self.assertTrue(get_type_validator([text_type])([]))
+
+    def test_strip_unexpected_keys(self):
+        message = {u'type': u'submission', u'unexpected': 1}
+        self.assertTrue(get_validator(requests.TokenReqDesc)(message))
+        self.assertEqual(message, {u'type': u'submission'})
+
+    def test_invalid_messages(self):
+        self.assertRaises(errors.InputValidationError, get_validator(requests.TokenReqDesc), {})
+        self.assertRaises(errors.InputValidationError, get_validator(requests.TokenReqDesc), [])
+        self.assertRaises(errors.InputValidationError, get_validator(requests.TokenReqDesc), {u'type': u'x'})
+        self.assertRaises(errors.InputValidationError, get_validator(requests.TipsOverviewDesc), [1])
+        self.assertRaises(errors.InputValidationError, get_validator, text_type)
+
+    def test_recursive_descriptor(self):
+        descriptor = {'name': text_type}
+        descriptor['children'] = [descriptor]
+
+        validate = get_validator(descriptor)
+        self.assertTrue(validate({u'name': u'a', u'children': [{u'name': u'b', u'children': []}]}))
+        self.assertRaises(errors.InputValidationError, validate,
+                          {u'name': u'a', u'children': [{u'name': 1, u'children': []}]})
+
+    def test_compiled_once(self):
+        compile_descriptors()
+
+        self.assertIs(get_type_validator(requests.SubmissionDesc), get_type_validator(requests.SubmissionDesc))
+
+    def test_runtime_descriptors_not_cached(self):
+        compile_descriptors()
+
+        validators = getattr(validator, '__VALIDATORS')
+        size = len(validators)
+
+        for _ in range(100):
+            get_validator({'operation': text_type, 'args': dict})({'operation': u'x', 'args': {}})
+
+        self.assertEqual(len(validators), size)
+
+    def test_differential(self):
+        """
+        The compiled validators accept the same messages as the recursive
+        validation of the descriptors and strip the same keys, except for the
+        messages affected by the intended differences listed in DIVERGENCES
+        """
+        diverged = set()
+
+        for name, descriptor in get_descriptors():
+            for message in variants(descriptor):
+                expected = legacy_outcome(copy.deepcopy(message), descriptor)
+                result = outcome(copy.deepcopy(message), descriptor)
+
+                divergences = get_divergences(message, descriptor)
+                if not divergences:
+                    self.assertEqual(result, expected, "%s: %s" % (name, message))
+                    continue
+
+                self.assertEqual(result, (False, None), "%s: %s" % (name, message))
+                self.assertIn(expected[0], set().union(*[DIVERGENCES[x][1] for x in divergences]),
+                              "%s: %s" % (name, message))
+
+                if expected[0] is not False:
+                    diverged.update(divergences)
+
+        # Every listed difference is exercised by the messages
+        self.assertEqual(diverged, set(DIVERGENCES))
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import io
+import os
+import tempfile
+
+from twisted.internet import reactor, task
+from twisted.internet.defer import inlineCallbacks, succeed
+from twisted.protocols.policies import WrappingFactory
+from twisted.trial import unittest
+from twisted.test.proto_helpers import StringTransport
+from twisted.web.client import Agent, FileBodyProducer, HTTPConnectionPool, readBody
+from twisted.web.iweb import UNKNOWN_LENGTH
+from twisted.web.resource import Resource
+from twisted.web.server import Site
+
+from globaleaks.utils.httpsproxy import BodyProducer, HTTPStreamFactory
+from globaleaks.utils.sock import listen_unix_on_path
+
+
+class HelloResource(Resource):
+    isLeaf = True
+
+    def render_GET(self, request):
+        return request.getHeader(b'GL-Forwarded-For') + b' ' + request.path
+
+    def render_POST(self, request):
+        return hashlib.sha256(request.content.read()).hexdigest().encode()
+
+
+class ChunkedBodyProducer(object):
+    length = UNKNOWN_LENGTH
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def startProducing(self, consumer):
+        for chunk in self.chunks:
+            consumer.write(chunk)
+
+        return succeed(None)
+
+    def pauseProducing(self):
+        pass
+
+    def resumeProducing(self):
+        pass
+
+    def stopProducing(self):
+        pass
+
+
+class CountingFactory(WrappingFactory):
+    connections = 0
+
+    def buildProtocol(self, addr):
+        self.connections += 1
+        return WrappingFactory.buildProtocol(self, addr)
+
+
+class TestHTTPStreamFactory(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.path, 'backend.sock')
+
+        self.backend = CountingFactory(Site(HelloResource()))
+        self.backend_port = listen_unix_on_path(reactor, self.socket_path, self.backend)
+
+        self.proxy = HTTPStreamFactory('http://127.0.0.1', self.socket_path)
+        self.proxy_port = reactor.listenTCP(0, self.proxy, interface='127.0.0.1')
+
+        self.agent = Agent(reactor, pool=HTTPConnectionPool(reactor, persistent=False))
+
+    @inlineCallbacks
+    def tearDown(self):
+        yield self.proxy_port.stopListening()
+        yield self.proxy.stopFactory()
+
+        # Wait for the backend to notice the closure of the pooled connections
+        while self.backend.protocols:
+            yield task.deferLater(reactor, 0.01, lambda: None)
+
+        yield self.backend_port.stopListening()
+
+        os.rmdir(self.path)
+
+    @inlineCallbacks
+    def get(self, path):
+        url = 'http://127.0.0.1:%d%s' % (self.proxy_port.getHost().port, path)
+        response = yield self.agent.request(b'GET', url.encode())
+        body = yield readBody(response)
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.headers.getRawHeaders(b'Strict-Transport-Security'), [b'max-age=31536000'])
+        self.assertEqual(body, b'127.0.0.1 ' + path.encode())
+
+    @inlineCallbacks
+    def post(self, body_producer, body):
+        url = 'http://127.0.0.1:%d/upload' % self.proxy_port.getHost().port
+        response = yield self.agent.request(b'POST', url.encode(), bodyProducer=body_producer)
+        result = yield readBody(response)
+        self.assertEqual(response.code, 200)
+        self.assertEqual(result, hashlib.sha256(body).hexdigest().encode())
+
+    @inlineCallbacks
+    def test_unix_socket_persistent_connection(self):
+        yield self.get('/a')
+        yield self.get('/b')
+        yield self.get('/c')
+
+        # The requests are forwarded on the same connection
+        self.assertEqual(self.backend.connections, 1)
+        self.assertEqual(len(self.backend.protocols), 1)
+
+    def test_shared_pool(self):
+        a = self.proxy.buildProtocol(None)
+        b = self.proxy.buildProtocol(None)
+
+        self.assertIs(a.http_agent, b.http_agent)
+        self.assertTrue(self.proxy.http_pool.persistent)
+
+    @inlineCallbacks
+    def test_upload(self):
+        body = os.urandom(1024 * 1024)
+        yield self.post(FileBodyProducer(io.BytesIO(body)), body)
+
+    @inlineCallbacks
+    def test_chunked_upload(self):
+        chunks = [os.urandom(1000) for _ in range(100)]
+        yield self.post(ChunkedBodyProducer(chunks), b''.join(chunks))
+
+        # The connection to the backend is reused after the upload
+        yield self.get('/a')
+        self.assertEqual(self.backend.connections, 1)
+
+    @inlineCallbacks
+    def test_upload_to_unavailable_backend(self):
+        yield self.backend_port.stopListening()
+
+        url = 'http://127.0.0.1:%d/upload' % self.proxy_port.getHost().port
+        body = FileBodyProducer(io.BytesIO(os.urandom(256 * 1024)))
+        response = yield self.agent.request(b'POST', url.encode(), bodyProducer=body)
+        yield readBody(response)
+        self.assertEqual(response.code, 502)
+
+
+class TestBodyProducer(unittest.TestCase):
+    def setUp(self):
+        self.transport = StringTransport()
+        self.consumer = StringTransport()
+        self.producer = BodyProducer(self.transport, None)
+
+    def test_buffer_until_started(self):
+        self.producer.dataReceived(b'a' * BodyProducer.BUF_MAX_SIZE)
+        self.assertEqual(self.transport.producerState, 'paused')
+
+        d = self.producer.startProducing(self.consumer)
+        self.assertEqual(self.consumer.value(), b'a' * BodyProducer.BUF_MAX_SIZE)
+        self.assertEqual(self.transport.producerState, 'producing')
+
+        self.producer.allDataReceived()
+        self.assertTrue(d.called)
+
+    def test_pause_while_consumer_is_paused(self):
+        d = self.producer.startProducing(self.consumer)
+
+        self.producer.pauseProducing()
+        self.assertEqual(self.transport.producerState, 'paused')
+
+        self.producer.dataReceived(b'a')
+        self.producer.dataReceived(b'b')
+        self.assertEqual(self.consumer.value(), b'')
+
+        self.producer.allDataReceived()
+        self.assertEqual(self.transport.producerState, 'producing')
+        self.assertFalse(d.called)
+
+        self.producer.resumeProducing()
+        self.assertEqual(self.consumer.value(), b'ab')
+        self.assertTrue(d.called)
+
+    def test_discard(self):
+        self.producer.startProducing(self.consumer)
+        self.producer.pauseProducing()
+        self.producer.dataReceived(b'a')
+
+        self.producer.stopProducing()
+        self.producer.dataReceived(b'b')
+        self.assertEqual(self.producer.buffer, [])
+        self.assertEqual(self.transport.producerState, 'producing')
+        self.assertEqual(self.consumer.value(), b'')
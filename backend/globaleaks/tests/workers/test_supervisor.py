@@ -1,10 +1,11 @@
 # -*- coding: utf-8 -*-
 import json
+import os
 import ssl
 import tempfile
 from six.moves import urllib
 
-from twisted.internet import threads, reactor
+from twisted.internet import task, threads, reactor
 from twisted.internet.defer import inlineCallbacks
 
 from globaleaks.handlers.admin.https import load_tls_dict_list
@@ -64,6 +65,30 @@ class TestProcessSupervisor(helpers.TestGL):
         self.assertFalse(p_s.shutting_down)
         self.assertFalse(p_s.is_running())
 
+    @inlineCallbacks
+    def test_reload_without_restart(self):
+        yield toggle_https(enabled=True)
+        sock, fail = reserve_port_for_ip('localhost', 43434)
+        self.assertIsNone(fail)
+
+        ip, port = '127.0.0.1', 43435
+
+        p_s = supervisor.ProcessSupervisor([sock], ip, port)
+        yield p_s.maybe_launch_https_workers()
+
+        workers = list(p_s.tls_process_pool)
+
+        yield p_s.reload_https_workers()
+        yield task.deferLater(reactor, 0.5, lambda: None)
+
+        # The configuration is applied by the running workers
+        self.assertEqual(p_s.tls_process_pool, workers)
+
+        yield toggle_https(enabled=False)
+        yield p_s.reload_https_workers()
+
+        self.assertFalse(p_s.is_running())
+
 
 @transact
 def wrap_db_tx(session, f, *args, **kwargs):
@@ -85,7 +110,7 @@ class TestSubprocessRun(helpers.TestGL):
         yield test_tls.commit_valid_config()
 
     @inlineCallbacks
-    def test_https_process(self):
+    def launch_https_process(self):
         valid_cfg = {
             'proxy_ip': '127.0.0.1',
             'proxy_port': 43434,
@@ -94,13 +119,18 @@ class TestSubprocessRun(helpers.TestGL):
         }
         valid_cfg['site_cfgs'] = yield wrap_db_tx(load_tls_dict_list)
 
-        tmp = tempfile.TemporaryFile(mode='w')
-        tmp.write(json.dumps(valid_cfg))
-        tmp.seek(0,0)
-        tmp_fd = tmp.fileno()
+        # The process closes the descriptor after reading the configuration
+        with tempfile.TemporaryFile(mode='w') as tmp:
+            tmp.write(json.dumps(valid_cfg))
+            tmp.seek(0,0)
+            tmp_fd = os.dup(tmp.fileno())
 
         self.http_process = HTTPSProcess(fd=tmp_fd)
 
+    @inlineCallbacks
+    def test_https_process(self):
+        yield self.launch_https_process()
+
         # Connect to service ensure that it responds with a 502
         yield threads.deferToThread(self.fetch_resource_with_fail)
 
@@ -112,6 +142,36 @@ class TestSubprocessRun(helpers.TestGL):
         # Check that requests are routed successfully
         yield threads.deferToThread(self.fetch_resource)
 
+    @inlineCallbacks
+    def test_update_site_cfgs(self):
+        yield self.launch_https_process()
+
+        site_cfgs = yield wrap_db_tx(load_tls_dict_list)
+        snimap = self.http_process.snimap
+        default = snimap.mapping['DEFAULT']
+
+        def send(site_cfgs):
+            message = json.dumps({'command': 'update_site_cfgs', 'site_cfgs': site_cfgs}).encode() + b'\n'
+
+            # The messages may be received in multiple chunks
+            self.http_process.childDataReceived('control', message[:10])
+            self.http_process.childDataReceived('control', message[10:])
+
+        other = dict(site_cfgs[0], hostname=u'www.example.org')
+        send([site_cfgs[0], other])
+
+        self.assertIs(self.http_process.snimap, snimap)
+        self.assertIs(snimap.mapping['DEFAULT'], default)
+        self.assertIn(u'www.example.org', snimap.mapping)
+
+        send([site_cfgs[0]])
+        self.assertEqual(list(snimap.mapping), ['DEFAULT'])
+        self.assertIs(snimap.mapping['DEFAULT'], default)
+
+        # The invalid configurations are discarded
+        send([dict(site_cfgs[0], ssl_cert=u'invalid')])
+        self.assertIs(snimap.mapping['DEFAULT'], default)
+
     def fetch_resource_with_fail(self):
         try:
             urllib.request.urlopen('https://127.0.0.1:9443')
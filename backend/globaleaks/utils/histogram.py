@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import bisect
+
+
+class Histogram(object):
+    """
+    Histogram with a fixed set of buckets.
+
+    The memory used is bounded by the number of buckets and does not
+    depend on the number of the recorded samples.
+    """
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+        if value > self.max:
+            self.max = value
+
+    def serialize(self):
+        bounds = list(self.bounds) + [None]
+
+        return {
+            'count': self.count,
+            'mean': self.total / float(self.count) if self.count else 0,
+            'max': self.max,
+            'buckets': [{'le': bound, 'count': count} for bound, count in zip(bounds, self.buckets)]
+        }
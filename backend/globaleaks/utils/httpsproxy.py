@@ -5,115 +5,225 @@ import sys
 from six.moves import urllib
 
 from twisted.internet import reactor, protocol, defer
+from twisted.internet.endpoints import UNIXClientEndpoint
 from twisted.internet.protocol import connectionDone
 from twisted.web import http
-from twisted.web.client import Agent
-from twisted.web.iweb import IBodyProducer
-from twisted.web.server import NOT_DONE_YET
+from twisted.web.client import Agent, HTTPConnectionPool
+from twisted.web.iweb import IAgentEndpointFactory, IBodyProducer, UNKNOWN_LENGTH
 from zope.interface import implementer
 
+# Maximum number of idle connections to the backend kept open by each worker
+MAX_PERSISTENT_CONNECTIONS = 32
+
+# Seconds after which an idle connection to the backend is closed
+PERSISTENT_CONNECTION_TIMEOUT = 60
+
+# Headers describing the connection between the client and the proxy that
+# are not forwarded on the persistent connections to the backend
+HOP_BY_HOP_HEADERS = [b'Connection', b'Keep-Alive', b'Proxy-Connection', b'TE',
+                      b'Trailer', b'Transfer-Encoding', b'Upgrade']
+
 
 class BodyStreamer(protocol.Protocol):
-    def __init__(self, streamfunction, finished):
+    """
+    Protocol forwarding the body of the response of the backend to the client.
+
+    The connection to the backend is registered as the producer of the
+    response so that it is not read while the client is not able to receive.
+    """
+    def __init__(self, request, finished):
         self._finished = finished
-        self._streamfunction = streamfunction
+        self._request = request
+
+    def connectionMade(self):
+        if not self._request.lost:
+            self._request.registerProducer(self.transport, True)
 
     def dataReceived(self, data):
-        self._streamfunction(data)
+        if self._request.lost:
+            self.transport.stopProducing()
+            return
+
+        self._request.write(data)
 
     def connectionLost(self, reason=connectionDone):
-        self._streamfunction = None
+        if not self._request.lost:
+            self._request.unregisterProducer()
+
+        self._request = None
         self._finished.callback(None)
         self._finished = None
 
 
 @implementer(IBodyProducer)
 class BodyProducer(object):
-
-    BUF_MAX_SIZE = 64 * 1024 # TODO Use the hardcoded value for buf max size
-    length = 0
-    bytes_written = 0
-
-    deferred = None
-    inp_buf = None
-    rf_buf_fn = None
-    consumer = None
-
-    def __init__(self, inp_buf, rf_buf_fn, length):
-        self.inp_buf = inp_buf
-        self.rf_buf_fn = rf_buf_fn
-        self.length = length
+    """
+    Producer forwarding the body of a request to the backend while it is
+    received from the client.
+
+    The data is buffered only while the connection to the backend is not
+    ready to receive it; when the buffer exceeds BUF_MAX_SIZE or the backend
+    connection is saturated the reading from the client is paused until the
+    data is drained, so that the memory used by every upload is bounded.
+    """
+    BUF_MAX_SIZE = 64 * 1024
+
+    def __init__(self, transport, length):
+        self.transport = transport
+        self.length = length if length is not None else UNKNOWN_LENGTH
         self.deferred = defer.Deferred()
+        self.consumer = None
+        self.buffer = []
+        self.buffered = 0
+        self.paused = False
+        self.reading = True
+        self.completed = False
+        self.discarding = False
+
+    def set_reading(self, reading):
+        # The client transport is not controlled after the end of the body
+        # when it is managed again by the HTTP channel; the pause is always
+        # requested as the channel could have resumed the transport
+        if self.completed:
+            return
+
+        if not reading:
+            self.reading = False
+            self.transport.pauseProducing()
+        elif not self.reading:
+            self.reading = True
+            self.transport.resumeProducing()
+
+    def dataReceived(self, data):
+        if self.discarding:
+            return
+
+        self.buffer.append(data)
+        self.buffered += len(data)
+
+        self.flush()
+
+    def allDataReceived(self):
+        self.set_reading(True)
+        self.completed = True
+        self.flush()
+
+    def flush(self):
+        if self.consumer is not None and not self.paused and self.buffer:
+            data = b''.join(self.buffer)
+            self.buffer = []
+            self.buffered = 0
+            self.consumer.write(data)
+
+        if self.completed:
+            if self.consumer is not None and not self.buffer and self.deferred is not None:
+                d, self.deferred = self.deferred, None
+                d.callback(None)
+        else:
+            self.set_reading(self.buffered < self.BUF_MAX_SIZE and not self.paused)
+
+    def discard(self):
+        """
+        Drop the body, e.g. after the failure of the request to the backend,
+        and keep reading it from the client in order to be able to respond.
+        """
+        self.discarding = True
+        self.buffer = []
+        self.buffered = 0
+        self.paused = False
+        self.set_reading(True)
+
+    def fail(self, reason):
+        self.discard()
+
+        if self.deferred is not None:
+            d, self.deferred = self.deferred, None
+            d.errback(reason)
 
     def startProducing(self, consumer):
         self.consumer = consumer
-        return self.resumeProducing()
+        self.flush()
+        return self.deferred
 
-    def resumeProducing(self):
-        chunk = self.inp_buf.read()
-        n = len(chunk)
-        if n != 0:
-            self.consumer.write(chunk)
-            self.bytes_written += n
-            if self.bytes_written > self.BUF_MAX_SIZE:
-                self.inp_buf = self.rf_buf_fn()
-                self.bytes_written = 0
-        else:
-            self.deferred.callback(None)
+    def pauseProducing(self):
+        self.paused = True
+        self.set_reading(False)
 
-        return self.deferred
+    def resumeProducing(self):
+        self.paused = False
+        self.flush()
 
     def stopProducing(self):
-        self.deferred = None
-        self.inp_buf.close()
-        self.rf_buf_fn = None
         self.consumer = None
-
-    def pauseProducing(self):
-        pass
+        self.deferred = None
+        self.discard()
 
 
 class HTTPStreamProxyRequest(http.Request):
+    """
+    Request forwarded to the backend as soon as its headers are received;
+    the body is streamed to the backend while it is received and the
+    response of the backend is streamed to the client.
+    """
     def __init__(self, *args, **kwargs):
         http.Request.__init__(self, *args, **kwargs)
-
-    def reset_buffer(self):
-        self.content.seek(0, 0)
-        self.content.truncate(0)
-        return self.content
+        self.body_producer = None
+        self.proxy_d = None
+        self.received = False
+        self.responded = False
+        self.lost = False
 
     def gotLength(self, length):
-        http.Request.gotLength(self, length)
-        if hasattr(self.content, 'close'):
-            self.content.close()
-            self.content = io.BytesIO()
-            self.reset_buffer()
+        # The body is not stored but directly forwarded to the backend
+        self.content = io.BytesIO()
+
+        chunked = self.requestHeaders.getRawHeaders(b'Transfer-Encoding', [b''])[-1].lower() == b'chunked'
+        if length or chunked:
+            self.body_producer = BodyProducer(self.channel.transport, length)
+
+    def headersReceived(self, command, path, version):
+        self.method, self.uri = command, path
+        self.clientproto = version
+        self.client = self.channel.getPeer()
+        self.host = self.channel.getHost()
 
-    def process(self):
         joined_url = urllib.parse.urljoin(self.channel.proxy_url.encode('utf-8'), self.uri)
         hdrs = self.requestHeaders
         hdrs.setRawHeaders(b'GL-Forwarded-For', [self.getClientIP()])
+        hdrs.removeHeader(b'Content-Length')
 
-        prod = None
-        content_length = self.getHeader(b'Content-Length')
-        if content_length is not None:
-            hdrs.removeHeader(b'Content-Length')
-            prod = BodyProducer(self.content, self.reset_buffer, int(content_length))
-            self.registerProducer(prod, streaming=True)
+        for header in HOP_BY_HOP_HEADERS:
+            hdrs.removeHeader(header)
 
-        proxy_d = self.channel.http_agent.request(method=self.method,
-                                                  uri=joined_url,
-                                                  headers=hdrs,
-                                                  bodyProducer=prod)
-        if prod is not None:
-            proxy_d.addBoth(self.proxyUnregister)
+        self.proxy_d = self.channel.http_agent.request(method=self.method,
+                                                       uri=joined_url,
+                                                       headers=hdrs,
+                                                       bodyProducer=self.body_producer)
 
-        proxy_d.addCallback(self.proxySuccess)
-        proxy_d.addErrback(self.proxyError)
+        self.proxy_d.addCallback(self.proxySuccess)
+        self.proxy_d.addErrback(self.proxyError)
 
-        return NOT_DONE_YET
+    def handleContentChunk(self, data):
+        if self.body_producer is not None:
+            self.body_producer.dataReceived(data)
+
+    def process(self):
+        """
+        Called when the whole body has been received
+        """
+        self.received = True
+
+        if self.body_producer is not None:
+            self.body_producer.allDataReceived()
+
+        if self.responded:
+            self.forwardClose()
 
     def proxySuccess(self, response):
+        if self.lost:
+            response.deliverBody(protocol.Protocol())
+            return
+
         self.responseHeaders = response.headers
 
         self.responseHeaders.setRawHeaders(b'Strict-Transport-Security', [b'max-age=31536000'])
@@ -122,43 +232,101 @@ class HTTPStreamProxyRequest(http.Request):
 
         d_forward = defer.Deferred()
 
-        response.deliverBody(BodyStreamer(self.write, d_forward))
+        response.deliverBody(BodyStreamer(self, d_forward))
 
         d_forward.addBoth(self.forwardClose)
 
     def proxyError(self, fail):
+        if self.body_producer is not None:
+            self.body_producer.discard()
+
+        if self.lost:
+            return
+
         # Always apply the HSTS header. Compliant browsers using plain HTTP will ignore it.
         self.responseHeaders.setRawHeaders(b'Strict-Transport-Security', [b'max-age=31536000'])
         self.setResponseCode(502)
         self.forwardClose()
 
-    def proxyUnregister(self, o):
-        self.unregisterProducer()
-        return o
-
     def forwardClose(self, *args):
-        self.content.close()
-        self.finish()
+        self.responded = True
+
+        # The response is concluded only after the whole body has been
+        # received in order to not interfere with the parsing of the request
+        if self.received and not self.lost and not self.finished:
+            self.finish()
+
+    def connectionLost(self, reason):
+        self.lost = True
+
+        if self.body_producer is not None:
+            self.body_producer.fail(reason)
+
+        if self.proxy_d is not None and not self.proxy_d.called:
+            self.proxy_d.cancel()
+
+        http.Request.connectionLost(self, reason)
 
 
 class HTTPStreamChannel(http.HTTPChannel):
     requestFactory = HTTPStreamProxyRequest
 
-    def __init__(self, proxy_url, *args, **kwargs):
+    def __init__(self, proxy_url, http_agent, *args, **kwargs):
         http.HTTPChannel.__init__(self, *args, **kwargs)
 
         self.proxy_url = proxy_url
-        self.http_agent = Agent(reactor, connectTimeout=30)
+        self.http_agent = http_agent
+
+    def allHeadersReceived(self):
+        http.HTTPChannel.allHeadersReceived(self)
+
+        self.requests[-1].headersReceived(self._command, self._path, self._version)
+
+
+@implementer(IAgentEndpointFactory)
+class UNIXEndpointFactory(object):
+    """
+    Factory of the endpoints connecting to the backend on its unix socket
+    whatever the address of the requests
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def endpointForURI(self, uri):
+        return UNIXClientEndpoint(reactor, self.path, timeout=30)
 
 
 class HTTPStreamFactory(http.HTTPFactory):
-    def __init__(self, proxy_url, *args, **kwargs):
+    """
+    Factory of the channels proxying the requests to the backend.
+
+    All the channels share a pool of persistent connections to the backend
+    that is reached over TCP at proxy_url or, if specified, on the unix
+    socket at proxy_socket.
+    """
+    def __init__(self, proxy_url, proxy_socket=None, *args, **kwargs):
         http.HTTPFactory.__init__(self, *args, **kwargs)
         self.proxy_url = proxy_url
         self.active_connections = 0
 
+        self.http_pool = HTTPConnectionPool(reactor, persistent=True)
+        self.http_pool.maxPersistentPerHost = MAX_PERSISTENT_CONNECTIONS
+        self.http_pool.cachedConnectionTimeout = PERSISTENT_CONNECTION_TIMEOUT
+
+        if proxy_socket is not None:
+            self.http_agent = Agent.usingEndpointFactory(reactor,
+                                                         UNIXEndpointFactory(proxy_socket),
+                                                         pool=self.http_pool)
+        else:
+            self.http_agent = Agent(reactor, connectTimeout=30, pool=self.http_pool)
+
+    def stopFactory(self):
+        http.HTTPFactory.stopFactory(self)
+
+        return self.http_pool.closeCachedConnections()
+
     def buildProtocol(self, addr):
-        proto = HTTPStreamChannel(self.proxy_url)
+        proto = HTTPStreamChannel(self.proxy_url, self.http_agent)
         _connectionMade = proto.connectionMade
         _connectionLost = proto.connectionLost
 
@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+"""
+Generator of large synthetic databases and benchmark of the migrations.
+
+The databases are generated starting from the populated databases used by
+the migration tests and adding to them tenants, tips, answers, files and
+messages. The rows are cloned from the ones available in the template
+database when possible and synthesized from the model definitions of the
+target version otherwise.
+"""
+from __future__ import print_function
+
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+
+from six import text_type
+from sqlalchemy import MetaData, inspect
+
+from globaleaks import DATABASE_VERSION, FIRST_DATABASE_VERSION_SUPPORTED
+from globaleaks.models.properties import JSON
+from globaleaks.orm import get_engine, make_db_uri
+from globaleaks.utils.utility import datetime_now
+
+# Directory of the template databases; by default the populated databases of
+# the migration tests available in the source tree
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+                             'tests', 'db', 'populated')
+
+# Models describing the content of the submissions in any of the supported versions
+SUBMISSION_MODELS = ['InternalTip', 'ReceiverTip', 'WhistleblowerTip',
+                     'FieldAnswerGroup', 'FieldAnswer', 'FieldAnswerGroupFieldAnswer',
+                     'InternalFile', 'ReceiverFile', 'WhistleblowerFile',
+                     'Comment', 'Message', 'IdentityAccessRequest']
+
+# Columns referencing the rows of the submission models
+SUBMISSION_KEYS = ['id', 'internaltip_id', 'receivertip_id', 'internalfile_id',
+                   'fieldanswer_id', 'fieldanswergroup_id']
+
+# Models that are cloned when generating additional tenants
+TENANT_MODELS = ['EnabledLanguage', 'Config', 'ConfigL10N']
+
+CHUNK_SIZE = 10000
+
+
+def get_model(model_name, version):
+    from globaleaks.db.migration import migration_mapping
+
+    return migration_mapping[model_name][version - FIRST_DATABASE_VERSION_SUPPORTED]
+
+
+def clone_id(value, n):
+    if value is None:
+        return None
+
+    return text_type(uuid.uuid5(uuid.NAMESPACE_OID, '%s-%d' % (value, n)))
+
+
+def synthesize_value(column, model_column=None):
+    """
+    Return a value for a column of a reflected table using when available
+    the default value declared by the model of the same version.
+    """
+    value = None
+
+    if model_column is not None and model_column.default is not None:
+        if model_column.default.is_scalar:
+            value = model_column.default.arg
+        elif model_column.default.is_callable:
+            value = model_column.default.arg(None)
+
+    if model_column is not None and isinstance(model_column.type, JSON):
+        return text_type(json.dumps(value if value is not None else {}))
+
+    if value is None:
+        column_type = model_column.type if model_column is not None else column.type
+
+        try:
+            python_type = column_type.python_type
+        except NotImplementedError:
+            python_type = text_type
+
+        if python_type in (bool, int):
+            value = 0
+        elif python_type is datetime:
+            value = datetime_now()
+        else:
+            value = u'synthetic'
+
+    # The values are written unprocessed in the same format used by SQLAlchemy
+    if isinstance(value, bool):
+        return int(value)
+    elif isinstance(value, datetime):
+        return text_type(value.strftime('%Y-%m-%d %H:%M:%S.%f'))
+
+    return value
+
+
+class DatabaseGenerator(object):
+    """
+    The rows are read and written through the tables reflected from the
+    database as the models of the old versions do not always describe
+    all the columns and constraints, and values are copied unprocessed.
+    """
+    def __init__(self, db_file, version):
+        self.version = version
+        self.engine = get_engine(make_db_uri(db_file), foreign_keys=False)
+        self.metadata = MetaData()
+        self.metadata.reflect(bind=self.engine)
+        self.models = OrderedDict()
+        self.tables = OrderedDict()
+        self.rows = defaultdict(list)
+        self.counts = defaultdict(int)
+        self.unique_columns = defaultdict(set)
+
+        inspector = inspect(self.engine)
+
+        for model_name in SUBMISSION_MODELS + TENANT_MODELS + ['Tenant']:
+            model = get_model(model_name, version)
+            if model is None or model.__tablename__ not in self.metadata.tables:
+                continue
+
+            table_name = model.__tablename__
+
+            self.models[model_name] = model
+            self.tables[model_name] = self.metadata.tables[table_name]
+
+            for constraint in inspector.get_unique_constraints(table_name) + inspector.get_indexes(table_name):
+                if constraint.get('unique', True) and len(constraint['column_names']) == 1:
+                    self.unique_columns[model_name].add(constraint['column_names'][0])
+
+    def select(self, model_name, where=None):
+        if model_name not in self.tables:
+            return []
+
+        query = 'SELECT * FROM %s' % self.tables[model_name].name
+        if where is not None:
+            query += ' WHERE ' + where
+
+        return [dict(row) for row in self.engine.execute(query)]
+
+    def first_value(self, table_name, column_name):
+        if table_name not in self.metadata.tables:
+            return None
+
+        row = self.engine.execute('SELECT %s FROM %s LIMIT 1' % (column_name, table_name)).fetchone()
+        return row[0] if row is not None else None
+
+    def add(self, model_name, row):
+        self.rows[model_name].append(row)
+
+        if len(self.rows[model_name]) >= CHUNK_SIZE:
+            self.flush(model_name)
+
+    def flush(self, model_name=None):
+        for name in [model_name] if model_name is not None else list(self.rows):
+            if self.rows[name]:
+                keys = [c.name for c in self.tables[name].columns]
+                query = 'INSERT INTO %s (%s) VALUES (%s)' % (self.tables[name].name, ', '.join(keys), ', '.join(['?'] * len(keys)))
+                self.engine.execute(query, [tuple(row[k] for k in keys) for row in self.rows[name]])
+                self.counts[name] += len(self.rows[name])
+                self.rows[name] = []
+
+    def synthesize(self, model_name, **values):
+        row = {}
+
+        model_columns = self.models[model_name].__table__.columns
+
+        for column in self.tables[model_name].columns:
+            model_column = model_columns.get(column.key)
+
+            if column.key in values:
+                row[column.key] = values[column.key]
+            elif column.key in SUBMISSION_KEYS:
+                row[column.key] = text_type(uuid.uuid4()) if column.key == 'id' else None
+            elif column.key in self.unique_columns[model_name]:
+                row[column.key] = text_type(uuid.uuid4())
+            elif column.key.endswith('_id'):
+                row[column.key] = self.first_value(column.key[:-3], 'id')
+            elif column.key == 'questionnaire_hash':
+                row[column.key] = self.first_value('archivedschema', 'hash')
+            else:
+                row[column.key] = synthesize_value(column, model_column)
+
+            if row[column.key] is None and not column.nullable:
+                row[column.key] = synthesize_value(column, model_column)
+
+        return row
+
+    def get_template_tips(self):
+        """
+        Return for every tip of the template database the rows of the
+        submission models that belong to it.
+        """
+        rows = OrderedDict((model_name, self.select(model_name)) for model_name in SUBMISSION_MODELS if model_name in self.tables)
+
+        tips = []
+        for itip in rows.get('InternalTip', []):
+            ids = set([itip['id']])
+            tip = defaultdict(list)
+
+            changed = True
+            while changed:
+                changed = False
+                for model_name, model_rows in rows.items():
+                    for row in model_rows:
+                        if row in tip[model_name]:
+                            continue
+
+                        if any(row.get(key) in ids for key in SUBMISSION_KEYS):
+                            tip[model_name].append(row)
+                            if row.get('id') is not None:
+                                ids.add(row['id'])
+                            changed = True
+
+            tips.append(tip)
+
+        return tips
+
+    def clone(self, model_name, row, n, **values):
+        new_row = dict(row)
+
+        for key in SUBMISSION_KEYS:
+            if key in new_row:
+                new_row[key] = clone_id(new_row[key], n)
+
+        for key in self.unique_columns[model_name] - set(SUBMISSION_KEYS):
+            if new_row.get(key) is not None:
+                new_row[key] = u'%s-%d' % (new_row[key], n)
+
+        new_row.update(values)
+
+        return new_row
+
+    def generate_tips(self, tips, answers, files, messages):
+        templates = self.get_template_tips()
+
+        receivers_ids = [r[0] for r in self.engine.execute('SELECT id FROM receiver')]
+
+        for n in range(tips):
+            if templates:
+                template = templates[n % len(templates)]
+                for model_name in SUBMISSION_MODELS:
+                    for row in template.get(model_name, []):
+                        self.add(model_name, self.clone(model_name, row, n))
+
+                itip_id = clone_id(template['InternalTip'][0]['id'], n)
+                rtips_ids = [clone_id(rtip['id'], n) for rtip in template.get('ReceiverTip', [])]
+            else:
+                itip = self.synthesize('InternalTip')
+                self.add('InternalTip', itip)
+                itip_id = itip['id']
+
+                if 'WhistleblowerTip' in self.tables:
+                    self.add('WhistleblowerTip', self.synthesize('WhistleblowerTip', id=itip_id, internaltip_id=itip_id))
+
+                rtips_ids = []
+                for receiver_id in receivers_ids:
+                    rtip = self.synthesize('ReceiverTip', internaltip_id=itip_id, receiver_id=receiver_id)
+                    self.add('ReceiverTip', rtip)
+                    rtips_ids.append(rtip['id'])
+
+            for model_name, count in [('FieldAnswer', answers), ('InternalFile', files), ('Message', messages)]:
+                if model_name == 'Message' and not rtips_ids:
+                    continue
+
+                for i in range(count):
+                    values = {'internaltip_id': itip_id}
+                    if model_name == 'Message':
+                        values['receivertip_id'] = rtips_ids[i % len(rtips_ids)]
+                        values['type'] = u'receiver'
+
+                    self.add(model_name, self.synthesize(model_name, **values))
+
+        self.flush()
+
+    def generate_tenants(self, tenants):
+        if 'Tenant' not in self.tables:
+            if tenants > 1:
+                raise ValueError("The database version %d does not support multiple tenants" % self.version)
+
+            return
+
+        tenant = self.select('Tenant', 'id = 1')[0]
+        existing_tids = set(t['id'] for t in self.select('Tenant'))
+
+        for tid in range(2, tenants + 1):
+            if tid in existing_tids:
+                continue
+
+            self.add('Tenant', dict(tenant, id=tid, label=u'Tenant %d' % tid, subdomain=u'tenant%d' % tid))
+
+            for model_name in TENANT_MODELS:
+                for row in self.select(model_name, 'tid = 1'):
+                    self.add(model_name, dict(row, tid=tid))
+
+            self.flush()
+
+    def close(self):
+        self.engine.dispose()
+
+
+def generate_db(db_file, version=DATABASE_VERSION, tenants=1, tips=0, answers=0, files=0, messages=0,
+                templates_dir=TEMPLATES_DIR):
+    """
+    Generate a database of the specified version
+
+    :param db_file: the path of the database to be generated
+    :param version: the version of the database
+    :param tenants: the number of tenants
+    :param tips: the number of tips to be added to the template database
+    :param answers: the number of answers to be added to every tip
+    :param files: the number of files to be added to every tip
+    :param messages: the number of messages to be added to every tip
+    :param templates_dir: the directory of the template databases
+    :return: the number of rows added to each table
+    """
+    if version < FIRST_DATABASE_VERSION_SUPPORTED or version > DATABASE_VERSION:
+        raise ValueError("Unsupported database version %d" % version)
+
+    shutil.copyfile(os.path.join(templates_dir, 'glbackend-%d.db' % version), db_file)
+
+    generator = DatabaseGenerator(db_file, version)
+
+    try:
+        generator.generate_tenants(tenants)
+        generator.generate_tips(tips, answers, files, messages)
+    finally:
+        generator.close()
+
+    return dict(generator.counts)
+
+
+def _run_migration(db_file, version, workdir, queue):
+    from globaleaks.db import update_db, migration
+    from globaleaks.db.migrations.update import MigrationBase
+    from globaleaks.orm import set_db_uri
+    from globaleaks.settings import Settings
+    from globaleaks.state import State
+
+    Settings.testing = True
+    Settings.working_path = workdir
+    Settings.eval_paths()
+    State.init_environment()
+
+    shutil.copyfile(db_file, os.path.join(Settings.db_path, 'glbackend-%d.db' % version))
+    set_db_uri(make_db_uri(os.path.join(Settings.db_path, Settings.db_file_name)))
+
+    tables = defaultdict(float)
+
+    migrate_model = MigrationBase.migrate_model
+    def timed_migrate_model(self, model_name):
+        start_time = time.time()
+        migrate_model(self, model_name)
+        tables[model_name] += time.time() - start_time
+
+    perform_additive_migration = migration.perform_additive_migration
+    def timed_perform_additive_migration(*args, **kwargs):
+        start_time = time.time()
+        perform_additive_migration(*args, **kwargs)
+        tables['<schema>'] += time.time() - start_time
+
+    MigrationBase.migrate_model = timed_migrate_model
+    migration.perform_additive_migration = timed_perform_additive_migration
+
+    start_time = time.time()
+    ret = update_db()
+
+    queue.put({
+        'success': ret == DATABASE_VERSION,
+        'time': time.time() - start_time,
+        'tables': dict(tables),
+        # ru_maxrss is expressed in kilobytes on Linux
+        'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    })
+
+
+def benchmark_migration(db_file, version):
+    """
+    Time the migration of a database to the current version.
+
+    The migration is executed in a dedicated process in order to
+    measure the peak of the memory used only by the migration.
+    """
+    queue = multiprocessing.Queue()
+
+    workdir = tempfile.mkdtemp()
+
+    try:
+        process = multiprocessing.Process(target=_run_migration, args=(db_file, version, workdir, queue))
+        process.start()
+        process.join()
+
+        if queue.empty():
+            return {'success': False, 'time': 0, 'tables': {}, 'peak_rss': 0}
+
+        return queue.get()
+    finally:
+        shutil.rmtree(workdir, True)
+
+
+def benchmark_migrations(versions=None, **kwargs):
+    """
+    Generate a database for each of the versions and time its migration
+
+    :param versions: the versions to be benchmarked; by default all the supported ones
+    :param kwargs: the size of the databases as accepted by generate_db
+    :return: a dictionary with the results of the benchmark of each version
+    """
+    if versions is None:
+        versions = range(FIRST_DATABASE_VERSION_SUPPORTED, DATABASE_VERSION)
+
+    results = OrderedDict()
+
+    for version in versions:
+        workdir = tempfile.mkdtemp()
+
+        try:
+            db_file = os.path.join(workdir, 'glbackend-%d.db' % version)
+            generate_db(db_file, version, **kwargs)
+            results[version] = benchmark_migration(db_file, version)
+        finally:
+            shutil.rmtree(workdir, True)
+
+    return results
+
+
+def print_benchmark(results):
+    for version, result in results.items():
+        print("Migration from version %d: %s in %.2fs (peak RSS: %.1f MB)" %
+              (version, 'completed' if result['success'] else 'FAILED',
+               result['time'], result['peak_rss'] / (1024.0 * 1024.0)))
+
+        for table, seconds in sorted(result['tables'].items(), key=lambda x: -x[1]):
+            print("  %-30s %8.2fs" % (table, seconds))
@@ -126,6 +126,24 @@ class SNIMap(object):
             self.selectContext
         )
 
+    def update(self, mapping):
+        """
+        Replace the mapping of the hostnames with the contexts in place; the
+        connections established afterwards use the new contexts while the
+        existing ones are not affected.
+        """
+        context = mapping['DEFAULT'].getContext()
+        if context is not self.context:
+            context.set_tlsext_servername_callback(self.selectContext)
+            self.context = context
+
+        self.mapping = mapping
+
+        contexts = set(x.getContext() for x in mapping.values())
+        for context in list(self._negotiationDataForContext):
+            if context not in contexts:
+                del self._negotiationDataForContext[context]
+
     def selectContext(self, connection):
         common_name = connection.get_servername()
 
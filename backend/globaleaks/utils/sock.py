@@ -1,3 +1,4 @@
+import os
 import socket
 
 from twisted.protocols import tls
@@ -7,6 +8,15 @@ def listen_tcp_on_sock(reactor, fd, factory):
     return reactor.adoptStreamPort(fd, socket.AF_INET, factory)
 
 
+def listen_unix_on_path(reactor, path, factory):
+    # The socket of a previous execution is left on the disk if the
+    # process is not terminated cleanly
+    if os.path.exists(path):
+        os.unlink(path)
+
+    return reactor.listenUNIX(path, factory, mode=0o600)
+
+
 def listen_tls_on_sock(reactor, fd, contextFactory, factory):
     tlsFactory = tls.TLSMemoryBIOFactory(contextFactory, False, factory)
     port = listen_tcp_on_sock(reactor, fd, tlsFactory)
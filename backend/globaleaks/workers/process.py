@@ -6,6 +6,7 @@ import sys
 import traceback
 
 from twisted.internet import defer, reactor
+from twisted.internet.process import ProcessReader
 from twisted.internet.protocol import ProcessProtocol
 
 from globaleaks.utils.process import set_proc_title, set_pdeathsig
@@ -24,6 +25,11 @@ class Process(object):
 
         self._log = os.fdopen(0, 'w', 1).write
 
+        # Pipe on which the supervisor sends the messages to the process
+        self._control_buffer = b''
+        if self.cfg.get('control_fd') is not None:
+            self._control = ProcessReader(reactor, self, 'control', self.cfg['control_fd'])
+
         set_proc_title(self.name)
         set_pdeathsig(signal.SIGTERM)
 
@@ -47,6 +53,26 @@ class Process(object):
     def start(self):
         reactor.run()
 
+    def childDataReceived(self, name, data):
+        """
+        Called by the reader of the control pipe; every line is a message
+        encoded in JSON.
+        """
+        self._control_buffer += data
+
+        lines = self._control_buffer.split(b'\n')
+        self._control_buffer = lines.pop()
+
+        for line in lines:
+            if line:
+                self.handle_message(json.loads(line.decode()))
+
+    def childConnectionLost(self, name, reason):
+        pass
+
+    def handle_message(self, message):
+        pass
+
     def sigusr1(self):
         pass
 
@@ -62,12 +88,13 @@ class Process(object):
 
 
 class CfgFDProcProtocol(ProcessProtocol):
-    def __init__(self, supervisor, cfg, cfg_fd=42):
+    def __init__(self, supervisor, cfg, cfg_fd=42, control_fd=43):
         self.supervisor = supervisor
-        self.cfg = json.dumps(cfg)
+        self.cfg = json.dumps(dict(cfg, control_fd=control_fd))
         self.cfg_fd = cfg_fd
+        self.control_fd = control_fd
 
-        self.fd_map = {0:'r', cfg_fd:'w'}
+        self.fd_map = {0:'r', cfg_fd:'w', control_fd:'w'}
 
         self.startup_promise = defer.Deferred()
 
@@ -77,6 +104,12 @@ class CfgFDProcProtocol(ProcessProtocol):
 
         self.startup_promise.callback(None)
 
+    def send_message(self, message):
+        """
+        Send a message to the process on its control pipe
+        """
+        self.transport.writeToChild(self.control_fd, json.dumps(message).encode() + b'\n')
+
     def childDataReceived(self, childFD, data):
         for line in data.split('\n'):
             if line:
@@ -90,8 +123,8 @@ class CfgFDProcProtocol(ProcessProtocol):
 
 
 class HTTPSProcProtocol(CfgFDProcProtocol):
-    def __init__(self, supervisor, cfg, cfg_fd=42):
-        CfgFDProcProtocol.__init__(self, supervisor, cfg, cfg_fd)
+    def __init__(self, supervisor, cfg, cfg_fd=42, control_fd=43):
+        CfgFDProcProtocol.__init__(self, supervisor, cfg, cfg_fd, control_fd)
 
         for tls_socket_fd in cfg['tls_socket_fds']:
             self.fd_map[tls_socket_fd] = tls_socket_fd
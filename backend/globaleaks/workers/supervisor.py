@@ -18,7 +18,7 @@ class ProcessSupervisor(object):
     """
     A supervisor for all subprocesses that the main globaleaks process can launch
     """
-    def __init__(self, net_sockets, proxy_ip, proxy_port):
+    def __init__(self, net_sockets, proxy_ip, proxy_port, proxy_socket=None):
         log.info("Starting process monitor")
 
         self.shutting_down = False
@@ -33,6 +33,7 @@ class ProcessSupervisor(object):
         self.tls_cfg = {
           'proxy_ip': proxy_ip,
           'proxy_port': proxy_port,
+          'proxy_socket': proxy_socket,
           'debug': log.loglevel <= logging.DEBUG,
           'site_cfgs': [],
         }
@@ -42,15 +43,13 @@ class ProcessSupervisor(object):
 
         self.tls_cfg['tls_socket_fds'] = [ns.fileno() for ns in net_sockets]
 
-    def db_maybe_launch_https_workers(self, session):
+    def db_get_https_config(self, session):
+        """
+        Return whether HTTPS is enabled, the valid TLS configurations of the
+        sites and the error of the last invalid one
+        """
         config = ConfigFactory(session, 1, 'node')
 
-        # If root_tenant is disabled do not start https
-        on = config.get_val(u'https_enabled')
-        if not on:
-            log.info("Not launching workers")
-            return defer.succeed(None)
-
         site_cfgs = load_tls_dict_list(session)
 
         valid_cfgs, err = [], None
@@ -61,6 +60,15 @@ class ProcessSupervisor(object):
             if ok and err is None:
                 valid_cfgs.append(db_cfg)
 
+        return config.get_val(u'https_enabled'), valid_cfgs, err
+
+    def db_maybe_launch_https_workers(self, session):
+        # If root_tenant is disabled do not start https
+        on, valid_cfgs, err = self.db_get_https_config(session)
+        if not on:
+            log.info("Not launching workers")
+            return defer.succeed(None)
+
         self.tls_cfg['site_cfgs'] = valid_cfgs
 
         if not valid_cfgs:
@@ -75,6 +83,32 @@ class ProcessSupervisor(object):
     def maybe_launch_https_workers(self, session):
         self.db_maybe_launch_https_workers(session)
 
+    @transact
+    def get_https_config(self, session):
+        return self.db_get_https_config(session)
+
+    @defer.inlineCallbacks
+    def reload_https_workers(self):
+        """
+        Apply the current TLS configuration of the sites to the running
+        workers through their control pipe without restarting them.
+
+        The workers are restarted only if they need to be launched or shut
+        down, as when HTTPS is enabled or disabled.
+        """
+        on, valid_cfgs, _ = yield self.get_https_config()
+
+        if self.shutting_down or not self.is_running() or not on or not valid_cfgs:
+            yield self.shutdown(friendly=True)
+            yield self.maybe_launch_https_workers()
+            return
+
+        # The workers spawned afterwards receive the same configuration
+        self.tls_cfg['site_cfgs'] = valid_cfgs
+
+        for pp in self.tls_process_pool:
+            pp.send_message({'command': 'update_site_cfgs', 'site_cfgs': valid_cfgs})
+
     def launch_https_workers(self):
         return defer.DeferredList([self.launch_worker() for _ in range(self.cpu_count)])
 
@@ -33,7 +33,10 @@ class HTTPSProcess(Process):
 
         proxy_url = 'http://' + self.cfg['proxy_ip'] + ':' + str(self.cfg['proxy_port'])
 
-        self.http_proxy_factory = HTTPStreamFactory(proxy_url)
+        self.http_proxy_factory = HTTPStreamFactory(proxy_url, self.cfg.get('proxy_socket'))
+
+        # hostname -> (site_cfg, context factory) of the configured sites
+        self.site_ctxs = {}
 
         for site_cfg in self.cfg['site_cfgs']:
             cv = ChainValidator()
@@ -41,11 +44,7 @@ class HTTPSProcess(Process):
             if not ok or not err is None:
                 raise err
 
-        default_site = self.cfg['site_cfgs'].pop(0)
-        sni_dict = {'DEFAULT': make_TLSContextFactory(default_site)}
-
-        for site_cfg in self.cfg['site_cfgs']:
-            sni_dict[site_cfg['hostname']] = make_TLSContextFactory(site_cfg)
+        sni_dict = self.load_site_cfgs(self.cfg['site_cfgs'])
 
         self.snimap = SNIMap(sni_dict)
 
@@ -61,6 +60,56 @@ class HTTPSProcess(Process):
             self.log("HTTPS proxy listening on {} for hostnames: {}".format(
                      port._realPortNumber, ', '.join(sni_dict.keys())))
 
+    def load_site_cfgs(self, site_cfgs):
+        """
+        Return the SNI mapping of the site_cfgs, the first of which is the
+        default one; the context factories of the sites whose configuration
+        is unchanged are reused in order to preserve their TLS session caches.
+        """
+        sni_dict, site_ctxs = {}, {}
+
+        for i, site_cfg in enumerate(site_cfgs):
+            hostname = 'DEFAULT' if i == 0 else site_cfg['hostname']
+
+            cached = self.site_ctxs.get(hostname)
+            if cached is not None and cached[0] == site_cfg:
+                ctx_factory = cached[1]
+            else:
+                ctx_factory = make_TLSContextFactory(site_cfg)
+
+            sni_dict[hostname] = ctx_factory
+            site_ctxs[hostname] = (site_cfg, ctx_factory)
+
+        self.site_ctxs = site_ctxs
+
+        return sni_dict
+
+    def update_site_cfgs(self, site_cfgs):
+        """
+        Add, replace or remove the TLS contexts of the sites without
+        interrupting the service; the configuration is applied only if
+        every site_cfg is valid.
+        """
+        for site_cfg in site_cfgs:
+            cv = ChainValidator()
+            ok, err = cv.validate(site_cfg, must_be_disabled=False, check_expiration=False)
+            if not ok or not err is None:
+                self.log("Discarded invalid TLS configuration of %s: %s" % (site_cfg['hostname'], err))
+                return
+
+        if not site_cfgs:
+            return
+
+        sni_dict = self.load_site_cfgs(site_cfgs)
+
+        self.snimap.update(sni_dict)
+
+        self.log("HTTPS proxy serving hostnames: {}".format(', '.join(sni_dict.keys())))
+
+    def handle_message(self, message):
+        if message.get('command') == 'update_site_cfgs':
+            self.update_site_cfgs(message['site_cfgs'])
+
     def sigusr1(self):
         self.shutdown()
         reactor.stop()
@@ -267,11 +267,23 @@ module.exports = function(grunt) {
         },
         expand: true,
         cwd: 'build/',
-        src: ['index.html', 'license.txt', 'js/*'],
+        src: ['index.html', 'license.txt', 'css/*.css', 'js/*.js'],
         dest: 'build/',
         rename: function(dest, src) {
           return dest + '/' + src + '.gz';
         }
+      },
+      brotli: {
+        options: {
+          mode: 'brotli'
+        },
+        expand: true,
+        cwd: 'build/',
+        src: ['index.html', 'license.txt', 'css/*.css', 'js/*.js'],
+        dest: 'build/',
+        rename: function(dest, src) {
+          return dest + '/' + src + '.br';
+        }
       }
     },
 
@@ -398,10 +398,7 @@ var GLClient = angular.module('GLClient', [
       $rootScopeProvider.digestTtl(30);
 
       // Configure translation and language providers.
-      $translateProvider.useStaticFilesLoader({
-        prefix: 'l10n/',
-        suffix: ''
-      });
+      $translateProvider.useLoader('GLTranslationsLoader');
 
       $translateProvider.useInterpolation('noopInterpolation');
       $translateProvider.useSanitizeValueStrategy('escape');
@@ -555,7 +552,7 @@ var GLClient = angular.module('GLClient', [
         });
 
         if (result.node.favicon) {
-          document.getElementById('favicon').setAttribute("href", "data:image/x-icon;base64," + result.node.favicon);
+          document.getElementById('favicon').setAttribute("href", result.node.favicon);
         }
 
         $rootScope.connection = {
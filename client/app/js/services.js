@@ -800,6 +800,34 @@ factory('AdminUtils', ['AdminContextResource', 'AdminQuestionnaireResource', 'Ad
 }]).
   factory('DefaultL10NResource', ['GLResource', function(GLResource) {
     return new GLResource('l10n/:lang.json', {lang: '@lang'});
+}]).
+  factory('GLTranslationsLoader', ['$http', '$q', '$rootScope', function($http, $q, $rootScope) {
+    // Loads the translations shared by all the tenants from their immutable
+    // versioned address and applies over them the texts customized by the tenant
+    return function(options) {
+      var versions = $rootScope.node ? $rootScope.node.l10n_versions : undefined;
+
+      var load = function() {
+        return $http.get('l10n/' + options.key).then(function(response) {
+          return response.data;
+        });
+      };
+
+      if (angular.isUndefined(versions) || angular.isUndefined(versions[options.key])) {
+        return load();
+      }
+
+      return $q.all([
+        $http.get('l10n/' + options.key + '/' + versions[options.key], {cache: true}),
+        $http.get('l10n/' + options.key + '/custom')
+      ]).then(function(responses) {
+        return angular.extend({}, responses[0].data, responses[1].data);
+      }, function() {
+        // The version known by the client is outdated after an upgrade of
+        // the backend and is not served anymore; fall back on the merged texts
+        return load();
+      });
+    };
 }]).
   factory('Utils', ['$rootScope', '$q', '$location', '$filter', '$sce', '$uibModal', '$window', 'Authentication',
   function($rootScope, $q, $location, $filter, $sce, $uibModal, $window, Authentication) {
@@ -891,8 +919,8 @@ factory('AdminUtils', ['AdminContextResource', 'AdminQuestionnaireResource', 'Ad
         }
       },
 
-      base64ToTrustedScriptUrl: function(base64_data) {
-        return $sce.trustAsResourceUrl('data:application/javascript;base64,' + base64_data);
+      trustedScriptUrl: function(url) {
+        return $sce.trustAsResourceUrl(url);
       },
 
       update: function (model, cb, errcb) {
@@ -923,6 +951,11 @@ factory('AdminUtils', ['AdminContextResource', 'AdminQuestionnaireResource', 'Ad
           data = 'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mP8Xw8AAoMBgDTD2qgAAAAASUVORK5CYII=';
         }
 
+        // The public images are referenced by their address
+        if (data.indexOf('media/') === 0) {
+          return data;
+        }
+
         return 'data:image/png;base64,' + data;
       },
 
@@ -930,7 +963,7 @@ factory('AdminUtils', ['AdminContextResource', 'AdminQuestionnaireResource', 'Ad
         if (angular.isUndefined($rootScope.node)) {
           return false;
         }
-        return this.isWhistleblowerPage() && angular.isDefined($rootScope.node.script);
+        return this.isWhistleblowerPage() && !!$rootScope.node.script;
       },
 
       isWhistleblowerPage: function() {